@@ -0,0 +1,72 @@
+# agents/cotisations.py
+"""
+Résolution en masse du statut de cotisation des membres.
+
+Utilisé par les recherches de membres et le formulaire de bon de soin : une
+seule requête annotée (dernière vérification d'agent, cotisation en retard)
+quel que soit le nombre de membres.
+"""
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from assureur.models import Cotisation
+from membres.models import Membre
+from .models import VerificationCotisation
+
+# Un membre inscrit depuis moins de DELAI_NOUVEAU_MEMBRE jours n'est pas à jour
+DELAI_NOUVEAU_MEMBRE = 30
+# Validité d'un paiement enregistré sur la fiche membre (date_derniere_cotisation)
+VALIDITE_DERNIERE_COTISATION = 30
+
+
+def statuts_cotisation(membre_ids):
+    """
+    Retourne {membre_id: est_a_jour} pour les membres donnés. Par ordre de priorité :
+    - nouveau membre (moins de 30 jours) : non à jour ;
+    - dernière vérification d'agent : à jour si son statut est 'a_jour' ;
+    - cotisation en retard ou échue non payée : non à jour ;
+    - sinon dernière cotisation de moins de 30 jours, ou statut actif.
+    """
+    membre_ids = [membre_id for membre_id in set(membre_ids) if membre_id]
+    if not membre_ids:
+        return {}
+
+    aujourd_hui = timezone.now().date()
+    derniere_verification = VerificationCotisation.objects.filter(
+        membre=OuterRef('pk')
+    ).order_by('-date_verification', '-id').values('statut_cotisation')[:1]
+    cotisation_en_retard = Cotisation.objects.filter(membre=OuterRef('pk')).filter(
+        Q(statut='en_retard') | Q(statut='due', date_echeance__lt=aujourd_hui)
+    )
+
+    lignes = Membre.objects.filter(pk__in=membre_ids).annotate(
+        statut_verification=Subquery(derniere_verification),
+        cotisation_en_retard=Exists(cotisation_en_retard),
+    ).values_list(
+        'id', 'date_inscription', 'statut', 'date_derniere_cotisation',
+        'statut_verification', 'cotisation_en_retard',
+    )
+
+    statuts = {}
+    for membre_id, inscription, statut, derniere_cotisation, verification, en_retard in lignes:
+        if inscription and hasattr(inscription, 'date'):
+            inscription = timezone.localtime(inscription).date() if timezone.is_aware(inscription) else inscription.date()
+
+        if inscription and (aujourd_hui - inscription).days < DELAI_NOUVEAU_MEMBRE:
+            est_a_jour = False
+        elif verification:
+            est_a_jour = verification == 'a_jour'
+        elif en_retard:
+            est_a_jour = False
+        elif derniere_cotisation:
+            est_a_jour = (aujourd_hui - derniere_cotisation).days <= VALIDITE_DERNIERE_COTISATION
+        else:
+            est_a_jour = statut == Membre.StatutMembre.ACTIF
+        statuts[membre_id] = est_a_jour
+
+    return statuts
+
+
+def est_a_jour(membre):
+    """Statut d'un seul membre (une requête)"""
+    return statuts_cotisation([membre.id]).get(membre.id, False)
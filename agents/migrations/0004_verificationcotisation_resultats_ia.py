@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_remove_agent_bons_soin_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificationcotisation',
+            name='motifs_suspicion',
+            field=models.JSONField(blank=True, default=list, verbose_name='Motifs de suspicion'),
+        ),
+        migrations.AddField(
+            model_name='verificationcotisation',
+            name='priorite_ia',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='Priorité IA'),
+        ),
+        migrations.AddField(
+            model_name='verificationcotisation',
+            name='score_anomalie_ia',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, verbose_name="Score d'anomalie IA"),
+        ),
+    ]
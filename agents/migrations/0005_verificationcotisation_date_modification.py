@@ -0,0 +1,18 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_verificationcotisation_resultats_ia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificationcotisation',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Dernière modification'),
+            preserve_default=False,
+        ),
+    ]
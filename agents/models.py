@@ -392,6 +392,11 @@ class VerificationCotisation(models.Model):
         auto_now_add=True, 
         verbose_name="Date de vérification"
     )
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name="Dernière modification"
+    )
     statut_cotisation = models.CharField(
         max_length=20, 
         choices=STATUT_COTISATION, 
@@ -436,6 +441,25 @@ class VerificationCotisation(models.Model):
         default=False, 
         verbose_name="Membre notifié"
     )
+    # Résultats de la détection de fraude (ia_detection)
+    score_anomalie_ia = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Score d'anomalie IA"
+    )
+    priorite_ia = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        verbose_name="Priorité IA"
+    )
+    motifs_suspicion = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Motifs de suspicion"
+    )
 
     class Meta:
         verbose_name = "Vérification de cotisation"
@@ -637,29 +661,18 @@ class RechercheMembreManager:
         Effectue une recherche avancée sur les membres de l'assureur de l'agent
         """
         from membres.models import Membre
+        from membres.recherche import moteur_recherche
         
         if not agent.assureur:
             return Membre.objects.none()
             
-        queryset = Membre.objects.filter(assureur=agent.assureur)
+        # Membres rattachés à l'assureur via leur agent créateur
+        queryset = Membre.objects.filter(agent_createur__assureur=agent.assureur)
         
         if termes_recherche:
-            # Séparation des termes de recherche
-            termes = termes_recherche.split()
-            conditions = models.Q()
-            
-            for terme in termes:
-                conditions |= (
-                    models.Q(user__first_name__icontains=terme) |
-                    models.Q(user__last_name__icontains=terme) |
-                    models.Q(matricule__icontains=terme) |
-                    models.Q(telephone__icontains=terme) |
-                    models.Q(email__icontains=terme) |
-                    models.Q(adresse__icontains=terme) |
-                    models.Q(ville__icontains=terme)
-                )
-            
-            queryset = queryset.filter(conditions)
+            # Le moteur classe et limite parmi les seuls membres de l'assureur
+            identifiants = moteur_recherche.identifiants(termes_recherche, limite=200, queryset=queryset)
+            queryset = queryset.filter(pk__in=identifiants)
         
         # Création d'une activité de recherche
         creer_activite_recherche(agent, termes_recherche, queryset.count())
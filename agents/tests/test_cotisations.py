@@ -0,0 +1,55 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+
+from agents.cotisations import statuts_cotisation
+from agents.models import Agent, VerificationCotisation
+from assureur.models import Cotisation
+from membres.models import Membre
+
+
+class StatutsCotisationTests(TestCase):
+
+    def setUp(self):
+        agent_user = User.objects.create_user(username='agent_statuts', password='testpass123')
+        self.agent = Agent.objects.create(user=agent_user, matricule='AGT-ST-1', poste='Contrôle')
+        ancien = timezone.now() - timedelta(days=90)
+        today = timezone.now().date()
+
+        self.verifie = Membre.objects.create(nom='Kone', prenom='Awa', date_inscription=ancien)
+        VerificationCotisation.objects.create(
+            agent=self.agent, membre=self.verifie, statut_cotisation='a_jour',
+            prochaine_echeance=today + timedelta(days=10),
+        )
+        self.en_retard = Membre.objects.create(nom='Kone', prenom='Ali', date_inscription=ancien)
+        Cotisation.objects.create(
+            membre=self.en_retard, periode='2026-01', montant=5000, statut='due',
+            date_echeance=today - timedelta(days=5),
+        )
+        self.actif = Membre.objects.create(nom='Kone', prenom='Fatou', date_inscription=ancien)
+        self.nouveau = Membre.objects.create(nom='Kone', prenom='Moussa')
+
+    def test_statuts_en_une_requete(self):
+        ids = [self.verifie.id, self.en_retard.id, self.actif.id, self.nouveau.id]
+        with self.assertNumQueries(1):
+            statuts = statuts_cotisation(ids)
+        self.assertEqual(statuts, {
+            self.verifie.id: True,
+            self.en_retard.id: False,
+            self.actif.id: True,
+            self.nouveau.id: False,
+        })
+
+    def test_autocompletion_bon_soin_nombre_constant_de_requetes(self):
+        self.client.force_login(self.agent.user)
+        url = reverse('agents:api_recherche_membres_bon_soin')
+        self.client.get(url, {'q': 'kone'}, secure=True)
+        # Session et utilisateur (2) + index (numéro, mots, préfixes) + membres + statuts
+        with self.assertNumQueries(7):
+            reponse = self.client.get(url, {'q': 'kone'}, secure=True)
+        membres = {m['id']: m['est_a_jour'] for m in reponse.json()['membres']}
+        self.assertEqual(len(membres), 4)
+        self.assertTrue(membres[self.verifie.id])
+        self.assertFalse(membres[self.en_retard.id])
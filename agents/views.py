@@ -145,6 +145,8 @@ class MockManager:
 # Import de vos modèles existants avec gestion d'erreur robuste
 try:
     from membres.models import Membre
+    from membres.recherche import rechercher_membres
+    from .cotisations import statuts_cotisation
     MEMBRE_MODEL_AVAILABLE = True
     logger.info("Modèle Membre importé avec succès")
 except ImportError as e:
@@ -274,59 +276,13 @@ def generer_numero_unique():
 
 
 def verifier_statut_cotisation_simple(membre):
-    """Vérification REALISTE du statut de cotisation - VERSION CORRIGÉE"""
+    """Statut de cotisation d'un membre via le résolveur en masse (agents/cotisations.py)"""
     try:
-        logger.info(f"🔍 Vérification cotisation pour membre {membre.id}: {membre.prenom} {membre.nom}")
-        
-        # ✅ CORRECTION: Gestion robuste des types datetime/date
-        aujourd_hui = timezone.now().date()
-        
-        # Vérifier si c'est un nouveau membre (créé récemment)
-        if hasattr(membre, 'date_inscription') and membre.date_inscription:
-            # ✅ CORRECTION: Convertir en date si c'est un datetime
-            if hasattr(membre.date_inscription, 'date'):
-                date_inscription = membre.date_inscription.date()
-            else:
-                date_inscription = membre.date_inscription
-                
-            delai_creation = aujourd_hui - date_inscription
-            if delai_creation.days < 30:  # Membre créé il y a moins d'un mois
-                logger.info(f"❌ Nouveau membre détecté ({delai_creation.days} jours) - Statut: NON À JOUR")
-                return False
-        
-        # Méthode 1: Si le modèle Membre a un champ est_a_jour
-        if hasattr(membre, 'est_a_jour') and membre.est_a_jour is not None:
-            # Si c'est une méthode, l'appeler
-            if callable(membre.est_a_jour):
-                statut = membre.est_a_jour()
-            else:
-                statut = membre.est_a_jour
-            logger.info(f"📊 Statut via est_a_jour: {statut}")
-            return statut
-        
-        # Méthode 2: Vérification par date de dernière cotisation
-        if hasattr(membre, 'date_derniere_cotisation') and membre.date_derniere_cotisation:
-            # ✅ CORRECTION: Convertir en date si c'est un datetime
-            if hasattr(membre.date_derniere_cotisation, 'date'):
-                derniere_cotisation = membre.date_derniere_cotisation.date()
-            else:
-                derniere_cotisation = membre.date_derniere_cotisation
-                
-            delai = aujourd_hui - derniere_cotisation
-            est_a_jour = delai.days < 365  # 1 an de validité
-            logger.info(f"📊 Statut via date_derniere_cotisation: {est_a_jour} ({delai.days} jours)")
-            return est_a_jour
-        
-        # ✅ CORRECTION: Par défaut, les membres ne sont PAS à jour
-        logger.info(f"⚠️ Aucune donnée cotisation - Statut par défaut: NON À JOUR")
-        return False
-        
+        return statuts_cotisation([membre.id]).get(membre.id, False)
     except Exception as e:
         logger.error(f"❌ Erreur vérification statut {getattr(membre, 'id', 'N/A')}: {e}")
         return False  # En cas d'erreur, considérer comme non à jour
 
-
-
 def verifier_cotisation_membre_simplifiee(membre):
     """Vérification simplifiée REALISTE pour l'enregistrement - VERSION COMPLÈTEMENT CORRIGÉE"""
     try:
@@ -549,26 +505,15 @@ def rechercher_membre(request):
                 'error': 'La recherche doit contenir au moins 2 caractères'
             }, status=400)
         
-        # Effectuer la recherche en utilisant les méthodes du modèle Agent
+        # Recherche via le moteur partagé (membres/recherche.py)
         try:
-            if hasattr(agent, 'rechercher_membres_nom'):
-                membres = agent.rechercher_membres_nom(query)
-            else:
-                # Fallback si la méthode n'existe pas
-                if MEMBRE_MODEL_AVAILABLE:
-                    membres = Membre.objects.filter(
-                        Q(user__first_name__icontains=query) |
-                        Q(user__last_name__icontains=query) |
-                        Q(numero_unique__icontains=query) |
-                        Q(telephone__icontains=query)
-                    )[:15]
-                else:
-                    membres = []
+            membres = rechercher_membres(query, limite=15) if MEMBRE_MODEL_AVAILABLE else []
         except Exception as e:
             logger.error(f"Erreur lors de la recherche: {e}")
             membres = []
         
-        # Préparer les résultats
+        # Préparer les résultats (statuts de cotisation en une requête)
+        statuts = statuts_cotisation([membre.id for membre in membres]) if membres else {}
         results = []
         for membre in membres[:15]:  # Limiter à 15 résultats
             try:
@@ -580,7 +525,8 @@ def rechercher_membre(request):
                     'telephone': getattr(membre, 'telephone', ''),
                     'email': getattr(membre.user, 'email', '') if hasattr(membre, 'user') else getattr(membre, 'email', ''),
                     'nom': str(membre.nom) if hasattr(membre, 'nom') and membre.nom else '',
-                    'est_actif': getattr(membre, 'est_actif', True)
+                    'est_actif': getattr(membre, 'est_actif', True),
+                    'est_a_jour': statuts.get(membre.id, False),
                 })
             except Exception as e:
                 logger.error(f"Erreur préparation membre {getattr(membre, 'id', 'N/A')}: {e}")
@@ -996,12 +942,11 @@ def verification_cotisations(request):
                 
                 total_membres = membres_assignes.count()
                 
-                # Calculer les statuts
-                for membre in membres_assignes[:100]:  # Limiter pour performance
-                    if verifier_statut_cotisation_simple(membre):
-                        membres_a_jour += 1
-                    else:
-                        membres_en_retard += 1
+                # Calculer les statuts (échantillon résolu en une requête)
+                echantillon = list(membres_assignes.values_list('id', flat=True)[:100])
+                statuts = statuts_cotisation(echantillon)
+                membres_a_jour = sum(1 for statut in statuts.values() if statut)
+                membres_en_retard = len(statuts) - membres_a_jour
                 
                 # Extrapolation pour grand nombre de membres
                 if total_membres > 100:
@@ -1132,16 +1077,12 @@ def recherche_membres_api(request):
         if not MEMBRE_MODEL_AVAILABLE:
             return JsonResponse({'membres': []})
         
-        membres = Membre.objects.filter(
-            Q(nom__icontains=query) |
-            Q(prenom__icontains=query) |
-            Q(numero_unique__icontains=query) |
-            Q(telephone__icontains=query)
-        )[:10]
+        membres = rechercher_membres(query, limite=10)
         
         logger.info(f"Nombre de membres trouvés: {len(membres)}")
         
         # Construction des résultats avec valeurs SÉRIALISABLES
+        statuts = statuts_cotisation([membre.id for membre in membres])
         results = []
         for membre in membres:
             results.append({
@@ -1150,7 +1091,8 @@ def recherche_membres_api(request):
                 'prenom': getattr(membre, 'prenom', ''),
                 'numero_unique': getattr(membre, 'numero_unique', ''),
                 'telephone': getattr(membre, 'telephone', ''),
-                'statut': getattr(membre, 'statut', '')
+                'statut': getattr(membre, 'statut', ''),
+                'est_a_jour': statuts.get(membre.id, False),
             })
         
         logger.info(f"Recherche réussie: {len(results)} résultats")
@@ -1492,64 +1434,21 @@ def api_recherche_membres_bon_soin(request):
         # Recherche dans les membres avec logging détaillé
         logger.info(f"🔍 Recherche dans la base de données pour: '{query}'")
         
-        # Construction de la requête de recherche
-        conditions = Q()
-        
-        # Vérifier quels champs existent dans le modèle Membre
-        try:
-            # Test des champs possibles
-            sample_membre = Membre.objects.first()
-            if sample_membre:
-                if hasattr(sample_membre, 'nom'):
-                    conditions |= Q(nom__icontains=query)
-                if hasattr(sample_membre, 'prenom'):
-                    conditions |= Q(prenom__icontains=query)
-                if hasattr(sample_membre, 'numero_unique'):
-                    conditions |= Q(numero_unique__icontains=query)
-                if hasattr(sample_membre, 'telephone'):
-                    conditions |= Q(telephone__icontains=query)
-                if hasattr(sample_membre, 'user'):
-                    conditions |= Q(user__first_name__icontains=query) | Q(user__last_name__icontains=query)
-        except Exception as e:
-            logger.warning(f"Erreur vérification champs membre: {e}")
-            # Fallback: utiliser les champs de base
-            conditions = Q(nom__icontains=query) | Q(prenom__icontains=query)
-        
-        membres = Membre.objects.filter(conditions)[:10]
+        membres = rechercher_membres(query, limite=10)
+        statuts = statuts_cotisation([membre.id for membre in membres])
         
         logger.info(f"✅ {len(membres)} membres trouvés pour la recherche: '{query}'")
         
-        resultats = []
-        for membre in membres:
-            try:
-                est_a_jour = verifier_statut_cotisation_simple(membre)
-                
-                # Construction du nom complet selon les champs disponibles
-                nom_complet = ""
-                if hasattr(membre, 'prenom') and hasattr(membre, 'nom'):
-                    nom_complet = f"{membre.prenom} {membre.nom}"
-                elif hasattr(membre, 'user'):
-                    nom_complet = f"{membre.user.first_name} {membre.user.last_name}"
-                else:
-                    nom_complet = f"Membre {membre.id}"
-                
-                # Construction des autres informations
-                numero_unique = getattr(membre, 'numero_unique', 'N/A')
-                telephone = getattr(membre, 'telephone', 'Non renseigné')
-                
-                resultats.append({
-                    'id': membre.id,
-                    'nom_complet': nom_complet.strip(),
-                    'numero_unique': numero_unique,
-                    'telephone': telephone,
-                    'est_a_jour': est_a_jour,
-                })
-                
-                logger.debug(f"📋 Membre trouvé: {nom_complet} (ID: {membre.id}, À jour: {est_a_jour})")
-                
-            except Exception as e:
-                logger.error(f"❌ Erreur traitement membre {membre.id}: {e}")
-                continue
+        resultats = [
+            {
+                'id': membre.id,
+                'nom_complet': f"{membre.prenom} {membre.nom}".strip(),
+                'numero_unique': membre.numero_unique or 'N/A',
+                'telephone': membre.telephone or 'Non renseigné',
+                'est_a_jour': statuts.get(membre.id, False),
+            }
+            for membre in membres
+        ]
         
         logger.info(f"🎯 Recherche réussie: {len(resultats)} résultats retournés")
         return JsonResponse({'membres': resultats})
@@ -1937,9 +1836,11 @@ def get_stats_communication(request):
         conversations_recentes = []
         
         try:
-            from communication.models import Message, Notification, Conversation
-            messages_non_lus = Message.objects.filter(destinataire=request.user, est_lu=False).count()
-            notifications_non_lues = Notification.objects.filter(user=request.user, est_lue=False).count()
+            from communication.compteurs import compteurs
+            from communication.models import Conversation
+            non_lus = compteurs(request.user.id)
+            messages_non_lus = non_lus['messages']
+            notifications_non_lues = non_lus['notifications']
             conversations_recentes = Conversation.objects.filter(participants=request.user).order_by('-date_dernier_message')[:5]
         except Exception as e:
             logger.warning(f"Modules communication non disponibles: {e}")
@@ -2012,12 +1913,14 @@ def liste_notifications_agent(request):
         notifications = []
         
         try:
+            from communication.compteurs import recalculer
             from communication.models import Notification
             notifications = Notification.objects.filter(user=request.user).order_by('-date_creation')
             
             # Marquer comme lues si demandé
             if request.GET.get('marquer_lues'):
                 notifications.filter(est_lue=False).update(est_lue=True)
+                recalculer(request.user.id, 'notifications')
                 _ajouter_message(request, 'success', "Notifications marquées comme lues")
         except Exception as e:
             logger.warning(f"Modules communication non disponibles: {e}")
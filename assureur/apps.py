@@ -11,4 +11,7 @@ class AssureurConfig(AppConfig):
         try:
             import assureur.signals  # Si vous avez des signaux
         except ImportError:
-            pass
\ No newline at end of file
+            pass
+
+        from assureur.statistiques import connecter_signaux
+        connecter_signaux()
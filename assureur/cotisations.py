@@ -0,0 +1,142 @@
+# assureur/cotisations.py
+"""
+Génération ensembliste des cotisations mensuelles.
+
+Les membres actifs sans cotisation pour la période sont obtenus par un seul
+anti-join (NOT EXISTS), les lignes sont construites en mémoire et insérées par
+bulk_create(ignore_conflicts=True) : la contrainte unique (membre, periode)
+rend la génération idempotente, même relancée ou exécutée en parallèle.
+"""
+import calendar
+import logging
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from agents.models import Membre
+from core.taches import enfiler
+from .models import Cotisation
+from .statistiques import enfiler_recalcul_jour
+
+logger = logging.getLogger(__name__)
+
+TARIF_NORMAL = ('normale', Decimal('5000.00'))
+TARIF_CMU = ('femme_enceinte', Decimal('7500.00'))
+
+
+def batch_size_defaut():
+    return getattr(settings, 'COTISATIONS_BATCH_SIZE', 2000)
+
+
+def date_echeance_periode(periode):
+    """Dernier jour du mois de la période 'YYYY-MM'"""
+    annee, mois = map(int, periode.split('-'))
+    return date(annee, mois, calendar.monthrange(annee, mois)[1])
+
+
+def membres_sans_cotisation(periode):
+    """Membres actifs n'ayant pas encore de cotisation pour la période"""
+    return Membre.objects.filter(statut='actif').exclude(
+        Exists(Cotisation.objects.filter(membre=OuterRef('pk'), periode=periode))
+    )
+
+
+def cle_progression(periode):
+    return f'assureur:generation_cotisations:{periode}'
+
+
+def progression_generation(periode):
+    """Dernier état publié par la génération de la période (None si inconnue)"""
+    return cache.get(cle_progression(periode))
+
+
+def _publier_progression(periode, **etat):
+    cache.set(cle_progression(periode), {'periode': periode, **etat}, 24 * 3600)
+
+
+def construire_cotisations(periode, membres, enregistre_par_id=None):
+    """Construit en mémoire les cotisations de `membres` (id, numero_unique, cmu_option)"""
+    date_emission = timezone.now().date()
+    date_echeance = date_echeance_periode(periode)
+    ref_mois = periode.replace('-', '')
+
+    cotisations = []
+    for membre_id, numero_unique, cmu_option in membres:
+        type_cotisation, montant = TARIF_CMU if cmu_option else TARIF_NORMAL
+        cotisations.append(Cotisation(
+            membre_id=membre_id,
+            periode=periode,
+            montant=montant,
+            statut='due',
+            date_emission=date_emission,
+            date_echeance=date_echeance,
+            type_cotisation=type_cotisation,
+            reference=f"COT-{numero_unique}-{ref_mois}",
+            enregistre_par_id=enregistre_par_id,
+            notes='Générée automatiquement',
+        ))
+    return cotisations
+
+
+def generer_cotisations_periode(periode, enregistre_par_id=None, batch_size=None, callback=None):
+    """
+    Génère les cotisations manquantes de la période par lots.
+
+    `callback(traites, creees, total)` est appelé après chaque lot ; par défaut
+    la progression est publiée dans le cache (voir progression_generation).
+    Retourne {'periode', 'membres_traites', 'cotisations_creees'}.
+    """
+    batch_size = batch_size or batch_size_defaut()
+    if callback is None:
+        def callback(traites, creees, total):
+            _publier_progression(periode, statut='en_cours', traites=traites, creees=creees, total=total)
+
+    a_generer = membres_sans_cotisation(periode).order_by('id')
+    total = a_generer.count()
+    existantes = Cotisation.objects.filter(periode=periode).count()
+    callback(0, 0, total)
+
+    traites = creees = 0
+    dernier_id = 0
+    while True:
+        lot = list(
+            a_generer.filter(id__gt=dernier_id).values_list('id', 'numero_unique', 'cmu_option')[:batch_size]
+        )
+        if not lot:
+            break
+        dernier_id = lot[-1][0]
+        Cotisation.objects.bulk_create(
+            construire_cotisations(periode, lot, enregistre_par_id),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        traites += len(lot)
+        # ignore_conflicts ne renvoie pas les lignes insérées : on recompte
+        creees = Cotisation.objects.filter(periode=periode).count() - existantes
+        callback(traites, creees, total)
+
+    resultat = {'periode': periode, 'membres_traites': traites, 'cotisations_creees': creees}
+    _publier_progression(periode, statut='terminee', traites=traites, creees=creees, total=total)
+
+    if creees:
+        # bulk_create n'émet pas post_save : rafraîchir l'agrégat du jour
+        enfiler_recalcul_jour(timezone.now().date())
+
+    logger.info(f"Génération cotisations {periode}: {creees} créée(s) sur {traites} membre(s)")
+    return resultat
+
+
+def lancer_generation(periode, enregistre_par_id=None):
+    """Programme la génération en tâche de fond (une seule tâche par période)"""
+    _publier_progression(periode, statut='en_attente', traites=0, creees=0, total=None)
+    return enfiler(
+        'assureur.cotisations.generer_cotisations_periode',
+        cle=f'assureur:cotisations:{periode}',
+        delai=0,
+        periode=periode,
+        enregistre_par_id=enregistre_par_id,
+    )
@@ -0,0 +1,266 @@
+# assureur/exports.py
+"""
+Exports CSV/XLSX en flux pour assureur.views.export_donnees.
+
+Les lignes sont lues par values_list().iterator(chunk_size) et écrites au fil
+de l'eau : en CSV directement dans une StreamingHttpResponse, en XLSX avec
+XlsxWriter en mode mémoire constante. Au-delà de EXPORT_SEUIL_ARRIERE_PLAN
+lignes, l'export devient une tâche de fond (core.taches) qui produit un
+fichier téléchargeable depuis EXPORTS_ROOT.
+"""
+import csv
+import importlib.util
+import io
+import logging
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+
+from agents.models import Membre
+from core.taches import enfiler
+from .models import Bon, Cotisation, Paiement, Soin
+
+logger = logging.getLogger(__name__)
+
+EXPORTS = {
+    'membres': {
+        'modele': Membre,
+        'ordre': ('nom', 'prenom'),
+        'champ_date': 'date_inscription',
+        'champs': ['numero_unique', 'nom', 'prenom', 'email', 'telephone', 'statut', 'date_inscription'],
+        'titre': "Liste des membres",
+        'template_pdf': 'assureur/export_pdf_template.html',
+    },
+    'bons': {
+        'modele': Bon,
+        'ordre': ('-date_creation',),
+        'champ_date': 'date_creation',
+        'champs': ['numero_bon', 'membre__nom', 'membre__prenom', 'type_soin', 'montant_total',
+                   'montant_prise_charge', 'statut', 'date_creation'],
+        'titre': "Liste des bons de prise en charge",
+        'template_pdf': 'assureur/export_bons_pdf.html',
+    },
+    'cotisations': {
+        'modele': Cotisation,
+        'ordre': ('-periode',),
+        'champ_date': 'date_emission',
+        'champs': ['reference', 'membre__nom', 'membre__prenom', 'periode', 'montant', 'statut',
+                   'date_emission', 'date_echeance'],
+        'titre': "Liste des cotisations",
+        'template_pdf': 'assureur/export_pdf_template.html',
+    },
+    'paiements': {
+        'modele': Paiement,
+        'ordre': ('-date_paiement',),
+        'champ_date': 'date_paiement',
+        'champs': ['reference', 'membre__nom', 'membre__prenom', 'montant', 'mode_paiement', 'statut',
+                   'date_paiement'],
+        'titre': "Liste des paiements",
+        'template_pdf': 'assureur/export_pdf_template.html',
+    },
+    'soins': {
+        'modele': Soin,
+        'ordre': ('-date_soin',),
+        'champ_date': 'date_soin',
+        'champs': ['code', 'membre__nom', 'membre__prenom', 'type_soin', 'montant_facture',
+                   'montant_rembourse', 'statut', 'date_soin'],
+        'titre': "Liste des soins",
+        'template_pdf': 'assureur/export_pdf_template.html',
+    },
+}
+
+FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def seuil_arriere_plan():
+    return getattr(settings, 'EXPORT_SEUIL_ARRIERE_PLAN', 50000)
+
+
+def dossier_exports():
+    dossier = getattr(settings, 'EXPORTS_ROOT', os.path.join(settings.BASE_DIR, 'exports'))
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+def xlsx_disponible():
+    return importlib.util.find_spec('xlsxwriter') is not None
+
+
+def nom_fichier(type_donnees):
+    return f'{type_donnees}_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
+
+
+def _champ_existe(modele, chemin):
+    parties = chemin.split('__')
+    for position, partie in enumerate(parties):
+        try:
+            champ = modele._meta.get_field(partie)
+        except FieldDoesNotExist:
+            return False
+        if position < len(parties) - 1:
+            modele = champ.related_model
+            if modele is None:
+                return False
+    return True
+
+
+def entetes(champs):
+    return [champ.replace('__', ' - ').replace('_', ' ').title() for champ in champs]
+
+
+def filtres_periode(type_donnees, debut=None, fin=None):
+    """Filtres ORM bornant l'export à [debut, fin] sur son champ date"""
+    champ = EXPORTS[type_donnees]['champ_date']
+    if isinstance(EXPORTS[type_donnees]['modele']._meta.get_field(champ), models.DateTimeField):
+        champ = f'{champ}__date'
+    filtres = {}
+    if debut:
+        filtres[f'{champ}__gte'] = debut
+    if fin:
+        filtres[f'{champ}__lte'] = fin
+    return filtres
+
+
+def queryset_export(type_donnees, filtres=None):
+    return EXPORTS[type_donnees]['modele'].objects.filter(**(filtres or {}))
+
+
+def compter_lignes(type_donnees, filtres=None):
+    return queryset_export(type_donnees, filtres).count()
+
+
+def lignes_brutes(type_donnees, taille_lot=None, filtres=None):
+    """
+    Tuples de valeurs dans l'ordre des champs déclarés, lus par lots sans
+    matérialiser le queryset ; les champs absents du modèle restent vides.
+    """
+    definition = EXPORTS[type_donnees]
+    modele, champs = definition['modele'], definition['champs']
+    existants = [champ for champ in champs if _champ_existe(modele, champ)]
+    positions = [existants.index(champ) if champ in existants else None for champ in champs]
+
+    queryset = queryset_export(type_donnees, filtres).order_by(*definition['ordre']).values_list(*existants)
+    for valeurs in queryset.iterator(chunk_size=taille_lot or chunk_size()):
+        yield tuple(None if position is None else valeurs[position] for position in positions)
+
+
+def lignes_texte(type_donnees, taille_lot=None, filtres=None):
+    """Comme lignes_brutes, valeurs converties en texte (None -> '')"""
+    for ligne in lignes_brutes(type_donnees, taille_lot, filtres):
+        yield ['' if valeur is None else str(valeur) for valeur in ligne]
+
+
+# ==========================================================================
+# ÉCRITURE
+# ==========================================================================
+
+def flux_csv(type_donnees, lignes_par_bloc=500):
+    """Générateur de blocs CSV (séparateur ';') pour StreamingHttpResponse"""
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=';')
+    writer.writerow(entetes(EXPORTS[type_donnees]['champs']))
+
+    for numero, ligne in enumerate(lignes_texte(type_donnees), start=1):
+        writer.writerow(ligne)
+        if numero % lignes_par_bloc == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
+
+
+def _valeur_xlsx(valeur):
+    if valeur is None:
+        return ''
+    if isinstance(valeur, Decimal):
+        return float(valeur)
+    if isinstance(valeur, (date, datetime)):
+        return str(valeur)
+    return valeur
+
+
+def ecrire_xlsx(type_donnees, fichier):
+    """Écrit l'export XLSX dans `fichier` (chemin ou objet) en mémoire constante ; retourne le nombre de lignes"""
+    import xlsxwriter
+
+    classeur = xlsxwriter.Workbook(fichier, {'constant_memory': True, 'in_memory': False})
+    feuille = classeur.add_worksheet(type_donnees[:31])
+    gras = classeur.add_format({'bold': True})
+    feuille.write_row(0, 0, entetes(EXPORTS[type_donnees]['champs']), gras)
+
+    total = 0
+    for total, ligne in enumerate(lignes_brutes(type_donnees), start=1):
+        feuille.write_row(total, 0, [_valeur_xlsx(valeur) for valeur in ligne])
+    classeur.close()
+    return total
+
+
+def ecrire_csv(type_donnees, fichier, filtres=None):
+    """Écrit l'export CSV dans le fichier texte ouvert `fichier` ; retourne le nombre de lignes"""
+    writer = csv.writer(fichier, delimiter=';')
+    writer.writerow(entetes(EXPORTS[type_donnees]['champs']))
+    total = 0
+    for total, ligne in enumerate(lignes_texte(type_donnees, filtres=filtres), start=1):
+        writer.writerow(ligne)
+    return total
+
+
+# ==========================================================================
+# EXPORTS EN TÂCHE DE FOND
+# ==========================================================================
+
+def purger_exports(retention_jours=None):
+    """Supprime les fichiers d'export plus anciens que EXPORTS_RETENTION_JOURS"""
+    if retention_jours is None:
+        retention_jours = getattr(settings, 'EXPORTS_RETENTION_JOURS', 7)
+    limite = time.time() - retention_jours * 86400
+    dossier = dossier_exports()
+    for nom in os.listdir(dossier):
+        chemin = os.path.join(dossier, nom)
+        if os.path.isfile(chemin) and os.path.getmtime(chemin) < limite:
+            os.remove(chemin)
+
+
+def exporter_fichier(type_donnees, format_export='csv', utilisateur_id=None):
+    """Tâche asynchrone : produit le fichier d'export dans EXPORTS_ROOT"""
+    purger_exports()
+    if format_export == 'xlsx' and not xlsx_disponible():
+        format_export = 'csv'
+    extension, _ = FORMATS[format_export]
+    nom = f'{nom_fichier(type_donnees)}_{utilisateur_id or 0}.{extension}'
+    chemin = os.path.join(dossier_exports(), nom)
+
+    debut = time.monotonic()
+    if format_export == 'xlsx':
+        lignes = ecrire_xlsx(type_donnees, chemin)
+    else:
+        with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+            lignes = ecrire_csv(type_donnees, fichier)
+
+    logger.info(f"Export {type_donnees} ({format_export}) : {lignes} ligne(s) en {time.monotonic() - debut:.1f}s")
+    return {'fichier': nom, 'format': format_export, 'lignes': lignes}
+
+
+def lancer_export(type_donnees, format_export, utilisateur_id):
+    """Enfile l'export ; retourne la tâche (None en mode synchrone)"""
+    return enfiler(
+        'assureur.exports.exporter_fichier',
+        delai=0,
+        max_tentatives=2,
+        type_donnees=type_donnees,
+        format_export=format_export,
+        utilisateur_id=utilisateur_id,
+    )
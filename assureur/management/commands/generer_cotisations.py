@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import time
+
+from assureur.cotisations import generer_cotisations_periode, lancer_generation
+
+
+class Command(BaseCommand):
+    help = 'Génère les cotisations manquantes des membres actifs pour une période'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periode',
+            default=timezone.now().strftime('%Y-%m'),
+            help='Période au format YYYY-MM (défaut: mois en cours)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Nombre de membres par lot (défaut: COTISATIONS_BATCH_SIZE ou 2000)'
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='asynchrone',
+            help='Enfiler la génération pour le worker au lieu de l\'exécuter ici'
+        )
+
+    def handle(self, *args, **options):
+        periode = options['periode']
+
+        if options['asynchrone']:
+            lancer_generation(periode)
+            self.stdout.write(self.style.SUCCESS(f"✅ Génération {periode} enfilée pour le worker"))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"🚀 Génération des cotisations {periode}..."))
+        debut = time.monotonic()
+
+        def progression(traites, creees, total):
+            if traites:
+                self.stdout.write(f"• {traites}/{total} membre(s) traité(s), {creees} cotisation(s) créée(s)")
+
+        resultat = generer_cotisations_periode(periode, batch_size=options['batch_size'], callback=progression)
+        duree = time.monotonic() - debut
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {resultat['cotisations_creees']} cotisation(s) créée(s) pour {periode} "
+                f"({resultat['membres_traites']} membre(s)) en {duree:.2f}s"
+            )
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+import time
+
+from assureur.statistiques import calculer_buckets
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les agrégats journaliers du tableau de bord assureur'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jours',
+            type=int,
+            help='Ne recalculer que les N derniers jours (défaut: tout l\'historique)'
+        )
+
+    def handle(self, *args, **options):
+        jours = None
+        if options['jours']:
+            today = timezone.now().date()
+            jours = [today - timedelta(days=i) for i in range(options['jours'])]
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                "📊 Recalcul des statistiques journalières "
+                + (f"({options['jours']} derniers jours)..." if jours else "(historique complet)...")
+            )
+        )
+
+        debut = time.monotonic()
+        total = calculer_buckets(jours)
+        duree = time.monotonic() - debut
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} jour(s) agrégé(s) en {duree:.2f}s"))
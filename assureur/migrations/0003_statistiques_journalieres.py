@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assureur', '0002_alter_paiement_mode_paiement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='bons_en_attente',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='bons_montant',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='bons_valides',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='cotisations_emises',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='cotisations_payees',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='jour',
+            field=models.DateField(blank=True, null=True, unique=True, verbose_name='Jour agrégé'),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='membres_actifs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='membres_inactifs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='paiements_valides',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='soins_en_cours',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='soins_soumis',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='soins_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistiquesassurance',
+            name='soins_valides',
+            field=models.IntegerField(default=0),
+        ),
+    ]
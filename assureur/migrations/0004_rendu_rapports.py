@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assureur', '0003_statistiques_journalieres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='cle_cache',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='date_rendu',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='erreur_rendu',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='fichier',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='nombre_documents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='nombre_lignes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='parametres',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='rapportassureur',
+            name='statut_rendu',
+            field=models.CharField(choices=[('non_demande', 'Non demandé'), ('en_attente', 'En attente'), ('en_cours', 'En cours'), ('pret', 'Prêt'), ('echec', 'Échec')], default='non_demande', max_length=20),
+        ),
+    ]
@@ -517,6 +517,22 @@ class StatistiquesAssurance(models.Model):
         decimal_places=2, 
         default=0
     )
+
+    # === AGRÉGATS JOURNALIERS (periode = 'YYYY-MM-DD', voir assureur/statistiques.py) ===
+    jour = models.DateField(null=True, blank=True, unique=True, verbose_name="Jour agrégé")
+    membres_actifs = models.IntegerField(default=0)
+    membres_inactifs = models.IntegerField(default=0)
+    cotisations_emises = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cotisations_payees = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    paiements_valides = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    bons_montant = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    bons_en_attente = models.IntegerField(default=0)
+    bons_valides = models.IntegerField(default=0)
+    soins_total = models.IntegerField(default=0)
+    soins_valides = models.IntegerField(default=0)
+    soins_en_cours = models.IntegerField(default=0)
+    soins_soumis = models.IntegerField(default=0)
+
     date_calcul = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -581,6 +597,27 @@ class RapportAssureur(models.Model):
     )
     date_generation = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True, null=True)
+
+    # Rendu asynchrone du document (voir assureur/rapports.py)
+    class StatutRendu(models.TextChoices):
+        NON_DEMANDE = 'non_demande', 'Non demandé'
+        EN_ATTENTE = 'en_attente', 'En attente'
+        EN_COURS = 'en_cours', 'En cours'
+        PRET = 'pret', 'Prêt'
+        ECHEC = 'echec', 'Échec'
+
+    statut_rendu = models.CharField(
+        max_length=20,
+        choices=StatutRendu.choices,
+        default=StatutRendu.NON_DEMANDE
+    )
+    parametres = models.JSONField(default=dict, blank=True)
+    cle_cache = models.CharField(max_length=64, blank=True, db_index=True)
+    fichier = models.CharField(max_length=255, blank=True)
+    nombre_lignes = models.IntegerField(default=0)
+    nombre_documents = models.IntegerField(default=0)
+    date_rendu = models.DateTimeField(null=True, blank=True)
+    erreur_rendu = models.TextField(blank=True)
     
     class Meta:
         verbose_name = "Rapport Assureur"
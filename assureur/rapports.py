@@ -0,0 +1,326 @@
+# assureur/rapports.py
+"""
+Rendu asynchrone des rapports PDF (RapportAssureur et exports PDF).
+
+Les vues enregistrent un RapportAssureur (type de données, filtres de période)
+puis appellent lancer_rendu() : le document est produit par le worker de
+tâches (core.taches), jamais dans la requête. Les tableaux volumineux sont
+découpés en documents de RAPPORT_LIGNES_PAR_DOCUMENT lignes réunis dans une
+archive ZIP. Le fichier est identifié par une clé (type, filtres, version des
+données, auteur et titre, imprimés en en-tête) : un rapport identique déjà
+rendu pour le même assureur est réutilisé sans nouveau rendu, sauf pour les
+données sans champ de modification (auto_now), toujours rendues à nouveau.
+Le client interroge statut_rapport ou reçoit une notification à la fin.
+"""
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import time
+import zipfile
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from core.taches import enfiler
+from .exports import (
+    EXPORTS, FORMATS, compter_lignes, dossier_exports, ecrire_csv, entetes,
+    filtres_periode, lignes_texte, queryset_export,
+)
+from .models import Assureur, RapportAssureur
+
+logger = logging.getLogger(__name__)
+
+Statut = RapportAssureur.StatutRendu
+
+TYPES_CONTENU = {
+    '.pdf': 'application/pdf',
+    '.zip': 'application/zip',
+    '.csv': FORMATS['csv'][1],
+}
+
+
+def lignes_par_document():
+    return getattr(settings, 'RAPPORT_LIGNES_PAR_DOCUMENT', 2000)
+
+
+def dossier_rapports():
+    dossier = getattr(settings, 'RAPPORTS_ROOT', os.path.join(dossier_exports(), 'rapports'))
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+def pdf_disponible():
+    return importlib.util.find_spec('weasyprint') is not None
+
+
+def chemin_fichier(rapport):
+    return os.path.join(dossier_rapports(), os.path.basename(rapport.fichier)) if rapport.fichier else ''
+
+
+# ==========================================================================
+# CLÉ DE CACHE
+# ==========================================================================
+
+def champ_modification(type_donnees):
+    """Champ auto_now du modèle exporté, ou None"""
+    modele = EXPORTS[type_donnees]['modele']
+    return next((champ.name for champ in modele._meta.concrete_fields if getattr(champ, 'auto_now', False)), None)
+
+
+def reutilisable(type_donnees):
+    """
+    Un rendu n'est réutilisé que si la version des données voit toute
+    modification : sans champ auto_now (membres), une modification qui garde
+    le nombre de lignes et le dernier id passerait inaperçue.
+    """
+    return champ_modification(type_donnees) is not None
+
+
+def version_donnees(type_donnees, filtres=None):
+    """Empreinte des données couvertes : nombre de lignes, dernier id et dernière modification"""
+    agregats = {'total': Count('id'), 'dernier_id': Max('id')}
+    champ_maj = champ_modification(type_donnees)
+    if champ_maj:
+        agregats['derniere_maj'] = Max(champ_maj)
+    return queryset_export(type_donnees, filtres).aggregate(**agregats)
+
+
+def cle_cache(type_donnees, filtres=None, assureur_id=None, titre=''):
+    """
+    Clé (type de rapport, filtres, version des données) du document rendu.
+    L'auteur et le titre en font partie : ils sont imprimés dans l'en-tête.
+    """
+    contenu = json.dumps(
+        {
+            'type': type_donnees,
+            'assureur': assureur_id,
+            'titre': titre,
+            'format': 'pdf' if pdf_disponible() else 'csv',
+            'filtres': filtres or {},
+            'version': version_donnees(type_donnees, filtres),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(contenu.encode()).hexdigest()
+
+
+def rapport_en_cache(cle, exclure=None):
+    """Rapport déjà rendu avec la même clé dont le fichier existe encore"""
+    candidats = RapportAssureur.objects.filter(cle_cache=cle, statut_rendu=Statut.PRET).exclude(fichier='')
+    if exclure:
+        candidats = candidats.exclude(pk=exclure)
+    for rapport in candidats.order_by('-date_rendu')[:5]:
+        if os.path.exists(chemin_fichier(rapport)):
+            return rapport
+    return None
+
+
+# ==========================================================================
+# RENDU
+# ==========================================================================
+
+def _rendre_pdf(template_name, contexte):
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+
+    html_string = render_to_string(template_name, contexte)
+    return HTML(string=html_string).write_pdf(font_config=FontConfiguration())
+
+
+def _documents(type_donnees, filtres, taille):
+    """Blocs de `taille` lignes texte, lus en flux"""
+    lignes = lignes_texte(type_donnees, filtres=filtres)
+    while True:
+        bloc = list(islice(lignes, taille))
+        if not bloc:
+            return
+        yield bloc
+
+
+def ecrire_rapport(rapport, type_donnees, filtres, cle):
+    """
+    Produit le fichier du rapport : un PDF, une archive ZIP de PDF au-delà de
+    lignes_par_document() lignes, ou un CSV si WeasyPrint est absent.
+    Retourne (nom_fichier, lignes, documents).
+    """
+    definition = EXPORTS[type_donnees]
+    # L'id évite d'écraser le fichier d'un rendu de même clé non réutilisable
+    base = f'rapport_{type_donnees}_{rapport.id}_{cle[:16]}'
+
+    if not pdf_disponible():
+        nom = f'{base}.csv'
+        with open(os.path.join(dossier_rapports(), nom), 'w', newline='', encoding='utf-8') as fichier:
+            lignes = ecrire_csv(type_donnees, fichier, filtres)
+        return nom, lignes, 1
+
+    total = compter_lignes(type_donnees, filtres)
+    taille = lignes_par_document()
+    parties = max(1, -(-total // taille))
+    contexte = {
+        'titre': rapport.titre,
+        'headers': entetes(definition['champs']),
+        'date_export': timezone.now().strftime('%d/%m/%Y %H:%M'),
+        'total_items': total,
+        'assureur': Assureur.objects.filter(user_id=rapport.assureur_id).first(),
+        'parties': parties,
+    }
+    blocs = _documents(type_donnees, filtres, taille)
+
+    if parties == 1:
+        nom = f'{base}.pdf'
+        with open(os.path.join(dossier_rapports(), nom), 'wb') as fichier:
+            fichier.write(_rendre_pdf(definition['template_pdf'], {**contexte, 'data': next(blocs, []), 'partie': 1}))
+        return nom, total, 1
+
+    nom = f'{base}.zip'
+    documents = 0
+    with zipfile.ZipFile(os.path.join(dossier_rapports(), nom), 'w', zipfile.ZIP_DEFLATED) as archive:
+        for documents, bloc in enumerate(blocs, start=1):
+            archive.writestr(
+                f'{base}_partie_{documents:03d}.pdf',
+                _rendre_pdf(definition['template_pdf'], {**contexte, 'data': bloc, 'partie': documents}),
+            )
+    return nom, total, documents
+
+
+def notifier(rapport):
+    """Notification à l'auteur du rapport quand le rendu se termine"""
+    try:
+        from communication.models import Notification
+
+        if rapport.statut_rendu == Statut.PRET:
+            Notification.objects.create(
+                user_id=rapport.assureur_id,
+                titre=f"Rapport prêt : {rapport.titre}"[:200],
+                message=f"Votre rapport est disponible : {reverse('assureur:export_rapport', args=[rapport.id])}",
+                type_notification='SUCCES',
+            )
+        else:
+            Notification.objects.create(
+                user_id=rapport.assureur_id,
+                titre=f"Échec du rapport : {rapport.titre}"[:200],
+                message=rapport.erreur_rendu[:500],
+                type_notification='ERREUR',
+            )
+    except Exception as e:
+        logger.error(f"Erreur notification rapport {rapport.id}: {e}")
+
+
+def _marquer_pret(rapport, cle, fichier, lignes, documents):
+    rapport.statut_rendu = Statut.PRET
+    rapport.cle_cache = cle
+    rapport.fichier = fichier
+    rapport.nombre_lignes = lignes
+    rapport.nombre_documents = documents
+    rapport.date_rendu = timezone.now()
+    rapport.erreur_rendu = ''
+    rapport.save(update_fields=[
+        'statut_rendu', 'cle_cache', 'fichier', 'nombre_lignes', 'nombre_documents', 'date_rendu', 'erreur_rendu',
+    ])
+
+
+def rendre_rapport(rapport_id):
+    """Tâche asynchrone : rend le document du rapport ou réutilise un rendu identique"""
+    rapport = RapportAssureur.objects.filter(pk=rapport_id).first()
+    if rapport is None:
+        return {'rapport': rapport_id, 'statut': 'supprime'}
+
+    type_donnees = rapport.parametres.get('type_donnees', 'bons')
+    filtres = rapport.parametres.get('filtres', {})
+    cle = cle_cache(type_donnees, filtres, rapport.assureur_id, rapport.titre)
+
+    existant = rapport_en_cache(cle, exclure=rapport.id) if reutilisable(type_donnees) else None
+    if existant:
+        _marquer_pret(rapport, cle, existant.fichier, existant.nombre_lignes, existant.nombre_documents)
+        notifier(rapport)
+        return {'rapport': rapport.id, 'fichier': rapport.fichier, 'cache': True}
+
+    rapport.statut_rendu = Statut.EN_COURS
+    rapport.save(update_fields=['statut_rendu'])
+
+    debut = time.monotonic()
+    try:
+        fichier, lignes, documents = ecrire_rapport(rapport, type_donnees, filtres, cle)
+    except Exception as e:
+        rapport.statut_rendu = Statut.ECHEC
+        rapport.erreur_rendu = str(e)
+        rapport.save(update_fields=['statut_rendu', 'erreur_rendu'])
+        notifier(rapport)
+        raise
+
+    _marquer_pret(rapport, cle, fichier, lignes, documents)
+    logger.info(
+        f"Rapport {rapport.id} ({type_donnees}) : {lignes} ligne(s), {documents} document(s) "
+        f"en {time.monotonic() - debut:.1f}s"
+    )
+    notifier(rapport)
+    return {'rapport': rapport.id, 'fichier': fichier, 'cache': False}
+
+
+# ==========================================================================
+# API DES VUES
+# ==========================================================================
+
+def creer_rapport(utilisateur, type_donnees, periode_debut, periode_fin, filtrer_periode=True, **champs):
+    """Enregistre un rapport sur `type_donnees`, borné à la période si `filtrer_periode`"""
+    filtres = filtres_periode(type_donnees, periode_debut, periode_fin) if filtrer_periode else {}
+    return RapportAssureur.objects.create(
+        assureur=utilisateur,
+        periode_debut=periode_debut,
+        periode_fin=periode_fin,
+        parametres={
+            'type_donnees': type_donnees,
+            'filtres': {lookup: str(valeur) for lookup, valeur in filtres.items()},
+        },
+        **champs,
+    )
+
+
+def lancer_rendu(rapport):
+    """
+    Programme le rendu du rapport. Si un document identique existe déjà, il
+    est réutilisé immédiatement et aucune tâche n'est créée. Retourne la tâche
+    (None si réutilisé, fusionné ou en mode synchrone).
+    """
+    type_donnees = rapport.parametres.get('type_donnees', 'bons')
+    cle = cle_cache(type_donnees, rapport.parametres.get('filtres', {}), rapport.assureur_id, rapport.titre)
+
+    existant = rapport_en_cache(cle, exclure=rapport.id) if reutilisable(type_donnees) else None
+    if existant:
+        _marquer_pret(rapport, cle, existant.fichier, existant.nombre_lignes, existant.nombre_documents)
+        return None
+
+    rapport.statut_rendu = Statut.EN_ATTENTE
+    rapport.cle_cache = cle
+    rapport.save(update_fields=['statut_rendu', 'cle_cache'])
+    return enfiler(
+        'assureur.rapports.rendre_rapport',
+        cle=f'assureur:rapport:{rapport.id}',
+        delai=0,
+        max_tentatives=2,
+        rapport_id=rapport.id,
+    )
+
+
+def etat_rapport(rapport):
+    """État JSON du rendu pour le polling"""
+    etat = {
+        'id': rapport.id,
+        'statut': rapport.statut_rendu,
+        'pret': rapport.statut_rendu == Statut.PRET,
+        'nombre_lignes': rapport.nombre_lignes,
+        'nombre_documents': rapport.nombre_documents,
+    }
+    if rapport.statut_rendu == Statut.PRET:
+        etat['url'] = reverse('assureur:export_rapport', args=[rapport.id])
+    if rapport.statut_rendu == Statut.ECHEC:
+        etat['erreur'] = rapport.erreur_rendu
+        etat['url_relancer'] = f"{reverse('assureur:export_rapport', args=[rapport.id])}?relancer=1"
+    return etat
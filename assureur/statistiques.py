@@ -0,0 +1,204 @@
+# assureur/statistiques.py
+"""
+Agrégats journaliers matérialisés pour le tableau de bord assureur.
+
+Chaque ligne de StatistiquesAssurance avec `jour` renseigné résume une journée
+(membres inscrits, cotisations émises, paiements, bons et soins). Les vues
+additionnent ces lignes au lieu de rebalayer les tables sources ; les signaux
+ci-dessous programment le recalcul des seuls jours touchés (ancien et nouveau
+jour si la date change) via la file de tâches, et `python manage.py
+rafraichir_statistiques` reconstruit ou répare l'historique. Sans aucun
+bucket, la reconstruction complète est programmée en tâche de fond.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db import models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from agents.models import Membre
+from core.taches import enfiler
+from .models import (
+    Bon, BonDeSoin, BonPriseEnCharge, Cotisation, Paiement, Soin, StatistiquesAssurance,
+)
+
+logger = logging.getLogger(__name__)
+
+# (modèle, champ date de rattachement, agrégats par jour)
+SOURCES = [
+    (Membre, 'date_inscription', {
+        'nouveaux_membres': Count('id'),
+        'membres_actifs': Count('id', filter=Q(statut='actif')),
+        'membres_inactifs': Count('id', filter=Q(statut='inactif')),
+    }),
+    (Cotisation, 'date_emission', {
+        'cotisations_emises': Sum('montant'),
+        'cotisations_payees': Sum('montant', filter=Q(statut='payee')),
+    }),
+    (Paiement, 'date_paiement', {
+        'paiements_valides': Sum('montant', filter=Q(statut='valide')),
+    }),
+    (Bon, 'date_creation', {
+        'bons_montant': Sum('montant_total'),
+        'bons_en_attente': Count('id', filter=Q(statut='en_attente')),
+        'bons_valides': Count('id', filter=Q(statut='valide')),
+    }),
+    (Soin, 'date_soumission', {
+        'soins_total': Count('id'),
+        'soins_valides': Count('id', filter=Q(statut='valide')),
+        'soins_en_cours': Count('id', filter=Q(statut='en_cours')),
+        'soins_soumis': Count('id', filter=Q(statut='soumis')),
+    }),
+]
+
+CHAMPS_JOURNALIERS = [champ for _, _, agregats in SOURCES for champ in agregats]
+
+
+def _expression_jour(modele, champ):
+    if isinstance(modele._meta.get_field(champ), models.DateTimeField):
+        return TruncDate(champ)
+    return F(champ)
+
+
+def _agreger_par_jour(modele, champ, agregats, jours=None):
+    queryset = modele.objects.annotate(jour_stat=_expression_jour(modele, champ))
+    if jours is not None:
+        queryset = queryset.filter(jour_stat__in=jours)
+    return queryset.values('jour_stat').annotate(**agregats).order_by()
+
+
+def calculer_buckets(jours=None):
+    """
+    Recalcule les agrégats des `jours` donnés (tous les jours si None) avec
+    une requête groupée par source et un upsert en masse. Retourne le nombre
+    de jours écrits.
+    """
+    if jours is not None:
+        jours = sorted(set(jours))
+        if not jours:
+            return 0
+
+    valeurs = defaultdict(dict)
+    for modele, champ, agregats in SOURCES:
+        for ligne in _agreger_par_jour(modele, champ, agregats, jours):
+            if ligne['jour_stat'] is None:
+                continue
+            valeurs[ligne['jour_stat']].update(
+                {cle: ligne[cle] or 0 for cle in agregats}
+            )
+
+    # Les jours demandés sans activité sont remis à zéro
+    for jour in jours or []:
+        valeurs.setdefault(jour, {})
+
+    buckets = [
+        StatistiquesAssurance(jour=jour, periode=jour.isoformat(), **champs)
+        for jour, champs in valeurs.items()
+    ]
+    StatistiquesAssurance.objects.bulk_create(
+        buckets,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['jour'],
+        update_fields=CHAMPS_JOURNALIERS + ['periode', 'date_calcul'],
+    )
+
+    if jours is None:
+        # Reconstruction complète : les jours qui n'ont plus aucune donnée disparaissent
+        StatistiquesAssurance.objects.filter(jour__isnull=False).exclude(
+            jour__in=list(valeurs)
+        ).delete()
+
+    return len(buckets)
+
+
+def recalculer_jour(jour):
+    """Tâche asynchrone : recalcule le bucket d'un jour (date ISO)"""
+    return calculer_buckets([date.fromisoformat(jour)])
+
+
+def lancer_reconstruction():
+    """Programme calculer_buckets() sur tout l'historique (une seule tâche en attente)"""
+    enfiler('assureur.statistiques.calculer_buckets', cle='assureur:statistiques:reconstruction', delai=0)
+
+
+def statistiques_journalieres():
+    """
+    Queryset des buckets journaliers. S'il n'y en a encore aucun, la
+    reconstruction est programmée (jamais exécutée dans la requête) et les
+    totaux restent vides en attendant.
+    """
+    buckets = StatistiquesAssurance.objects.filter(jour__isnull=False)
+    if not buckets.exists():
+        lancer_reconstruction()
+    return buckets
+
+
+def totaux(jour_min=None, jour_max=None):
+    """Somme des agrégats journaliers sur l'intervalle [jour_min, jour_max]"""
+    buckets = statistiques_journalieres()
+    if jour_min:
+        buckets = buckets.filter(jour__gte=jour_min)
+    if jour_max:
+        buckets = buckets.filter(jour__lte=jour_max)
+    resultat = buckets.aggregate(**{champ: Sum(champ) for champ in CHAMPS_JOURNALIERS})
+    return {champ: valeur or 0 for champ, valeur in resultat.items()}
+
+
+# ==========================================================================
+# INVALIDATION
+# ==========================================================================
+
+def _jour(valeur):
+    if isinstance(valeur, datetime):
+        return timezone.localtime(valeur).date() if timezone.is_aware(valeur) else valeur.date()
+    return valeur
+
+
+def enfiler_recalcul_jour(jour):
+    """Un seul recalcul par jour pendant la fenêtre de coalescence"""
+    enfiler(
+        'assureur.statistiques.recalculer_jour',
+        cle=f'assureur:statistiques:{jour.isoformat()}',
+        jour=jour.isoformat(),
+    )
+
+
+def _receveurs(champ):
+    def memoriser_jour(sender, instance, raw=False, **kwargs):
+        """Jour de rattachement avant modification : il doit être recalculé lui aussi"""
+        if raw or instance._state.adding:
+            return
+        ancien = sender._base_manager.filter(pk=instance.pk).values_list(champ, flat=True).first()
+        instance._jour_statistiques_precedent = _jour(ancien)
+
+    def programmer_recalcul(sender, instance, **kwargs):
+        jours = {_jour(getattr(instance, champ, None)), instance.__dict__.pop('_jour_statistiques_precedent', None)}
+        for jour in filter(None, jours):
+            try:
+                enfiler_recalcul_jour(jour)
+            except Exception as e:
+                logger.error(f"Erreur programmation statistiques {sender.__name__}: {e}")
+
+    return memoriser_jour, programmer_recalcul
+
+
+_RECEVEURS = {}
+
+
+def connecter_signaux():
+    """Branche pre_save/post_save/post_delete des modèles sources (appelé dans AppConfig.ready)"""
+    sources = [(modele, champ) for modele, champ, _ in SOURCES]
+    # Les sous-classes multi-tables de Bon émettent leurs propres signaux
+    sources += [(BonPriseEnCharge, 'date_creation'), (BonDeSoin, 'date_creation')]
+
+    for modele, champ in sources:
+        memoriser_jour, receveur = _RECEVEURS.setdefault(modele, _receveurs(champ))
+        uid = f'assureur_statistiques_{modele._meta.label_lower}'
+        pre_save.connect(memoriser_jour, sender=modele, dispatch_uid=uid)
+        post_save.connect(receveur, sender=modele, dispatch_uid=uid)
+        post_delete.connect(receveur, sender=modele, dispatch_uid=uid)
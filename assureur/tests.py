@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal
 
-from assureur.models import Membre, Bon, Cotisation, Assureur
+from assureur.models import Membre, Bon, Cotisation, Assureur, RapportAssureur
 
 class AssureurTests(TestCase):
     
@@ -64,4 +64,310 @@ class AssureurTests(TestCase):
         self.membre.save()
         
         montant_enceinte = self.membre.montant_cotisation_mensuelle()
-        self.assertEqual(montant_enceinte, Decimal('7500.00'))
\ No newline at end of file
+        self.assertEqual(montant_enceinte, Decimal('7500.00'))
+
+class StatistiquesJournalieresTests(TestCase):
+
+    def setUp(self):
+        from agents.models import Membre as MembreAgent
+        self.membre = MembreAgent.objects.create(nom='Kone', prenom='Awa', numero_unique='ST001')
+        self.today = timezone.now().date()
+        Cotisation.objects.create(
+            membre=self.membre, periode=self.today.strftime('%Y-%m'), montant=Decimal('5000'),
+            date_echeance=self.today, statut='payee'
+        )
+
+    def test_buckets_et_recalcul_du_jour(self):
+        from assureur.statistiques import calculer_buckets, recalculer_jour, totaux
+        from assureur.models import StatistiquesAssurance
+        from core.models import TacheAsynchrone
+
+        calculer_buckets()
+        bucket = StatistiquesAssurance.objects.get(jour=self.today)
+        self.assertEqual(bucket.periode, self.today.isoformat())
+        self.assertEqual(bucket.nouveaux_membres, 1)
+        self.assertEqual(bucket.cotisations_payees, Decimal('5000'))
+
+        # Une modification programme le recalcul de ce seul jour
+        Cotisation.objects.filter(membre=self.membre).get().delete()
+        self.assertTrue(
+            TacheAsynchrone.objects.filter(cle=f'assureur:statistiques:{self.today.isoformat()}').exists()
+        )
+        recalculer_jour(self.today.isoformat())
+
+        resultat = totaux(jour_min=self.today.replace(day=1))
+        self.assertEqual(resultat['cotisations_emises'], 0)
+        self.assertEqual(resultat['membres_actifs'], 1)
+
+    def test_sans_bucket_reconstruction_en_tache(self):
+        from assureur.models import StatistiquesAssurance
+        from assureur.statistiques import totaux
+        from core.models import TacheAsynchrone
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(totaux()['cotisations_emises'], 0)
+        # Aucune table source balayée dans la requête
+        self.assertFalse([requete for requete in requetes.captured_queries if Cotisation._meta.db_table in requete['sql']])
+        self.assertFalse(StatistiquesAssurance.objects.exists())
+        tache = TacheAsynchrone.objects.get(cle='assureur:statistiques:reconstruction')
+        self.assertEqual(tache.nom, 'assureur.statistiques.calculer_buckets')
+
+    def test_changement_de_jour_recalcule_les_deux_jours(self):
+        from datetime import timedelta
+        from core.models import TacheAsynchrone
+
+        cotisation = Cotisation.objects.get(membre=self.membre)
+        hier = self.today - timedelta(days=1)
+        TacheAsynchrone.objects.all().delete()
+        cotisation.date_emission = hier
+        cotisation.save()
+        self.assertEqual(
+            set(TacheAsynchrone.objects.filter(nom='assureur.statistiques.recalculer_jour').values_list('cle', flat=True)),
+            {f'assureur:statistiques:{jour.isoformat()}' for jour in (self.today, hier)},
+        )
+
+
+class GenerationCotisationsTests(TestCase):
+
+    def setUp(self):
+        from agents.models import Membre as MembreAgent
+        self.membres = [
+            MembreAgent.objects.create(nom=f'Membre{i}', prenom='Test', numero_unique=f'GC00{i}', cmu_option=(i == 0))
+            for i in range(3)
+        ]
+        Cotisation.objects.create(
+            membre=self.membres[2], periode='2026-02', montant=Decimal('5000'), date_echeance=date(2026, 2, 28)
+        )
+
+    def test_generation_ensembliste_idempotente(self):
+        from assureur.cotisations import generer_cotisations_periode, progression_generation
+
+        # 2 comptages + (lecture, insertion, recomptage) par lot + lecture de fin
+        # + enfilage du recalcul des statistiques, fusionné avec celui du setUp
+        with self.assertNumQueries(10):
+            resultat = generer_cotisations_periode('2026-02', batch_size=10, callback=lambda *a: None)
+        self.assertEqual(resultat['cotisations_creees'], 2)
+        self.assertEqual(progression_generation('2026-02')['statut'], 'terminee')
+
+        cmu = Cotisation.objects.get(membre=self.membres[0], periode='2026-02')
+        self.assertEqual(cmu.montant, Decimal('7500.00'))
+        self.assertEqual(cmu.type_cotisation, 'femme_enceinte')
+        self.assertEqual(cmu.date_echeance, date(2026, 2, 28))
+
+        self.assertEqual(generer_cotisations_periode('2026-02')['cotisations_creees'], 0)
+        self.assertEqual(Cotisation.objects.filter(periode='2026-02').count(), 3)
+
+
+class ExportsTests(TestCase):
+
+    def setUp(self):
+        import tempfile
+        from agents.models import Membre as MembreAgent
+        self.dossier = tempfile.mkdtemp()
+        for i in range(5):
+            membre = MembreAgent.objects.create(nom=f'Export{i}', prenom='Test', numero_unique=f'EX00{i}')
+            Cotisation.objects.create(
+                membre=membre, periode='2026-03', montant=Decimal('5000'), date_echeance=date(2026, 3, 31)
+            )
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def test_flux_csv_par_lots(self):
+        from assureur.exports import flux_csv
+
+        # Une requête par lot de l'itérateur, aucun accès par ligne
+        with self.assertNumQueries(1):
+            blocs = list(flux_csv('cotisations', lignes_par_bloc=2))
+        lignes = ''.join(blocs).splitlines()
+        self.assertEqual(len(blocs), 3)
+        self.assertEqual(lignes[0], 'Reference;Membre - Nom;Membre - Prenom;Periode;Montant;Statut;Date Emission;Date Echeance')
+        self.assertEqual(len(lignes), 6)
+        self.assertIn(';Test;2026-03;5000.00;due;', lignes[1])
+
+    def test_export_volumineux_en_tache_de_fond(self):
+        import os
+        from django.test import override_settings
+        from assureur.exports import exporter_fichier, lancer_export
+        from core.models import TacheAsynchrone
+
+        with override_settings(EXPORTS_ROOT=self.dossier):
+            utilisateur = User.objects.create_user(username='export_user', password='testpass123')
+            tache = lancer_export('membres', 'csv', utilisateur.id)
+            self.assertEqual(tache.statut, TacheAsynchrone.Statut.EN_ATTENTE)
+
+            resultat = exporter_fichier(**tache.parametres)
+            self.assertEqual(resultat['lignes'], 5)
+            with open(os.path.join(self.dossier, resultat['fichier']), encoding='utf-8') as fichier:
+                self.assertEqual(len(fichier.read().splitlines()), 6)
+
+    def test_xlsx_memoire_constante(self):
+        import io
+        from assureur.exports import ecrire_xlsx, xlsx_disponible
+
+        if not xlsx_disponible():
+            self.skipTest("XlsxWriter non installé")
+        fichier = io.BytesIO()
+        self.assertEqual(ecrire_xlsx('cotisations', fichier), 5)
+        self.assertTrue(fichier.getvalue().startswith(b'PK'))
+
+
+class RenduRapportsTests(TestCase):
+
+    def setUp(self):
+        import tempfile
+        from agents.models import Membre as MembreAgent
+        self.dossier = tempfile.mkdtemp()
+        self.utilisateur = User.objects.create_user(username='rapport_user', password='testpass123')
+        for i in range(5):
+            membre = MembreAgent.objects.create(nom=f'Rapport{i}', prenom='Test', numero_unique=f'RP00{i}')
+            Cotisation.objects.create(
+                membre=membre, periode='2026-03', montant=Decimal('5000'), date_echeance=date(2026, 3, 31)
+            )
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def _rapport(self, utilisateur=None, titre='Cotisations'):
+        from assureur.rapports import creer_rapport
+        return creer_rapport(
+            utilisateur or self.utilisateur, 'cotisations', date(2026, 3, 1), date(2026, 3, 31),
+            filtrer_periode=False, titre=titre, type_rapport='SPECIAL',
+        )
+
+    def test_rendu_en_tache_puis_cache(self):
+        import os
+        from django.test import override_settings
+        from assureur.rapports import chemin_fichier, lancer_rendu, rendre_rapport
+        from core.models import TacheAsynchrone
+
+        with override_settings(RAPPORTS_ROOT=self.dossier):
+            rapport = self._rapport()
+            tache = lancer_rendu(rapport)
+            self.assertEqual(tache.statut, TacheAsynchrone.Statut.EN_ATTENTE)
+            self.assertEqual(rapport.statut_rendu, RapportAssureur.StatutRendu.EN_ATTENTE)
+
+            self.assertFalse(rendre_rapport(**tache.parametres)['cache'])
+            rapport.refresh_from_db()
+            self.assertEqual(rapport.statut_rendu, RapportAssureur.StatutRendu.PRET)
+            self.assertEqual(rapport.nombre_lignes, 5)
+            self.assertTrue(os.path.exists(chemin_fichier(rapport)))
+
+            # Même type, mêmes filtres, mêmes données : aucun nouveau rendu
+            identique = self._rapport()
+            self.assertIsNone(lancer_rendu(identique))
+            self.assertEqual(identique.statut_rendu, RapportAssureur.StatutRendu.PRET)
+            self.assertEqual(identique.fichier, rapport.fichier)
+
+            # En-tête propre à l'auteur et au titre : pas de réutilisation
+            autre = User.objects.create_user(username='autre_assureur', password='testpass123')
+            self.assertIsNotNone(lancer_rendu(self._rapport(utilisateur=autre)))
+            self.assertIsNotNone(lancer_rendu(self._rapport(titre='Cotisations de mars')))
+
+            # Les données changent : la clé aussi
+            Cotisation.objects.filter(membre__numero_unique='RP000').update(statut='payee')
+            Cotisation.objects.filter(membre__numero_unique='RP000').first().save()
+            self.assertIsNotNone(lancer_rendu(self._rapport()))
+
+    def test_rapport_membres_jamais_reutilise(self):
+        from django.test import override_settings
+        from assureur.rapports import creer_rapport, lancer_rendu, rendre_rapport
+
+        with override_settings(RAPPORTS_ROOT=self.dossier):
+            def rapport_membres():
+                return creer_rapport(
+                    self.utilisateur, 'membres', date(2026, 3, 1), date(2026, 3, 31),
+                    filtrer_periode=False, titre='Membres', type_rapport='SPECIAL',
+                )
+            premier = rapport_membres()
+            rendre_rapport(lancer_rendu(premier).parametres['rapport_id'])
+            # Pas de champ auto_now : une modification pourrait passer inaperçue
+            second = rapport_membres()
+            self.assertIsNotNone(lancer_rendu(second))
+            premier.refresh_from_db()
+            self.assertNotEqual(rendre_rapport(second.id)['fichier'], premier.fichier)
+
+    def test_echec_relance_seulement_sur_demande(self):
+        from django.contrib.auth.models import Group
+        from django.test import override_settings
+        from django.urls import reverse
+        from core.models import TacheAsynchrone
+
+        self.utilisateur.groups.add(Group.objects.create(name='assureur'))
+        self.client.force_login(self.utilisateur)
+        rapport = self._rapport()
+        rapport.statut_rendu = RapportAssureur.StatutRendu.ECHEC
+        rapport.erreur_rendu = 'WeasyPrint indisponible'
+        rapport.save()
+        url = reverse('assureur:export_rapport', args=[rapport.id])
+
+        with override_settings(RAPPORTS_ROOT=self.dossier):
+            for _ in range(2):
+                etat = self.client.get(url, secure=True).json()
+            self.assertEqual((etat['success'], etat['statut']), (False, RapportAssureur.StatutRendu.ECHEC))
+            self.assertFalse(TacheAsynchrone.objects.filter(nom='assureur.rapports.rendre_rapport').exists())
+
+            reponse = self.client.get(etat['url_relancer'], secure=True)
+            self.assertEqual(reponse.status_code, 202)
+            self.assertEqual(TacheAsynchrone.objects.filter(nom='assureur.rapports.rendre_rapport').count(), 1)
+
+    def test_decoupage_en_plusieurs_documents(self):
+        import os
+        import zipfile
+        from unittest import mock
+        from django.test import override_settings
+        from assureur.rapports import chemin_fichier, rendre_rapport
+
+        with override_settings(RAPPORTS_ROOT=self.dossier, RAPPORT_LIGNES_PAR_DOCUMENT=2), \
+                mock.patch('assureur.rapports.pdf_disponible', return_value=True), \
+                mock.patch('assureur.rapports._rendre_pdf', return_value=b'%PDF-1.7') as rendre_pdf:
+            rapport = self._rapport()
+            rendre_rapport(rapport.id)
+            rapport.refresh_from_db()
+
+            self.assertEqual(rapport.nombre_documents, 3)
+            self.assertEqual(rendre_pdf.call_count, 3)
+            self.assertEqual([len(appel.args[1]['data']) for appel in rendre_pdf.call_args_list], [2, 2, 1])
+            with zipfile.ZipFile(chemin_fichier(rapport)) as archive:
+                self.assertEqual(len(archive.namelist()), 3)
+            self.assertTrue(os.path.exists(chemin_fichier(rapport)))
+
+    def test_polling_puis_telechargement(self):
+        from django.contrib.auth.models import Group
+        from django.test import override_settings
+        from django.urls import reverse
+        from assureur.rapports import rendre_rapport
+
+        self.utilisateur.groups.add(Group.objects.create(name='assureur'))
+        self.client.force_login(self.utilisateur)
+
+        with override_settings(RAPPORTS_ROOT=self.dossier):
+            rapport = self._rapport()
+            reponse = self.client.get(reverse('assureur:export_rapport', args=[rapport.id]), secure=True)
+            self.assertEqual(reponse.status_code, 202)
+            self.assertEqual(reponse.json()['statut'], RapportAssureur.StatutRendu.EN_ATTENTE)
+
+            rendre_rapport(rapport.id)
+            etat = self.client.get(reverse('assureur:statut_rapport', args=[rapport.id]), secure=True).json()
+            self.assertTrue(etat['pret'])
+
+            reponse = self.client.get(etat['url'], secure=True)
+            self.assertEqual(reponse.status_code, 200)
+            self.assertIn('attachment', reponse['Content-Disposition'])
+            reponse.close()
+
+
+class RechercheMembreApiTests(TestCase):
+
+    def test_recherche_par_email(self):
+        from django.urls import reverse
+
+        membre = Membre.objects.create(nom='Koné', prenom='Awa', email='awa.kone@exemple.ci')
+        self.client.force_login(User.objects.create_user(username='assureur', password='testpass123'))
+        reponse = self.client.get(reverse('assureur:api_recherche_membre'), {'q': 'Awa.Kone@exemple.ci'}, secure=True)
+        self.assertEqual([resultat['id'] for resultat in reponse.json()['membres']], [membre.id])
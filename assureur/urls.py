@@ -63,6 +63,7 @@ urlpatterns = [
          views.enregistrer_paiement_cotisation, 
          name='enregistrer_paiement_cotisation'),
     path('cotisations/preview/', views.preview_generation, name='preview_generation'),
+    path('cotisations/generer/progression/', views.progression_generation_cotisations, name='progression_generation_cotisations'),
 
         # Nouvelles URLs pour gestion individuelle
     path('cotisations/creer/', views.creer_cotisation_membre, name='creer_cotisation'),
@@ -79,6 +80,7 @@ urlpatterns = [
     path('rapports/generer/', views.generer_rapport, name='generer_rapport'),
     path('rapports/<int:rapport_id>/', views.detail_rapport, name='detail_rapport'),
     path('rapports/<int:rapport_id>/export/', views.export_rapport, name='export_rapport'),
+    path('rapports/<int:rapport_id>/statut/', views.statut_rapport, name='statut_rapport'),
     path('rapport-statistiques/', views.statistiques_assureur, name='rapport_statistiques'),
     
     # ==========================================================================
@@ -104,6 +106,7 @@ urlpatterns = [
     # EXPORT DE DONNÉES
     # ==========================================================================
     path('export/<str:type_donnees>/', views.export_donnees, name='export_donnees'),
+    path('exports/<int:tache_id>/telecharger/', views.telecharger_export, name='telecharger_export'),
     
     
     # ==========================================================================
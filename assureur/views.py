@@ -3,14 +3,15 @@ VUES ASSUREUR - Version avec diagnostic détaillé
 """
 from functools import wraps
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
+from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
 import csv
 import traceback
@@ -18,7 +19,11 @@ from decimal import Decimal
 from .forms import PaiementForm
 from django.template.loader import render_to_string
 import os
+import tempfile
 from django.db.models import Sum, Count, Avg, Q, F, ExpressionWrapper, DurationField
+from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,6 +40,17 @@ from assureur.models import (
     Assureur, Bon, Soin, Paiement, Cotisation, 
     StatistiquesAssurance, ConfigurationAssurance, RapportAssureur
 )
+from assureur.cotisations import lancer_generation, membres_sans_cotisation, progression_generation
+from assureur.exports import (
+    EXPORTS, FORMATS, compter_lignes, dossier_exports, ecrire_xlsx, flux_csv,
+    lancer_export, nom_fichier, seuil_arriere_plan, xlsx_disponible,
+)
+from assureur.rapports import (
+    TYPES_CONTENU, chemin_fichier, creer_rapport, etat_rapport, lancer_rendu,
+)
+from assureur.statistiques import statistiques_journalieres, totaux
+from core.models import TacheAsynchrone
+from membres.recherche import rechercher_membres
 from medecin.models import Ordonnance
 from django.contrib.auth.models import User, Group
 
@@ -1020,91 +1036,21 @@ def generer_cotisations(request):
             periode_input = request.POST.get('periode', mois_courant)
             periode = normaliser_periode(periode_input)
             
-            print(f"DEBUG: Génération pour la période: {periode}")
-            print(f"DEBUG: Membres actifs: {membres_actifs_count}")
-            print(f"DEBUG: Cotisations existantes pour {periode}: {Cotisation.objects.filter(periode=periode).count()}")
-            
-            # Générer les cotisations pour les membres sans cotisation pour cette période
-            membres_sans_cotisation = []
-            for membre in membres_actifs:
-                if not Cotisation.objects.filter(membre=membre, periode=periode).exists():
-                    membres_sans_cotisation.append(membre)
-            
-            created_count = 0
-            errors = []
-            
-            for membre in membres_sans_cotisation:
-                try:
-                    # Calculer les dates
-                    date_emission = datetime.now().date()
-                    
-                    # Calculer la date d'échéance (fin du mois de la période)
-                    if len(periode) == 7:
-                        try:
-                            year, month = map(int, periode.split('-'))
-                            # Premier jour du mois suivant
-                            if month == 12:
-                                next_month = datetime(year+1, 1, 1)
-                            else:
-                                next_month = datetime(year, month+1, 1)
-                            # Dernier jour du mois courant
-                            date_echeance = (next_month - timedelta(days=1)).date()
-                        except:
-                            # Fallback: échéance dans 30 jours
-                            date_echeance = date_emission + timedelta(days=30)
-                    else:
-                        date_echeance = date_emission + timedelta(days=30)
-                    
-                    # Déterminer le type de cotisation et le montant
-                    # CORRECTION: Utiliser cmu_option au lieu de est_femme_enceinte
-                    if hasattr(membre, 'cmu_option') and membre.cmu_option:
-                        type_cotisation = 'femme_enceinte'
-                        montant = Decimal('7500.00')
-                    else:
-                        type_cotisation = 'normale'
-                        montant = Decimal('5000.00')
-                    
-                    # Créer la référence - CORRECTION: Utiliser numero_unique
-                    ref_mois = periode.replace('-', '')
-                    reference = f"COT-{membre.numero_unique}-{ref_mois}"
-                    
-                    # Créer la cotisation
-                    cotisation = Cotisation(
-                        membre=membre,
-                        periode=periode,
-                        montant=montant,
-                        statut='due',
-                        date_emission=date_emission,
-                        date_echeance=date_echeance,
-                        type_cotisation=type_cotisation,
-                        reference=reference,
-                        enregistre_par=request.user if request.user.is_authenticated else None,
-                        notes='Générée automatiquement',
-                        # Champs obligatoires avec valeurs par défaut
-                        montant_clinique=Decimal('0.00'),
-                        montant_pharmacie=Decimal('0.00'),
-                        montant_charges_mutuelle=Decimal('0.00'),
-                    )
-                    
-                    # Sauvegarder
-                    cotisation.save()
-                    
-                    print(f"DEBUG: Cotisation créée - Réf: {reference}, Membre: {membre.nom}, Type: {type_cotisation}, Montant: {montant}")
-                    created_count += 1
-                    
-                except Exception as e:
-                    error_msg = f"Erreur pour {membre.nom}: {str(e)}"
-                    errors.append(error_msg)
-                    print(f"DEBUG: {error_msg}")
-                    traceback.print_exc()
-                    continue
-            
-            if errors:
-                messages.warning(request, f"Génération partielle. {created_count} cotisation(s) créée(s), {len(errors)} erreur(s).")
-                for error in errors[:3]:
-                    messages.warning(request, error)
+            # Génération ensembliste en tâche de fond (assureur/cotisations.py)
+            lancer_generation(
+                periode,
+                enregistre_par_id=request.user.id if request.user.is_authenticated else None,
+            )
+            progression = progression_generation(periode) or {}
+            if progression.get('statut') == 'terminee':
+                # Mode synchrone (TACHES_MODE_SYNCHRONE) : déjà exécutée
+                messages.success(request, f"{progression['creees']} cotisation(s) générée(s) pour {periode}")
             else:
-                messages.success(request, f'{created_count} cotisation(s) générée(s) pour {periode}')
+                messages.success(
+                    request,
+                    f"Génération des cotisations {periode} lancée en arrière-plan "
+                    f"({a_generer_count} membre(s) estimé(s))"
+                )
             
             return redirect('assureur:liste_cotisations')
         
@@ -1123,6 +1069,17 @@ def generer_cotisations(request):
         messages.error(request, f'Erreur lors de la génération: {str(e)}')
         return redirect('assureur:dashboard')
 
+@login_required
+@assureur_required
+@require_GET
+def progression_generation_cotisations(request):
+    """Progression JSON de la génération en arrière-plan d'une période"""
+    periode = normaliser_periode(request.GET.get('periode'))
+    progression = progression_generation(periode)
+    if progression is None:
+        return JsonResponse({'success': False, 'periode': periode, 'message': 'Aucune génération connue'}, status=404)
+    return JsonResponse({'success': True, **progression})
+
 @login_required
 @assureur_required
 def preview_generation(request):
@@ -1130,18 +1087,15 @@ def preview_generation(request):
     periode_input = request.GET.get('periode', timezone.now().strftime('%Y-%m'))
     periode = normaliser_periode(periode_input)
     
-    # Récupérer les membres actifs sans cotisation pour cette période
-    membres_a_generer = []
-    for membre in Membre.objects.filter(statut='actif'):
-        if not Cotisation.objects.filter(membre=membre, periode=periode).exists():
-            membres_a_generer.append(membre)
+    # Membres actifs sans cotisation pour cette période (un seul anti-join)
+    a_generer = membres_sans_cotisation(periode).order_by('nom', 'prenom')
     
     data = {
         'periode': periode,
         'total_membres_actifs': Membre.objects.filter(statut='actif').count(),
         'cotisations_existantes': Cotisation.objects.filter(periode=periode).count(),
-        'total_a_generer': len(membres_a_generer),
-        'membres_a_generer': membres_a_generer,
+        'total_a_generer': a_generer.count(),
+        'membres_a_generer': a_generer[:100],
     }
     
     return render(request, 'assureur/includes/preview_content.html', data)
@@ -1748,37 +1702,29 @@ def statistiques_assureur(request):
         one_year_ago = today - timedelta(days=365)
         one_month_ago = today - timedelta(days=30)
         
-        # 1. Statistiques de base (robuste)
+        # 1. Statistiques de base, lues dans les agrégats journaliers
+        #    (assureur/statistiques.py) au lieu de rebalayer les tables sources
+        tout = totaux()
+        annee = totaux(jour_min=one_year_ago)
+        mois_courant = totaux(jour_min=today.replace(day=1))
         stats = {
             'membres': {
-                'total': Membre.objects.count(),
-                'actifs': Membre.objects.filter(statut='actif').count(),
-                'inactifs': Membre.objects.filter(statut='inactif').count(),
-                'nouveaux_mois': Membre.objects.filter(
-                    date_inscription__gte=one_month_ago
-                ).count(),
+                'total': tout['nouveaux_membres'],
+                'actifs': tout['membres_actifs'],
+                'inactifs': tout['membres_inactifs'],
+                'nouveaux_mois': totaux(jour_min=one_month_ago)['nouveaux_membres'],
             },
             'financier': {
-                'cotisations_total': Cotisation.objects.filter(
-                    date_emission__gte=one_year_ago
-                ).aggregate(total=Sum('montant'))['total'] or 0,
-                'cotisations_mois': Cotisation.objects.filter(
-                    date_emission__month=today.month,
-                    date_emission__year=today.year
-                ).aggregate(total=Sum('montant'))['total'] or 0,
-                'paiements_total': Paiement.objects.filter(
-                    date_paiement__gte=one_year_ago,
-                    statut='valide'
-                ).aggregate(total=Sum('montant'))['total'] or 0,
-                'bons_total': Bon.objects.filter(
-                    date_creation__gte=one_year_ago
-                ).aggregate(total=Sum('montant_total'))['total'] or 0,
+                'cotisations_total': annee['cotisations_emises'],
+                'cotisations_mois': mois_courant['cotisations_emises'],
+                'paiements_total': annee['paiements_valides'],
+                'bons_total': annee['bons_montant'],
             },
             'traitement': {
-                'soins_total': Soin.objects.count(),
-                'soins_valides': Soin.objects.filter(statut='valide').count(),
-                'soins_en_cours': Soin.objects.filter(statut='en_cours').count(),
-                'soins_soumis': Soin.objects.filter(statut='soumis').count(),
+                'soins_total': tout['soins_total'],
+                'soins_valides': tout['soins_valides'],
+                'soins_en_cours': tout['soins_en_cours'],
+                'soins_soumis': tout['soins_soumis'],
             }
         }
         
@@ -1793,42 +1739,55 @@ def statistiques_assureur(request):
             
         # Taux de recouvrement
         if stats['financier']['cotisations_total'] > 0:
-            cotisations_payees = Cotisation.objects.filter(
-                date_emission__gte=one_year_ago,
-                statut='payee'
-            ).aggregate(total=Sum('montant'))['total'] or 0
             stats['financier']['taux_recouvrement'] = round(
-                (cotisations_payees / stats['financier']['cotisations_total']) * 100, 1
+                (annee['cotisations_payees'] / stats['financier']['cotisations_total']) * 100, 1
             )
         else:
             stats['financier']['taux_recouvrement'] = 0
         
-        # 3. Membres avec cotisations (avec vérification)
-        try:
-            # Vérifier si la relation 'cotisations' existe
-            membres_avec_cot = Membre.objects.filter(
-                cotisations__isnull=False
-            ).distinct().count()
-            stats['membres']['avec_cotisations'] = membres_avec_cot
-        except FieldError:
-            # Alternative: compter via le modèle Cotisation
-            membres_avec_cot = Cotisation.objects.values('membre').distinct().count()
-            stats['membres']['avec_cotisations'] = membres_avec_cot
-        
-        # 4. Top 5 cotisants
+        # 3 et 4. Membres avec cotisations et top 5 cotisants : pas de dimension
+        # journalière, mis en cache quelques minutes
+        def classement_cotisants():
+            return {
+                'avec_cotisations': Cotisation.objects.values('membre').distinct().count(),
+                'top_cotisants': list(
+                    Cotisation.objects.values('membre__nom', 'membre__prenom').annotate(
+                        total=Sum('montant'),
+                        count=Count('id')
+                    ).order_by('-total')[:5]
+                ),
+            }
+
         try:
-            top_cotisants = Cotisation.objects.values(
-                'membre__nom', 'membre__prenom'
-            ).annotate(
-                total=Sum('montant'),
-                count=Count('id')
-            ).order_by('-total')[:5]
-            stats['top_cotisants'] = list(top_cotisants)
+            classement = cache.get_or_set(
+                'assureur:statistiques:classement_cotisants',
+                classement_cotisants,
+                getattr(settings, 'STATISTIQUES_CACHE_TIMEOUT', 300),
+            )
         except Exception as e:
             logger.error(f"Erreur top cotisants: {e}")
-            stats['top_cotisants'] = []
-        
-        # 5. Évolution des 6 derniers mois
+            classement = {'avec_cotisations': 0, 'top_cotisants': []}
+        stats['membres']['avec_cotisations'] = classement['avec_cotisations']
+        stats['top_cotisants'] = classement['top_cotisants']
+        
+        # 5. Évolution des 6 derniers mois : une requête groupée par mois
+        mois, annee_debut = today.month - 5, today.year
+        while mois <= 0:
+            mois += 12
+            annee_debut -= 1
+        debut_evolution = date(annee_debut, mois, 1)
+
+        par_mois = {
+            ligne['mois']: ligne
+            for ligne in statistiques_journalieres().filter(
+                jour__gte=debut_evolution
+            ).annotate(mois=TruncMonth('jour')).values('mois').annotate(
+                cotisations=Sum('cotisations_emises'),
+                membres=Sum('nouveaux_membres'),
+                paiements=Sum('paiements_valides'),
+            ).order_by()
+        }
+
         evolution = []
         for i in range(6):
             mois = today.month - i
@@ -1838,29 +1797,14 @@ def statistiques_assureur(request):
                 mois += 12
                 annee -= 1
             
-            mois_debut = datetime(annee, mois, 1).date()
-            if mois == 12:
-                mois_fin = datetime(annee + 1, 1, 1).date() - timedelta(days=1)
-            else:
-                mois_fin = datetime(annee, mois + 1, 1).date() - timedelta(days=1)
-            
-            mois_stats = {
+            mois_debut = date(annee, mois, 1)
+            ligne = par_mois.get(mois_debut, {})
+            evolution.append({
                 'mois': mois_debut.strftime('%b %Y'),
-                'cotisations': Cotisation.objects.filter(
-                    date_emission__gte=mois_debut,
-                    date_emission__lte=mois_fin
-                ).aggregate(total=Sum('montant'))['total'] or 0,
-                'membres': Membre.objects.filter(
-                    date_inscription__gte=mois_debut,
-                    date_inscription__lte=mois_fin
-                ).count(),
-                'paiements': Paiement.objects.filter(
-                    date_paiement__gte=mois_debut,
-                    date_paiement__lte=mois_fin,
-                    statut='valide'
-                ).aggregate(total=Sum('montant'))['total'] or 0,
-            }
-            evolution.append(mois_stats)
+                'cotisations': ligne.get('cotisations') or 0,
+                'membres': ligne.get('membres') or 0,
+                'paiements': ligne.get('paiements') or 0,
+            })
         
         evolution.reverse()  # Du plus ancien au plus récent
         
@@ -1899,30 +1843,24 @@ def api_statistiques(request):
         # if assureur:
         #     filtres['assureur'] = assureur
         
-        # Statistiques en temps réel
+        # Statistiques issues des agrégats journaliers ; seul le retard, qui
+        # dépend de la date du jour, est compté en direct
+        today = timezone.now().date()
+        tout = totaux()
         stats = {
-            'membres_actifs': Membre.objects.filter(statut='actif', **filtres).count(),
-            'membres_total': Membre.objects.filter(**filtres).count(),
-            'bons_en_attente': Bon.objects.filter(statut='en_attente', **filtres).count(),
-            'bons_valides': Bon.objects.filter(statut='valide', **filtres).count(),
+            'membres_actifs': tout['membres_actifs'],
+            'membres_total': tout['nouveaux_membres'],
+            'bons_en_attente': tout['bons_en_attente'],
+            'bons_valides': tout['bons_valides'],
             'cotisations_en_retard': Cotisation.objects.filter(
                 statut='en_retard', 
-                date_echeance__lt=timezone.now().date(),
+                date_echeance__lt=today,
                 **filtres
             ).count(),
-            'cotisations_payees_mois': Cotisation.objects.filter(
-                statut='payee',
-                date_emission__month=timezone.now().month,
-                date_emission__year=timezone.now().year,
-                **filtres
-            ).aggregate(total=Sum('montant'))['total'] or 0,
-            'montant_total_bons': Bon.objects.filter(**filtres).aggregate(
-                total=Sum('montant_total')
-            )['total'] or 0,
-            'montant_total_cotisations': Cotisation.objects.filter(**filtres).aggregate(
-                total=Sum('montant')
-            )['total'] or 0,
-            'soins_en_cours': Soin.objects.filter(statut='en_cours', **filtres).count(),
+            'cotisations_payees_mois': totaux(jour_min=today.replace(day=1))['cotisations_payees'],
+            'montant_total_bons': tout['bons_montant'],
+            'montant_total_cotisations': tout['cotisations_emises'],
+            'soins_en_cours': tout['soins_en_cours'],
         }
         
         # Ajouter des timestamps pour le rafraîchissement
@@ -2034,16 +1972,23 @@ def generer_rapport(request):
         try:
             data = request.POST
             
-            rapport = RapportAssureur.objects.create(
-                titre=data.get('titre', f"Rapport {timezone.now().strftime('%Y-%m-%d')}"),
-                assureur=request.user,
-                type_rapport=data.get('type_rapport', 'MENSUEL'),
+            type_donnees = data.get('type_donnees', 'bons')
+            if type_donnees not in EXPORTS:
+                type_donnees = 'bons'
+            
+            rapport = creer_rapport(
+                request.user,
+                type_donnees,
                 periode_debut=datetime.strptime(data.get('periode_debut'), '%Y-%m-%d').date() if data.get('periode_debut') else timezone.now().date() - timedelta(days=30),
                 periode_fin=datetime.strptime(data.get('periode_fin'), '%Y-%m-%d').date() if data.get('periode_fin') else timezone.now().date(),
+                titre=data.get('titre', f"Rapport {timezone.now().strftime('%Y-%m-%d')}"),
+                type_rapport=data.get('type_rapport', 'MENSUEL'),
                 description=data.get('description', ''),
             )
+            # Le document est rendu par le worker de tâches (assureur/rapports.py)
+            lancer_rendu(rapport)
             
-            messages.success(request, f"Rapport '{rapport.titre}' généré avec succès")
+            messages.success(request, f"Rapport '{rapport.titre}' en cours de génération, vous serez notifié quand il sera prêt")
             return redirect('assureur:detail_rapport', rapport_id=rapport.id)
             
         except Exception as e:
@@ -2075,23 +2020,43 @@ def detail_rapport(request, rapport_id):
 @login_required
 @assureur_required
 def export_rapport(request, rapport_id):
-    """Export d'un rapport en CSV"""
-    try:
-        rapport = get_object_or_404(RapportAssureur, id=rapport_id, assureur=request.user)
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="rapport_{rapport.titre}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Rapport', rapport.titre])
-        writer.writerow(['Période', f'{rapport.periode_debut} au {rapport.periode_fin}'])
-        writer.writerow(['Généré le', rapport.date_generation.strftime('%d/%m/%Y %H:%M')])
-        
-        return response
-        
-    except Exception as e:
-        messages.error(request, f"Erreur lors de l'export du rapport: {str(e)}")
-        return redirect('assureur:detail_rapport', rapport_id=rapport_id)
+    """Téléchargement du document rendu d'un rapport (état JSON tant qu'il n'est pas prêt)"""
+    rapport = get_object_or_404(RapportAssureur, id=rapport_id, assureur=request.user)
+    
+    if rapport.statut_rendu == RapportAssureur.StatutRendu.PRET and not os.path.exists(chemin_fichier(rapport)):
+        # Fichier supprimé du disque : nouveau rendu
+        rapport.statut_rendu = RapportAssureur.StatutRendu.NON_DEMANDE
+    # Un rendu en échec n'est relancé qu'à la demande explicite de l'utilisateur (?relancer=1)
+    relancer = rapport.statut_rendu == RapportAssureur.StatutRendu.ECHEC and request.GET.get('relancer')
+    if rapport.statut_rendu == RapportAssureur.StatutRendu.NON_DEMANDE or relancer:
+        lancer_rendu(rapport)
+        rapport.refresh_from_db()
+    
+    if rapport.statut_rendu == RapportAssureur.StatutRendu.ECHEC:
+        return JsonResponse({'success': False, 'message': "Échec de la génération du rapport", **etat_rapport(rapport)})
+    
+    if rapport.statut_rendu != RapportAssureur.StatutRendu.PRET:
+        return JsonResponse({'success': True, 'message': "Rapport en cours de génération", **etat_rapport(rapport)}, status=202)
+    
+    return reponse_rapport(rapport)
+
+@login_required
+@assureur_required
+@require_GET
+def statut_rapport(request, rapport_id):
+    """État du rendu d'un rapport (polling AJAX)"""
+    rapport = get_object_or_404(RapportAssureur, id=rapport_id, assureur=request.user)
+    return JsonResponse({'success': True, **etat_rapport(rapport)})
+
+def reponse_rapport(rapport):
+    """FileResponse du document rendu d'un rapport"""
+    _, extension = os.path.splitext(rapport.fichier)
+    return FileResponse(
+        open(chemin_fichier(rapport), 'rb'),
+        as_attachment=True,
+        filename=rapport.fichier,
+        content_type=TYPES_CONTENU.get(extension, 'application/octet-stream'),
+    )
 
 # ==========================================================================
 # VUES POUR L'EXPORT DE DONNÉES
@@ -2141,134 +2106,77 @@ def export_csv(fields, data_rows, filename):
         return response
 
 
-def export_pdf(request, titre, fields, data_rows, filename, template_name='assureur/export_pdf_template.html'):
-    """Export en PDF avec template spécifique"""
-    try:
-        # Vérifier si WeasyPrint est installé
-        try:
-            from weasyprint import HTML
-            from weasyprint.text.fonts import FontConfiguration
-        except ImportError:
-            # Rediriger vers la page d'export CSV si PDF non disponible
-            messages.error(request, "Export PDF non disponible. Utilisez le format CSV ou installez WeasyPrint.")
-            return export_csv(fields, data_rows, filename)
-        
-        # Préparer les en-têtes pour l'affichage
-        headers = []
-        for field in fields:
-            header_name = field.replace('__', ' - ').replace('_', ' ').title()
-            headers.append(header_name)
-        
-        # Préparer les données pour le template
-        table_data = []
-        for row in data_rows:
-            table_row = []
-            for field in fields:
-                table_row.append(row.get(field, ''))
-            table_data.append(table_row)
-        
-        # Contexte pour le template
-        context = {
-            'titre': titre,
-            'headers': headers,
-            'data': table_data,
-            'date_export': timezone.now().strftime('%d/%m/%Y %H:%M'),
-            'total_items': len(table_data),
-            'assureur': get_assureur_from_request(request),
-        }
-        
-        # Rendre le template HTML
-        html_string = render_to_string(template_name, context)
-        
-        # Générer le PDF
-        font_config = FontConfiguration()
-        html = HTML(string=html_string)
-        pdf_file = html.write_pdf(font_config=font_config)
-        
-        # Créer la réponse
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
-        
-        return response
-        
-    except Exception as e:
-        # Fallback vers CSV en cas d'erreur PDF
-        import traceback
-        traceback.print_exc()
-        return export_csv(fields, data_rows, filename)
-
-
 @login_required
 @assureur_required
 def export_donnees(request, type_donnees):
-    """Export des données en CSV ou PDF - VERSION ADAPTÉE À VOTRE STRUCTURE"""
+    """Export des données en CSV, Excel ou PDF (CSV/Excel en flux, voir assureur/exports.py)"""
     try:
         # Vérifier le format demandé
         export_format = request.GET.get('format', 'csv')  # Par défaut CSV
         
-        # Préparer les données selon le type
-        if type_donnees == 'membres':
-            queryset = Membre.objects.all().order_by('nom', 'prenom')
-            filename = f'membres_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
-            fields = ['numero_unique', 'nom', 'prenom', 'email', 'telephone', 'statut', 'date_inscription']
-            titre = "Liste des membres"
-            template_pdf = 'assureur/export_pdf_template.html'  # Template générique
-            
-        elif type_donnees == 'bons':
-            queryset = Bon.objects.select_related('membre').all().order_by('-date_creation')
-            filename = f'bons_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
-            fields = ['numero_bon', 'membre__nom', 'membre__prenom', 'type_soin', 'montant_total', 'montant_prise_charge', 'statut', 'date_creation']
-            titre = "Liste des bons de prise en charge"
-            template_pdf = 'assureur/export_bons_pdf.html'  # Template spécifique aux bons
-            
-        elif type_donnees == 'cotisations':
-            queryset = Cotisation.objects.select_related('membre').all().order_by('-periode')
-            filename = f'cotisations_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
-            fields = ['reference', 'membre__nom', 'membre__prenom', 'periode', 'montant', 'statut', 'date_emission', 'date_echeance']
-            titre = "Liste des cotisations"
-            template_pdf = 'assureur/export_pdf_template.html'
-            
-        elif type_donnees == 'paiements':
-            queryset = Paiement.objects.select_related('membre').all().order_by('-date_paiement')
-            filename = f'paiements_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
-            fields = ['reference', 'membre__nom', 'membre__prenom', 'montant', 'mode_paiement', 'statut', 'date_paiement']
-            titre = "Liste des paiements"
-            template_pdf = 'assureur/export_pdf_template.html'
-            
-        elif type_donnees == 'soins':
-            queryset = Soin.objects.select_related('membre').all().order_by('-date_soin')
-            filename = f'soins_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
-            fields = ['code', 'membre__nom', 'membre__prenom', 'type_soin', 'montant_facture', 'montant_rembourse', 'statut', 'date_soin']
-            titre = "Liste des soins"
-            template_pdf = 'assureur/export_pdf_template.html'
-            
-        else:
+        definition = EXPORTS.get(type_donnees)
+        if definition is None:
             messages.error(request, "Type de données non supporté")
             return redirect('assureur:dashboard')
         
-        # Préparer les données pour l'export
-        data_rows = []
-        for obj in queryset:
-            row = {}
-            for field in fields:
-                if '__' in field:
-                    parts = field.split('__')
-                    value = obj
-                    for part in parts:
-                        if value:
-                            value = getattr(value, part, '')
-                        else:
-                            value = ''
-                    row[field] = str(value) if value is not None else ''
-                else:
-                    row[field] = str(getattr(obj, field, '')) if getattr(obj, field, None) is not None else ''
-            data_rows.append(row)
-        
-        # Gérer l'export selon le format
-        if export_format.lower() == 'pdf':
-            return export_pdf(request, titre, fields, data_rows, filename, template_pdf)
-        else:  # CSV par défaut
-            return export_csv(fields, data_rows, filename)
+        filename = nom_fichier(type_donnees)
+        export_format = export_format.lower()
+        
+        # Le PDF est rendu par le worker de tâches (assureur/rapports.py)
+        if export_format == 'pdf':
+            aujourd_hui = timezone.now().date()
+            debut = request.GET.get('date_debut')
+            fin = request.GET.get('date_fin')
+            rapport = creer_rapport(
+                request.user,
+                type_donnees,
+                periode_debut=datetime.strptime(debut, '%Y-%m-%d').date() if debut else aujourd_hui,
+                periode_fin=datetime.strptime(fin, '%Y-%m-%d').date() if fin else aujourd_hui,
+                filtrer_periode=bool(debut or fin),
+                titre=definition['titre'],
+                type_rapport='SPECIAL',
+                description="Export PDF",
+            )
+            lancer_rendu(rapport)
+            rapport.refresh_from_db()
+            if rapport.statut_rendu == RapportAssureur.StatutRendu.PRET:
+                return reponse_rapport(rapport)
+            lien = reverse('assureur:export_rapport', args=[rapport.id])
+            messages.info(
+                request,
+                f"Export PDF lancé en arrière-plan. Téléchargement disponible à l'adresse {lien} une fois terminé."
+            )
+            return redirect(request.META.get('HTTP_REFERER') or 'assureur:dashboard')
+        
+        if export_format == 'xlsx' and not xlsx_disponible():
+            messages.error(request, "Export Excel non disponible. Utilisez le format CSV ou installez XlsxWriter.")
+            export_format = 'csv'
+        if export_format not in FORMATS:
+            export_format = 'csv'
+        
+        # Gros volumes : fichier produit par le worker de tâches
+        if compter_lignes(type_donnees) > seuil_arriere_plan():
+            tache = lancer_export(type_donnees, export_format, request.user.id)
+            if tache is not None:
+                lien = reverse('assureur:telecharger_export', args=[tache.id])
+                messages.info(
+                    request,
+                    f"Export volumineux lancé en arrière-plan. Téléchargement disponible à l'adresse {lien} une fois terminé."
+                )
+                return redirect(request.META.get('HTTP_REFERER') or 'assureur:dashboard')
+        
+        extension, content_type = FORMATS[export_format]
+        if export_format == 'xlsx':
+            fichier = tempfile.TemporaryFile()
+            ecrire_xlsx(type_donnees, fichier)
+            fichier.seek(0)
+            return FileResponse(
+                fichier, as_attachment=True, filename=f'{filename}.{extension}', content_type=content_type
+            )
+        
+        response = StreamingHttpResponse(flux_csv(type_donnees), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+        return response
             
     except Exception as e:
         messages.error(request, f"Erreur lors de l'export: {str(e)}")
@@ -2276,6 +2184,33 @@ def export_donnees(request, type_donnees):
         traceback.print_exc()
         return redirect('assureur:dashboard')
 
+@login_required
+@assureur_required
+def telecharger_export(request, tache_id):
+    """Téléchargement d'un export produit en arrière-plan (état JSON tant qu'il n'est pas prêt)"""
+    tache = get_object_or_404(
+        TacheAsynchrone, id=tache_id, nom='assureur.exports.exporter_fichier'
+    )
+    if tache.parametres.get('utilisateur_id') != request.user.id:
+        return JsonResponse({'success': False, 'message': 'Export introuvable'}, status=404)
+    
+    if tache.statut != TacheAsynchrone.Statut.TERMINEE:
+        return JsonResponse({
+            'success': tache.statut != TacheAsynchrone.Statut.ECHEC,
+            'statut': tache.statut,
+            'message': "Export en cours de préparation" if tache.statut != TacheAsynchrone.Statut.ECHEC else "Échec de l'export",
+        }, status=202 if tache.statut != TacheAsynchrone.Statut.ECHEC else 500)
+    
+    resultat = tache.resultat or {}
+    chemin = os.path.join(dossier_exports(), os.path.basename(resultat.get('fichier', '')))
+    if not resultat.get('fichier') or not os.path.exists(chemin):
+        return JsonResponse({'success': False, 'message': 'Fichier expiré'}, status=410)
+    
+    _, content_type = FORMATS[resultat.get('format', 'csv')]
+    return FileResponse(
+        open(chemin, 'rb'), as_attachment=True, filename=resultat['fichier'], content_type=content_type
+    )
+
 # ==========================================================================
 # VUES POUR LA COMMUNICATION
 # ==========================================================================
@@ -2369,17 +2304,17 @@ def api_recherche_membre(request):
     """API de recherche de membres (AJAX) - VERSION CORRIGÉE"""
     search = request.GET.get('q', '')
     
-    if search:
-        membres = Membre.objects.filter(
-            Q(nom__icontains=search) |
-            Q(prenom__icontains=search) |
-            Q(numero_unique__icontains=search) |  # CORRIGÉ: numero_unique
-            Q(email__icontains=search)
-        ).values('id', 'nom', 'prenom', 'numero_unique', 'email')[:10]  # CORRIGÉ: numero_unique
-        
-        membres_list = list(membres)
-    else:
-        membres_list = []
+    # Moteur de recherche partagé (membres/recherche.py)
+    membres_list = [
+        {
+            'id': membre.id,
+            'nom': membre.nom,
+            'prenom': membre.prenom,
+            'numero_unique': membre.numero_unique,
+            'email': membre.email,
+        }
+        for membre in rechercher_membres(search, limite=10)
+    ]
     
     return JsonResponse({
         'success': True,
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from . import compteurs
 from .models import (
     Conversation, Message, Notification, PieceJointe, 
     GroupeCommunication, MessageGroupe
@@ -56,7 +57,10 @@ class NotificationAdmin(admin.ModelAdmin):
     date_hierarchy = 'date_creation'
     
     def mark_as_read(self, request, queryset):
+        utilisateurs = set(queryset.filter(est_lue=False).values_list('user_id', flat=True))
         queryset.update(est_lue=True)
+        for utilisateur_id in utilisateurs:
+            compteurs.recalculer(utilisateur_id, 'notifications')
         self.message_user(request, f"{queryset.count()} notifications marquées comme lues.")
     mark_as_read.short_description = "Marquer comme lu"
     
@@ -2,13 +2,14 @@
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from .models import Message, Notification
+from .compteurs import compteurs, non_lus
+from .models import Message
 
 @login_required
 def api_messages_count(request):
     """API pour le compteur de messages non lus"""
     try:
-        unread_count = request.user.messages_recus.filter(est_lu=False).count()
+        unread_count = non_lus(request.user.id, 'messages')
         return JsonResponse({'unread_count': unread_count})
     except Exception as e:
         return JsonResponse({'unread_count': 0, 'error': str(e)})
@@ -38,10 +39,11 @@ def api_last_activity(request):
 def api_communication_stats(request):
     """API pour les statistiques de communication"""
     try:
+        non_lus_utilisateur = compteurs(request.user.id)
         stats = {
-            'messages_non_lus': request.user.messages_recus.filter(est_lu=False).count(),
+            'messages_non_lus': non_lus_utilisateur['messages'],
             'messages_recus_total': request.user.messages_recus.count(),
-            'notifications_non_lues': Notification.objects.filter(user=request.user, est_lue=False).count(),
+            'notifications_non_lues': non_lus_utilisateur['notifications'],
             'conversations_actives': 0,  # À adapter selon votre modèle
         }
         return JsonResponse({'stats': stats, 'success': True})
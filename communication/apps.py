@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class CommunicationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'communication'
-    verbose_name = 'Système de Communication'
\ No newline at end of file
+    verbose_name = 'Système de Communication'
+
+    def ready(self):
+        # Maintenance de la boîte de réception dénormalisée
+        import communication.signals
@@ -0,0 +1,197 @@
+# communication/boite_reception.py
+"""
+Boîte de réception dénormalisée (modèle EntreeBoiteReception).
+
+Chaque participant d'une conversation a une ligne portant le dernier message
+(date, aperçu, sens), le nombre de messages et le nombre de non lus. La
+création d'un message (Message.save) et sa lecture (marquer_comme_lu) mettent
+ces lignes à jour dans la même transaction ; les mises à jour en masse
+appellent recalculer_non_lus(), les suppressions reconstruire(). La page de
+messagerie lit ainsi la boîte d'un utilisateur en une requête indexée.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
+
+from . import compteurs, temps_reel
+from .models import EntreeBoiteReception, Message
+
+LONGUEUR_APERCU = 120
+
+
+def apercu(contenu, titre=''):
+    return (contenu or titre or '')[:LONGUEUR_APERCU]
+
+
+def boite_reception(utilisateur):
+    """Entrées de la boîte d'un utilisateur, de la plus récente à la plus ancienne"""
+    return EntreeBoiteReception.objects.filter(utilisateur=utilisateur).select_related(
+        'interlocuteur'
+    ).order_by('-date_dernier_message', '-id')
+
+
+# ==========================================================================
+# MISES À JOUR INCRÉMENTALES
+# ==========================================================================
+
+def _appliquer(utilisateur_id, conversation_id, increments, **valeurs):
+    """UPDATE de l'entrée (compteurs incrémentés en SQL), créée au besoin"""
+    entrees = EntreeBoiteReception.objects.filter(utilisateur_id=utilisateur_id, conversation_id=conversation_id)
+    mises_a_jour = {**valeurs, **{champ: F(champ) + pas for champ, pas in increments.items()}}
+    if entrees.update(**mises_a_jour):
+        return
+    try:
+        with transaction.atomic():
+            EntreeBoiteReception.objects.create(
+                utilisateur_id=utilisateur_id, conversation_id=conversation_id, **valeurs, **increments
+            )
+    except IntegrityError:
+        # Créée entre-temps par un envoi concurrent
+        entrees.update(**mises_a_jour)
+
+
+def enregistrer_message(message):
+    """Répercute un nouveau message sur les entrées de l'expéditeur et du destinataire"""
+    commun = {
+        'dernier_message_id': message.id,
+        'date_dernier_message': message.date_envoi,
+        'apercu': apercu(message.contenu, message.titre),
+    }
+    _appliquer(
+        message.expediteur_id, message.conversation_id, {'nombre_messages': 1},
+        interlocuteur_id=message.destinataire_id, dernier_message_envoye=True, **commun,
+    )
+    if message.destinataire_id != message.expediteur_id:
+        _appliquer(
+            message.destinataire_id, message.conversation_id,
+            {'nombre_messages': 1, 'non_lus': 0 if message.est_lu else 1},
+            interlocuteur_id=message.expediteur_id, dernier_message_envoye=False, **commun,
+        )
+
+
+def ajuster_non_lus(utilisateur_id, conversation_id, delta):
+    """Ajoute `delta` au compteur de non lus, sans descendre sous zéro"""
+    EntreeBoiteReception.objects.filter(
+        utilisateur_id=utilisateur_id, conversation_id=conversation_id
+    ).update(non_lus=Greatest(F('non_lus') + delta, Value(0)))
+
+
+def recalculer_non_lus(utilisateur_id, conversation_id=None):
+    """Recompte les non lus d'un utilisateur (boîte et compteur global) après une mise à jour en masse"""
+    non_lus = Message.objects.filter(destinataire_id=utilisateur_id, est_lu=False)
+    entrees = EntreeBoiteReception.objects.filter(utilisateur_id=utilisateur_id)
+    if conversation_id is not None:
+        non_lus = non_lus.filter(conversation_id=conversation_id)
+        entrees = entrees.filter(conversation_id=conversation_id)
+
+    # Conversations qui avaient des non lus : leurs interlocuteurs reçoivent l'accusé de lecture
+    lues = list(entrees.filter(non_lus__gt=0).values_list('conversation_id', 'interlocuteur_id')) if temps_reel.actif() else []
+
+    comptes = dict(non_lus.values_list('conversation_id').annotate(total=Count('id')).order_by())
+    entrees.update(non_lus=Case(
+        *[When(conversation_id=conversation, then=Value(total)) for conversation, total in comptes.items()],
+        default=Value(0),
+    ))
+    compteurs.recalculer(utilisateur_id, 'messages')
+    for conversation_lue, interlocuteur_id in lues:
+        if not comptes.get(conversation_lue):
+            temps_reel.accuse_lecture(interlocuteur_id, utilisateur_id, conversation_lue)
+
+
+# ==========================================================================
+# RECONSTRUCTION
+# ==========================================================================
+
+def reconstruire(conversation_ids=None, batch_size=500, modele_message=Message, modele_entree=EntreeBoiteReception):
+    """
+    Reconstruit les entrées des conversations données (toutes si None) par
+    agrégats groupés et upsert en masse ; supprime les entrées sans message.
+    Retourne le nombre d'entrées écrites.
+    """
+    messages = modele_message.objects.all()
+    if conversation_ids is not None:
+        messages = messages.filter(conversation_id__in=list(conversation_ids))
+
+    total = 0
+    dernier_id = 0
+    while True:
+        lot = list(
+            messages.filter(conversation_id__gt=dernier_id).order_by('conversation_id')
+            .values_list('conversation_id', flat=True).distinct()[:batch_size]
+        )
+        if not lot:
+            break
+        dernier_id = lot[-1]
+        total += _reconstruire_lot(messages.filter(conversation_id__in=lot), lot, modele_message, modele_entree)
+
+    if conversation_ids is not None:
+        vides = set(conversation_ids) - set(messages.values_list('conversation_id', flat=True).order_by().distinct())
+        modele_entree.objects.filter(conversation_id__in=vides).delete()
+    return total
+
+
+def _reconstruire_lot(messages, conversation_ids, modele_message, modele_entree):
+    par_entree = {}
+    envoyes = messages.values('expediteur_id', 'conversation_id').annotate(
+        dernier=Max('id'), total=Count('id')
+    ).order_by()
+    recus = messages.exclude(destinataire_id=F('expediteur_id')).values('destinataire_id', 'conversation_id').annotate(
+        dernier=Max('id'), total=Count('id'), non_lus=Count('id', filter=Q(est_lu=False))
+    ).order_by()
+
+    for ligne in envoyes:
+        par_entree[(ligne['expediteur_id'], ligne['conversation_id'])] = {
+            'dernier': ligne['dernier'], 'total': ligne['total'], 'non_lus': 0,
+        }
+    for ligne in recus:
+        entree = par_entree.setdefault(
+            (ligne['destinataire_id'], ligne['conversation_id']), {'dernier': 0, 'total': 0, 'non_lus': 0}
+        )
+        entree['dernier'] = max(entree['dernier'], ligne['dernier'])
+        entree['total'] += ligne['total']
+        entree['non_lus'] = ligne['non_lus']
+
+    derniers = {
+        ligne['id']: ligne
+        for ligne in modele_message.objects.filter(
+            id__in={entree['dernier'] for entree in par_entree.values()}
+        ).values('id', 'expediteur_id', 'destinataire_id', 'date_envoi', 'contenu', 'titre')
+    }
+
+    entrees = []
+    for (utilisateur_id, conversation_id), valeurs in par_entree.items():
+        dernier = derniers[valeurs['dernier']]
+        envoye = dernier['expediteur_id'] == utilisateur_id
+        entrees.append(modele_entree(
+            utilisateur_id=utilisateur_id,
+            conversation_id=conversation_id,
+            interlocuteur_id=dernier['destinataire_id'] if envoye else dernier['expediteur_id'],
+            dernier_message_id=dernier['id'],
+            date_dernier_message=dernier['date_envoi'],
+            dernier_message_envoye=envoye,
+            apercu=apercu(dernier['contenu'], dernier['titre']),
+            non_lus=valeurs['non_lus'],
+            nombre_messages=valeurs['total'],
+        ))
+
+    with transaction.atomic():
+        modele_entree.objects.bulk_create(
+            entrees,
+            update_conflicts=True,
+            unique_fields=['utilisateur', 'conversation'],
+            update_fields=[
+                'interlocuteur', 'dernier_message', 'date_dernier_message', 'dernier_message_envoye',
+                'apercu', 'non_lus', 'nombre_messages',
+            ],
+        )
+        # Participants qui n'ont plus de message dans la conversation
+        obsoletes = [
+            entree_id
+            for entree_id, utilisateur_id, conversation_id in modele_entree.objects.filter(
+                conversation_id__in=conversation_ids
+            ).values_list('id', 'utilisateur_id', 'conversation_id')
+            if (utilisateur_id, conversation_id) not in par_entree
+        ]
+        if obsoletes:
+            modele_entree.objects.filter(id__in=obsoletes).delete()
+    return len(entrees)
@@ -0,0 +1,198 @@
+# communication/compteurs.py
+"""
+Compteurs de messages et notifications non lus par utilisateur.
+
+Les valeurs sont lues dans le cache (une clé par utilisateur et par type),
+avec repli sur la ligne CompteurNonLus de l'utilisateur ; aucun COUNT(*) n'est
+exécuté à la lecture. Les créations et lectures ajustent la ligne en SQL
+(F() + delta) dans la transaction de la modification, puis le cache après
+commit, et les nouvelles valeurs sont poussées sur le flux temps réel de
+l'utilisateur. Les mises à jour en masse appellent recalculer(), et reconcilier()
+(tâche périodique ou `python manage.py reconcilier_compteurs`) répare les
+écarts éventuels.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.taches import enfiler
+from . import temps_reel
+from .models import CompteurNonLus, Message, Notification
+
+logger = logging.getLogger('communication')
+
+# type de compteur -> (modèle, champ utilisateur, filtre des non lus)
+SOURCES = {
+    'messages': (Message, 'destinataire_id', {'est_lu': False}),
+    'notifications': (Notification, 'user_id', {'est_lue': False}),
+}
+
+
+def duree_cache():
+    return getattr(settings, 'COMPTEURS_CACHE_TIMEOUT', 3600)
+
+
+def intervalle_reconciliation():
+    return getattr(settings, 'COMPTEURS_INTERVALLE_RECONCILIATION', 3600)
+
+
+def cle_cache(utilisateur_id, type_compteur):
+    return f'communication:non_lus:{type_compteur}:{utilisateur_id}'
+
+
+def compter(type_compteur, utilisateur_ids=None):
+    """Décompte réel {utilisateur_id: non_lus} depuis la table source (une requête groupée)"""
+    modele, champ, filtre = SOURCES[type_compteur]
+    queryset = modele.objects.filter(**filtre)
+    if utilisateur_ids is not None:
+        queryset = queryset.filter(**{f'{champ}__in': list(utilisateur_ids)})
+    return dict(queryset.values_list(champ).annotate(total=Count('id')).order_by())
+
+
+# ==========================================================================
+# LECTURE
+# ==========================================================================
+
+def _initialiser(utilisateur_id):
+    valeurs = {type_compteur: compter(type_compteur, [utilisateur_id]).get(utilisateur_id, 0) for type_compteur in SOURCES}
+    try:
+        with transaction.atomic():
+            CompteurNonLus.objects.create(utilisateur_id=utilisateur_id, date_reconciliation=timezone.now(), **valeurs)
+    except IntegrityError:
+        # Créée entre-temps par une autre requête
+        return CompteurNonLus.objects.filter(pk=utilisateur_id).values(*SOURCES).first()
+    return valeurs
+
+
+def compteurs(utilisateur_id):
+    """{'messages': n, 'notifications': n} pour l'utilisateur, depuis le cache ou la base"""
+    cles = {type_compteur: cle_cache(utilisateur_id, type_compteur) for type_compteur in SOURCES}
+    en_cache = cache.get_many(cles.values())
+    if len(en_cache) == len(cles):
+        return {type_compteur: en_cache[cle] for type_compteur, cle in cles.items()}
+
+    valeurs = CompteurNonLus.objects.filter(pk=utilisateur_id).values(*SOURCES).first()
+    if valeurs is None:
+        valeurs = _initialiser(utilisateur_id)
+    cache.set_many({cles[type_compteur]: valeurs[type_compteur] for type_compteur in SOURCES}, duree_cache())
+    return valeurs
+
+
+def compteurs_en_masse(utilisateur_ids):
+    """{utilisateur_id: compteurs(utilisateur_id)} en une requête (hors utilisateurs encore sans ligne)"""
+    valeurs = {
+        ligne.pop('utilisateur_id'): ligne
+        for ligne in CompteurNonLus.objects.filter(pk__in=utilisateur_ids).values('utilisateur_id', *SOURCES)
+    }
+    cache.set_many(
+        {cle_cache(utilisateur_id, type_compteur): ligne[type_compteur] for utilisateur_id, ligne in valeurs.items() for type_compteur in SOURCES},
+        duree_cache(),
+    )
+    for utilisateur_id in utilisateur_ids:
+        if utilisateur_id not in valeurs:
+            valeurs[utilisateur_id] = compteurs(utilisateur_id)
+    return valeurs
+
+
+def non_lus(utilisateur_id, type_compteur):
+    return compteurs(utilisateur_id)[type_compteur]
+
+
+# ==========================================================================
+# MISES À JOUR
+# ==========================================================================
+
+def _ajuster_cache(cle, delta):
+    try:
+        valeur = cache.incr(cle, delta)
+    except ValueError:
+        # Absente du cache : la prochaine lecture passera par la base
+        return
+    if valeur < 0:
+        cache.delete(cle)
+
+
+def ajuster(utilisateur_id, type_compteur, delta):
+    """Ajoute `delta` au compteur, en base dans la transaction courante puis dans le cache après commit"""
+    if not utilisateur_id or not delta:
+        return
+    mis_a_jour = CompteurNonLus.objects.filter(pk=utilisateur_id).update(
+        **{type_compteur: Greatest(F(type_compteur) + delta, Value(0))}
+    )
+    if not mis_a_jour:
+        # Première utilisation : le décompte initial inclut déjà la modification
+        _initialiser(utilisateur_id)
+        transaction.on_commit(lambda: cache.delete(cle_cache(utilisateur_id, type_compteur)))
+        temps_reel.compteurs_non_lus(utilisateur_id)
+        return
+    transaction.on_commit(lambda: _ajuster_cache(cle_cache(utilisateur_id, type_compteur), delta))
+    temps_reel.compteurs_non_lus(utilisateur_id)
+
+
+def ajuster_en_masse(utilisateur_ids, type_compteur, delta):
+    """
+    Comme ajuster() pour de nombreux utilisateurs, en une requête. Les clés de
+    cache sont invalidées après commit (la lecture suivante relit la ligne),
+    puis les compteurs relus en une requête sont poussés à chaque utilisateur ;
+    les utilisateurs sans ligne seront comptés à leur première lecture.
+    """
+    utilisateur_ids = list(utilisateur_ids)
+    if not utilisateur_ids or not delta:
+        return
+    CompteurNonLus.objects.filter(pk__in=utilisateur_ids).update(
+        **{type_compteur: Greatest(F(type_compteur) + delta, Value(0))}
+    )
+    cles = [cle_cache(utilisateur_id, type_compteur) for utilisateur_id in utilisateur_ids]
+    transaction.on_commit(lambda: cache.delete_many(cles))
+    temps_reel.compteurs_non_lus_en_masse(utilisateur_ids)
+
+
+def recalculer(utilisateur_id, type_compteur):
+    """Recompte un compteur après une mise à jour en masse (update() sans signaux)"""
+    valeur = compter(type_compteur, [utilisateur_id]).get(utilisateur_id, 0)
+    if not CompteurNonLus.objects.filter(pk=utilisateur_id).update(**{type_compteur: valeur}):
+        _initialiser(utilisateur_id)
+    transaction.on_commit(lambda: cache.set(cle_cache(utilisateur_id, type_compteur), valeur, duree_cache()))
+    temps_reel.compteurs_non_lus(utilisateur_id)
+    return valeur
+
+
+def reconcilier(replanifier=False):
+    """
+    Compare chaque compteur stocké au décompte réel (une requête groupée par
+    type) et corrige les écarts en base et dans le cache. Avec `replanifier`,
+    se reprogramme dans la file de tâches. Retourne le nombre de compteurs corrigés.
+    """
+    reels = {type_compteur: compter(type_compteur) for type_compteur in SOURCES}
+    corriges = []
+    for compteur in CompteurNonLus.objects.only(*SOURCES).iterator(chunk_size=2000):
+        ecart = False
+        for type_compteur, valeurs in reels.items():
+            reel = valeurs.get(compteur.utilisateur_id, 0)
+            if getattr(compteur, type_compteur) != reel:
+                setattr(compteur, type_compteur, reel)
+                ecart = True
+        if ecart:
+            compteur.date_reconciliation = timezone.now()
+            corriges.append(compteur)
+
+    if corriges:
+        CompteurNonLus.objects.bulk_update(corriges, list(SOURCES) + ['date_reconciliation'], batch_size=500)
+        cache.delete_many([
+            cle_cache(compteur.utilisateur_id, type_compteur) for compteur in corriges for type_compteur in SOURCES
+        ])
+        logger.warning(f"Compteurs de non lus corrigés pour {len(corriges)} utilisateur(s)")
+
+    if replanifier and not getattr(settings, 'TACHES_MODE_SYNCHRONE', False):
+        enfiler(
+            'communication.compteurs.reconcilier',
+            cle='communication:compteurs:reconciliation',
+            delai=intervalle_reconciliation(),
+            replanifier=True,
+        )
+    return len(corriges)
@@ -1,5 +1,9 @@
 import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
+
+from .compteurs import compteurs
+from .temps_reel import groupe_utilisateur
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -21,3 +25,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({'message': event['message']}))
+
+
+class FluxUtilisateurConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Flux personnel de l'utilisateur connecté : nouveaux messages, accusés de
+    lecture, notifications et compteurs de non lus, publiés par
+    communication/temps_reel.py. Remplace le polling des compteurs.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if self.channel_layer is None:
+            # Sans couche de canaux, rien ne serait publié : le client garde le polling
+            await self.close(code=4503)
+            return
+        self.groupe = groupe_utilisateur(user.id)
+        await self.channel_layer.group_add(self.groupe, self.channel_name)
+        await self.accept()
+        # État initial : le client n'a plus besoin d'interroger les compteurs
+        await self.send_json({'type': 'compteurs', **await database_sync_to_async(compteurs)(user.id)})
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'groupe'):
+            await self.channel_layer.group_discard(self.groupe, self.channel_name)
+
+    async def receive_json(self, content):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def evenement(self, event):
+        await self.send_json(event['evenement'])
@@ -0,0 +1,191 @@
+# communication/diffusion.py
+"""
+Diffusion en masse de messages privés et de notifications.
+
+diffuser() envoie un même message à de nombreux destinataires, chacun dans
+sa conversation privée avec l'expéditeur : les conversations existantes sont
+retrouvées par leur clé de paire en une requête, les manquantes créées par
+bulk_create, puis les messages insérés par bulk_create. Les destinataires sont traités par lots de
+DIFFUSION_DESTINATAIRES_PAR_TRANSACTION, un lot par transaction ; boîtes de
+réception, compteurs de non lus et événements temps réel sont mis à jour par
+lot. notifier_en_masse() fait de même pour les notifications. Au-delà de
+DIFFUSION_SEUIL_ARRIERE_PLAN destinataires, lancer_notifications() passe par
+la file de tâches.
+"""
+import logging
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.taches import enfiler
+from . import compteurs, temps_reel
+from .boite_reception import reconstruire
+from .models import Conversation, Message, Notification
+
+logger = logging.getLogger('communication')
+
+Participant = Conversation.participants.through
+
+
+def destinataires_par_transaction():
+    return getattr(settings, 'DIFFUSION_DESTINATAIRES_PAR_TRANSACTION', 1000)
+
+
+def seuil_arriere_plan():
+    return getattr(settings, 'DIFFUSION_SEUIL_ARRIERE_PLAN', 2000)
+
+
+def _lots(ids, taille):
+    ids = iter(ids)
+    while True:
+        lot = list(islice(ids, taille))
+        if not lot:
+            return
+        yield lot
+
+
+def _cle_paire(utilisateur_id, interlocuteur_id):
+    return (min(utilisateur_id, interlocuteur_id), max(utilisateur_id, interlocuteur_id))
+
+
+def conversations_privees(utilisateur_id, interlocuteur_ids):
+    """{interlocuteur_id: conversation_id} des conversations privées existantes (une requête sur la clé de paire)"""
+    interlocuteur_ids = list(interlocuteur_ids)
+    paires = {}
+    for mini, maxi, conversation_id in Conversation.objects.filter(
+        Q(participant_min_id=utilisateur_id, participant_max_id__in=interlocuteur_ids)
+        | Q(participant_max_id=utilisateur_id, participant_min_id__in=interlocuteur_ids)
+    ).values_list('participant_min_id', 'participant_max_id', 'id'):
+        paires[maxi if mini == utilisateur_id else mini] = conversation_id
+    return paires
+
+
+def _creer_conversations(expediteur_id, destinataire_ids):
+    """
+    Crée les conversations privées manquantes ; retourne {destinataire_id: conversation_id}.
+    Une conversation créée entre-temps par un envoi concurrent est réutilisée
+    (conflit ignoré sur la clé de paire, puis relecture).
+    """
+    if not destinataire_ids:
+        return {}
+    nouvelles = []
+    for destinataire_id in destinataire_ids:
+        mini, maxi = _cle_paire(expediteur_id, destinataire_id)
+        nouvelles.append(Conversation(participant_min_id=mini, participant_max_id=maxi))
+    Conversation.objects.bulk_create(nouvelles, ignore_conflicts=True)
+    creees = conversations_privees(expediteur_id, destinataire_ids)
+    Participant.objects.bulk_create(
+        [
+            Participant(conversation_id=conversation_id, user_id=utilisateur_id)
+            for destinataire_id, conversation_id in creees.items()
+            for utilisateur_id in (expediteur_id, destinataire_id)
+        ],
+        ignore_conflicts=True,
+    )
+    return creees
+
+
+# ==========================================================================
+# MESSAGES
+# ==========================================================================
+
+def _diffuser_lot(expediteur, lot, contenu, titre, type_message):
+    with transaction.atomic():
+        conversations = conversations_privees(expediteur.id, lot)
+        creees = _creer_conversations(expediteur.id, [destinataire_id for destinataire_id in lot if destinataire_id not in conversations])
+        conversations.update(creees)
+
+        envoyes = Message.objects.bulk_create([
+            Message(
+                expediteur_id=expediteur.id,
+                destinataire_id=destinataire_id,
+                conversation_id=conversations[destinataire_id],
+                titre=titre,
+                contenu=contenu,
+                type_message=type_message,
+            )
+            for destinataire_id in lot
+        ])
+        Conversation.objects.filter(id__in=conversations.values()).update(date_modification=timezone.now())
+        reconstruire(conversations.values())
+        compteurs.ajuster_en_masse(lot, 'messages', 1)
+        temps_reel.publier_en_masse(
+            (message.destinataire_id, temps_reel.evenement_message(message, expediteur)) for message in envoyes
+        )
+    return envoyes, len(creees)
+
+
+def diffuser(expediteur_id, destinataire_ids, contenu, titre='', type_message='MESSAGE'):
+    """
+    Envoie le message à chaque destinataire existant (hors expéditeur, sans
+    doublon). Retourne {'destinataires', 'conversations_creees', 'dernier_message_id'}.
+    """
+    expediteur = User.objects.get(id=expediteur_id)
+    ids = [destinataire_id for destinataire_id in dict.fromkeys(map(int, destinataire_ids)) if destinataire_id != expediteur.id]
+
+    debut = time.monotonic()
+    resultat = {'destinataires': 0, 'conversations_creees': 0, 'dernier_message_id': None}
+    for lot in _lots(ids, destinataires_par_transaction()):
+        existants = set(User.objects.filter(id__in=lot).values_list('id', flat=True))
+        envoyes, creees = _diffuser_lot(
+            expediteur, [destinataire_id for destinataire_id in lot if destinataire_id in existants],
+            contenu, titre, type_message,
+        )
+        resultat['destinataires'] += len(envoyes)
+        resultat['conversations_creees'] += creees
+        if envoyes:
+            resultat['dernier_message_id'] = envoyes[-1].id
+
+    logger.info(
+        f"Diffusion de {expediteur.username} : {resultat['destinataires']} destinataire(s), "
+        f"{resultat['conversations_creees']} conversation(s) créée(s) en {time.monotonic() - debut:.1f}s"
+    )
+    return resultat
+
+
+# ==========================================================================
+# NOTIFICATIONS
+# ==========================================================================
+
+def notifier_en_masse(utilisateur_ids, titre, message, type_notification='INFO'):
+    """Crée une notification par utilisateur (ids existants), par lots ; retourne le nombre créé"""
+    total = 0
+    for lot in _lots(dict.fromkeys(utilisateur_ids), destinataires_par_transaction()):
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(user_id=utilisateur_id, titre=titre, message=message, type_notification=type_notification)
+                for utilisateur_id in lot
+            ])
+            compteurs.ajuster_en_masse(lot, 'notifications', 1)
+            temps_reel.publier_en_masse(
+                (notification.user_id, temps_reel.evenement_notification(notification)) for notification in notifications
+            )
+        total += len(notifications)
+    return total
+
+
+def lancer_notifications(utilisateur_ids, titre, message, type_notification='INFO'):
+    """
+    Notifie immédiatement, ou via la file de tâches au-delà de
+    seuil_arriere_plan() destinataires. Retourne le nombre de notifications
+    créées, ou None si l'envoi est différé.
+    """
+    utilisateur_ids = list(utilisateur_ids)
+    if len(utilisateur_ids) <= seuil_arriere_plan():
+        return notifier_en_masse(utilisateur_ids, titre, message, type_notification)
+    # Une seule tentative : rejouer enverrait deux fois les lots déjà validés
+    enfiler(
+        'communication.diffusion.notifier_en_masse',
+        delai=0,
+        max_tentatives=1,
+        utilisateur_ids=utilisateur_ids,
+        titre=titre,
+        message=message,
+        type_notification=type_notification,
+    )
+    return None
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import time
+
+from communication.compteurs import intervalle_reconciliation, reconcilier
+from core.taches import enfiler
+
+
+class Command(BaseCommand):
+    help = "Corrige les compteurs de messages et notifications non lus d'après les tables sources"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--planifier',
+            action='store_true',
+            help='Programme la réconciliation périodique dans la file de tâches au lieu de l\'exécuter'
+        )
+
+    def handle(self, *args, **options):
+        if options['planifier']:
+            enfiler(
+                'communication.compteurs.reconcilier',
+                cle='communication:compteurs:reconciliation',
+                delai=0,
+                replanifier=True,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Réconciliation programmée (toutes les {intervalle_reconciliation()}s)"
+            ))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("🔢 Réconciliation des compteurs de non lus..."))
+        debut = time.monotonic()
+        corriges = reconcilier()
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(f"✅ {corriges} compteur(s) corrigé(s) en {duree:.2f}s"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+import time
+
+from communication.boite_reception import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les boîtes de réception dénormalisées depuis les messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de conversations par lot (défaut: 500)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING("📥 Reconstruction des boîtes de réception..."))
+        debut = time.monotonic()
+        total = reconstruire(batch_size=max(1, options['batch_size']))
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} entrée(s) écrite(s) en {duree:.2f}s"))
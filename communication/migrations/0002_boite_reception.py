@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remplir_boites(apps, schema_editor):
+    from communication.boite_reception import reconstruire
+
+    reconstruire(
+        modele_message=apps.get_model('communication', 'Message'),
+        modele_entree=apps.get_model('communication', 'EntreeBoiteReception'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntreeBoiteReception',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_dernier_message', models.DateTimeField(blank=True, null=True)),
+                ('dernier_message_envoye', models.BooleanField(default=False)),
+                ('apercu', models.CharField(blank=True, max_length=120)),
+                ('non_lus', models.PositiveIntegerField(default=0)),
+                ('nombre_messages', models.PositiveIntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entrees_boite_reception', to='communication.conversation')),
+                ('dernier_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='communication.message')),
+                ('interlocuteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entrees_boite_reception', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrée de boîte de réception',
+                'verbose_name_plural': 'Entrées de boîte de réception',
+                'ordering': ['-date_dernier_message'],
+                'indexes': [models.Index(fields=['utilisateur', '-date_dernier_message'], name='communicati_utilisa_bedf72_idx')],
+                'constraints': [models.UniqueConstraint(fields=('utilisateur', 'conversation'), name='unique_entree_boite_reception')],
+            },
+        ),
+        migrations.RunPython(remplir_boites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('communication', '0002_boite_reception'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurNonLus',
+            fields=[
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compteur_non_lus', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('notifications', models.PositiveIntegerField(default=0)),
+                ('date_reconciliation', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de non lus',
+                'verbose_name_plural': 'Compteurs de non lus',
+            },
+        ),
+    ]
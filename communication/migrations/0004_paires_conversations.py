@@ -0,0 +1,65 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:02
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def fusionner_doublons(apps, schema_editor):
+    """
+    Renseigne la clé de paire des conversations à deux participants et
+    fusionne les doublons dans la plus ancienne : messages déplacés,
+    conversations en double supprimées, boîtes de réception reconstruites.
+    """
+    from communication.boite_reception import reconstruire
+
+    Conversation = apps.get_model('communication', 'Conversation')
+    Message = apps.get_model('communication', 'Message')
+    EntreeBoiteReception = apps.get_model('communication', 'EntreeBoiteReception')
+    Participant = Conversation.participants.through
+
+    paires = defaultdict(list)
+    for ligne in Participant.objects.values('conversation_id').annotate(
+        nb=Count('user_id', distinct=True), mini=Min('user_id'), maxi=Max('user_id')
+    ).filter(nb=2).order_by('conversation_id'):
+        paires[(ligne['mini'], ligne['maxi'])].append(ligne['conversation_id'])
+
+    canoniques, fusionnees, doublons = [], [], []
+    for (mini, maxi), conversation_ids in paires.items():
+        canonique, *autres = conversation_ids
+        canoniques.append(Conversation(id=canonique, participant_min_id=mini, participant_max_id=maxi))
+        if autres:
+            Message.objects.filter(conversation_id__in=autres).update(conversation_id=canonique)
+            fusionnees.append(canonique)
+            doublons.extend(autres)
+
+    for debut in range(0, len(doublons), 500):
+        Conversation.objects.filter(id__in=doublons[debut:debut + 500]).delete()
+    Conversation.objects.bulk_update(canoniques, ['participant_min', 'participant_max'], batch_size=500)
+    if fusionnees:
+        reconstruire(fusionnees, modele_message=Message, modele_entree=EntreeBoiteReception)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0003_compteurs_non_lus'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_max',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_min',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fusionner_doublons, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Contrainte ajoutée après la fusion des doublons (0004), dans sa propre transaction"""
+
+    dependencies = [
+        ('communication', '0004_paires_conversations'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('participant_min', 'participant_max'), name='unique_conversation_paire'),
+        ),
+    ]
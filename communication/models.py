@@ -1,11 +1,15 @@
 # communication/models.py - VERSION FINALE COMPLÈTE CORRIGÉE
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 class Conversation(models.Model):
     """Modèle pour gérer les conversations entre utilisateurs"""
     participants = models.ManyToManyField(User, related_name='conversations')
+    # Clé de paire (plus petit id, plus grand id) des conversations privées ;
+    # vide pour les conversations de groupe
+    participant_min = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    participant_max = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
@@ -13,6 +17,9 @@ class Conversation(models.Model):
         ordering = ['-date_modification']
         verbose_name = "Conversation"
         verbose_name_plural = "Conversations"
+        constraints = [
+            models.UniqueConstraint(fields=['participant_min', 'participant_max'], name='unique_conversation_paire'),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id}"
@@ -57,20 +64,48 @@ class Message(models.Model):
     def __str__(self):
         return f"Message {self.id} - {self.titre}"
     
+    def save(self, *args, **kwargs):
+        """La création met à jour les boîtes de réception dans la même transaction"""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        from .boite_reception import enregistrer_message
+        from .compteurs import ajuster
+        from .temps_reel import nouveau_message
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            enregistrer_message(self)
+            if not self.est_lu and self.destinataire_id != self.expediteur_id:
+                ajuster(self.destinataire_id, 'messages', 1)
+                nouveau_message(self)
+    
     # MÉTHODES MANQUANTES AJOUTÉES
     def marquer_comme_lu(self):
         """Marque le message comme lu et met à jour la date de lecture"""
         if not self.est_lu:
+            from .boite_reception import ajuster_non_lus
+            from .compteurs import ajuster
+            from .temps_reel import accuse_lecture
             self.est_lu = True
             self.date_lecture = timezone.now()
-            self.save()
+            with transaction.atomic():
+                self.save()
+                ajuster_non_lus(self.destinataire_id, self.conversation_id, -1)
+                ajuster(self.destinataire_id, 'messages', -1)
+                accuse_lecture(self.expediteur_id, self.destinataire_id, self.conversation_id, [self.id])
         return self
     
     def marquer_comme_non_lu(self):
         """Marque le message comme non lu"""
+        from .boite_reception import ajuster_non_lus
+        from .compteurs import ajuster
+        etait_lu = self.est_lu
         self.est_lu = False
         self.date_lecture = None
-        self.save()
+        with transaction.atomic():
+            self.save()
+            if etait_lu:
+                ajuster_non_lus(self.destinataire_id, self.conversation_id, 1)
+                ajuster(self.destinataire_id, 'messages', 1)
         return self
     
     def est_destinataire(self, user):
@@ -100,6 +135,53 @@ class Message(models.Model):
             return self.contenu[:longueur] + "..."
         return self.contenu
 
+class EntreeBoiteReception(models.Model):
+    """
+    Boîte de réception dénormalisée : une ligne par (utilisateur, conversation)
+    avec le dernier message et le nombre de non lus, tenue à jour par
+    communication/boite_reception.py.
+    """
+    utilisateur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entrees_boite_reception')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='entrees_boite_reception')
+    interlocuteur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    dernier_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    date_dernier_message = models.DateTimeField(null=True, blank=True)
+    dernier_message_envoye = models.BooleanField(default=False)
+    apercu = models.CharField(max_length=120, blank=True)
+    non_lus = models.PositiveIntegerField(default=0)
+    nombre_messages = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date_dernier_message']
+        verbose_name = "Entrée de boîte de réception"
+        verbose_name_plural = "Entrées de boîte de réception"
+        constraints = [
+            models.UniqueConstraint(fields=['utilisateur', 'conversation'], name='unique_entree_boite_reception'),
+        ]
+        indexes = [
+            models.Index(fields=['utilisateur', '-date_dernier_message']),
+        ]
+    
+    def __str__(self):
+        return f"Boîte {self.utilisateur_id} - conversation {self.conversation_id}"
+
+class CompteurNonLus(models.Model):
+    """
+    Totaux de messages et notifications non lus par utilisateur : repli en
+    base du cache tenu par communication/compteurs.py.
+    """
+    utilisateur = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='compteur_non_lus')
+    messages = models.PositiveIntegerField(default=0)
+    notifications = models.PositiveIntegerField(default=0)
+    date_reconciliation = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Compteur de non lus"
+        verbose_name_plural = "Compteurs de non lus"
+    
+    def __str__(self):
+        return f"Non lus {self.utilisateur_id} : {self.messages} message(s), {self.notifications} notification(s)"
+
 class Notification(models.Model):
     """Modèle pour les notifications système"""
     TYPE_NOTIFICATION = [
@@ -128,20 +210,39 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification {self.id} - {self.titre}"
     
+    def save(self, *args, **kwargs):
+        """La création incrémente le compteur de non lues et publie la notification sur le flux temps réel"""
+        if not self._state.adding or self.est_lue:
+            return super().save(*args, **kwargs)
+        from .compteurs import ajuster
+        from .temps_reel import nouvelle_notification
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ajuster(self.user_id, 'notifications', 1)
+            nouvelle_notification(self)
+    
     # MÉTHODES MANQUANTES AJOUTÉES
     def marquer_comme_lue(self):
         """Marque la notification comme lue et met à jour la date de lecture"""
         if not self.est_lue:
+            from .compteurs import ajuster
             self.est_lue = True
             self.date_lecture = timezone.now()
-            self.save()
+            with transaction.atomic():
+                self.save()
+                ajuster(self.user_id, 'notifications', -1)
         return self
     
     def marquer_comme_non_lue(self):
         """Marque la notification comme non lue"""
+        from .compteurs import ajuster
+        etait_lue = self.est_lue
         self.est_lue = False
         self.date_lecture = None
-        self.save()
+        with transaction.atomic():
+            self.save()
+            if etait_lue:
+                ajuster(self.user_id, 'notifications', 1)
         return self
     
     def get_message_tronque(self, longueur=100):
@@ -1,8 +1,7 @@
 # communication/services.py - VERSION FINALE
-from django.db import transaction
 from django.contrib.auth.models import User
-from .models import Conversation, Message, Notification
-from datetime import datetime
+from .diffusion import diffuser
+from .models import Message, Notification
 import logging
 
 logger = logging.getLogger('communication')
@@ -12,31 +11,10 @@ class MessagerieService:
     
     @staticmethod
     def envoyer_message(expediteur_id, destinataire_ids, contenu, titre="", type_message="MESSAGE"):
-        """Envoyer un message à un ou plusieurs destinataires"""
+        """Envoyer un message à un ou plusieurs destinataires (conversation privée avec chacun, en masse)"""
         try:
-            with transaction.atomic():
-                expediteur = User.objects.get(id=expediteur_id)
-                destinataires = User.objects.filter(id__in=destinataire_ids)
-                
-                # Créer une conversation
-                conversation = Conversation.objects.create()
-                conversation.participants.add(expediteur)
-                for dest in destinataires:
-                    conversation.participants.add(dest)
-                
-                # Créer le message pour chaque destinataire
-                for destinataire in destinataires:
-                    message = Message.objects.create(
-                        expediteur=expediteur,
-                        destinataire=destinataire,
-                        conversation=conversation,
-                        titre=titre,
-                        contenu=contenu,
-                        type_message=type_message
-                    )
-                
-                logger.info(f"Message envoyé: {expediteur.username} -> {len(destinataires)} destinataire(s)")
-                return message
+            resultat = diffuser(expediteur_id, destinataire_ids, contenu, titre=titre, type_message=type_message)
+            return Message.objects.filter(id=resultat['dernier_message_id']).first()
                 
         except Exception as e:
             logger.error(f"Erreur envoi message: {e}")
@@ -0,0 +1,32 @@
+# communication/signals.py
+import logging
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .boite_reception import reconstruire
+from .compteurs import ajuster
+from .models import Message, Notification
+
+logger = logging.getLogger('communication')
+
+
+@receiver(post_delete, sender=Message)
+def reconstruire_boites_message_supprime(sender, instance, **kwargs):
+    """Le dernier message et les compteurs des participants changent"""
+    try:
+        reconstruire([instance.conversation_id])
+        if not instance.est_lu and instance.destinataire_id != instance.expediteur_id:
+            ajuster(instance.destinataire_id, 'messages', -1)
+    except Exception as e:
+        logger.error(f"Erreur boîte de réception conversation {instance.conversation_id}: {e}")
+
+
+@receiver(post_delete, sender=Notification)
+def decompter_notification_supprimee(sender, instance, **kwargs):
+    if instance.est_lue:
+        return
+    try:
+        ajuster(instance.user_id, 'notifications', -1)
+    except Exception as e:
+        logger.error(f"Erreur compteur notifications utilisateur {instance.user_id}: {e}")
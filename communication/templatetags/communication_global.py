@@ -11,10 +11,10 @@ def get_unread_notifications_count(user):
         if not user.is_authenticated:
             return 0
             
-        from communication.models import Notification
+        from communication.compteurs import non_lus
         
-        # Version simple et directe
-        return Notification.objects.filter(user=user, est_lue=False).count()
+        # Compteur maintenu à l'écriture : pas de COUNT à chaque page
+        return non_lus(user.id, 'notifications')
                 
     except Exception as e:
         print(f"Erreur dans get_unread_notifications_count: {e}")
@@ -0,0 +1,136 @@
+# communication/temps_reel.py
+"""
+Publication des événements de messagerie sur le flux WebSocket de chaque
+utilisateur (consumers.FluxUtilisateurConsumer, groupe `utilisateur_<id>`).
+
+Les événements (nouveau message, accusé de lecture, notification, compteurs
+de non lus) partent après le commit de la transaction qui les produit, via la
+couche de canaux (CHANNEL_LAYERS). Sans django-channels installé, la
+publication est ignorée et les clients reviennent au polling.
+"""
+import importlib.util
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger('communication')
+
+
+def actif():
+    return importlib.util.find_spec('channels') is not None and bool(getattr(settings, 'CHANNEL_LAYERS', None))
+
+
+def groupe_utilisateur(utilisateur_id):
+    return f'utilisateur_{utilisateur_id}'
+
+
+def _envoyer(utilisateur_id, evenement):
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    couche = get_channel_layer()
+    if couche is None:
+        return
+    try:
+        async_to_sync(couche.group_send)(groupe_utilisateur(utilisateur_id), {'type': 'evenement', 'evenement': evenement})
+    except Exception as e:
+        logger.error(f"Erreur publication temps réel utilisateur {utilisateur_id}: {e}")
+
+
+def publier(utilisateur_id, type_evenement, **donnees):
+    """Publie `{'type': type_evenement, **donnees}` à l'utilisateur après le commit"""
+    if not utilisateur_id or not actif():
+        return
+    evenement = {'type': type_evenement, **donnees}
+    transaction.on_commit(lambda: _envoyer(utilisateur_id, evenement))
+
+
+def publier_en_masse(evenements):
+    """Comme publier() pour une liste de (utilisateur_id, evenement), en un seul callback après commit"""
+    if not actif():
+        return
+    evenements = list(evenements)
+
+    def envoyer_tous():
+        for utilisateur_id, evenement in evenements:
+            _envoyer(utilisateur_id, evenement)
+
+    if evenements:
+        transaction.on_commit(envoyer_tous)
+
+
+# ==========================================================================
+# ÉVÉNEMENTS
+# ==========================================================================
+
+def evenement_message(message, expediteur):
+    from .boite_reception import apercu
+
+    return {
+        'type': 'message',
+        'message_id': message.id,
+        'conversation_id': message.conversation_id,
+        'expediteur_id': message.expediteur_id,
+        'expediteur': expediteur.get_full_name() or expediteur.username,
+        'apercu': apercu(message.contenu, message.titre),
+        'date_envoi': message.date_envoi.isoformat(),
+    }
+
+
+def evenement_notification(notification):
+    return {
+        'type': 'notification',
+        'notification_id': notification.id,
+        'titre': notification.titre,
+        'message': notification.get_message_tronque(),
+        'type_notification': notification.type_notification,
+        'date_creation': notification.date_creation.isoformat(),
+    }
+
+
+def nouveau_message(message):
+    if actif():
+        publier_en_masse([(message.destinataire_id, evenement_message(message, message.expediteur))])
+
+
+def accuse_lecture(expediteur_id, lecteur_id, conversation_id, message_ids=None):
+    """Prévient l'expéditeur que ses messages (tous ceux de la conversation si None) ont été lus"""
+    if expediteur_id == lecteur_id:
+        return
+    publier(
+        expediteur_id, 'lecture',
+        conversation_id=conversation_id,
+        lecteur_id=lecteur_id,
+        message_ids=message_ids,
+    )
+
+
+def nouvelle_notification(notification):
+    if actif():
+        publier_en_masse([(notification.user_id, evenement_notification(notification))])
+
+
+def compteurs_non_lus(utilisateur_id):
+    """Pousse les compteurs (lus dans le cache, sans COUNT) après leur mise à jour"""
+    if not actif():
+        return
+    from .compteurs import compteurs
+
+    transaction.on_commit(lambda: _envoyer(utilisateur_id, {'type': 'compteurs', **compteurs(utilisateur_id)}))
+
+
+def compteurs_non_lus_en_masse(utilisateur_ids):
+    """Comme compteurs_non_lus() pour de nombreux utilisateurs : compteurs relus en une requête, un seul callback"""
+    if not actif():
+        return
+    from .compteurs import compteurs_en_masse
+
+    utilisateur_ids = list(utilisateur_ids)
+
+    def envoyer_tous():
+        for utilisateur_id, valeurs in compteurs_en_masse(utilisateur_ids).items():
+            _envoyer(utilisateur_id, {'type': 'compteurs', **valeurs})
+
+    if utilisateur_ids:
+        transaction.on_commit(envoyer_tous)
@@ -1,3 +1,350 @@
-from django.test import TestCase
+import importlib
+import importlib.util
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .boite_reception import reconstruire
+from . import temps_reel
+from .compteurs import compteurs, reconcilier
+from .diffusion import diffuser, notifier_en_masse
+from .models import CompteurNonLus, Conversation, EntreeBoiteReception, Message, Notification
+from .utils import get_or_create_conversation, marquer_messages_lus
+
+
+class BoiteReceptionTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bruno = User.objects.create_user(username='bruno', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bruno)
+
+    def _envoyer(self, expediteur, destinataire, contenu, conversation=None):
+        return Message.objects.create(
+            expediteur=expediteur, destinataire=destinataire,
+            conversation=conversation or self.conversation, contenu=contenu,
+        )
+
+    def _entree(self, utilisateur):
+        return EntreeBoiteReception.objects.get(utilisateur=utilisateur, conversation=self.conversation)
+
+    def _etat(self):
+        return sorted(EntreeBoiteReception.objects.values_list(
+            'utilisateur_id', 'conversation_id', 'interlocuteur_id', 'dernier_message_id',
+            'dernier_message_envoye', 'apercu', 'non_lus', 'nombre_messages',
+        ))
+
+    def test_creation_et_lecture(self):
+        self._envoyer(self.alice, self.bruno, 'Bonjour')
+        dernier = self._envoyer(self.alice, self.bruno, 'Vous êtes là ?')
+
+        entree = self._entree(self.bruno)
+        self.assertEqual((entree.non_lus, entree.nombre_messages), (2, 2))
+        self.assertEqual(entree.interlocuteur, self.alice)
+        self.assertEqual(entree.apercu, 'Vous êtes là ?')
+        self.assertFalse(entree.dernier_message_envoye)
+        self.assertTrue(self._entree(self.alice).dernier_message_envoye)
+        self.assertEqual(self._entree(self.alice).non_lus, 0)
+
+        dernier.marquer_comme_lu()
+        dernier.marquer_comme_lu()
+        self.assertEqual(self._entree(self.bruno).non_lus, 1)
+
+        marquer_messages_lus(self.bruno, self.conversation)
+        self.assertEqual(self._entree(self.bruno).non_lus, 0)
+
+    def test_reconstruction_identique_et_suppression(self):
+        premier = self._envoyer(self.alice, self.bruno, 'Bonjour')
+        self._envoyer(self.bruno, self.alice, 'Salut')
+        premier.marquer_comme_lu()
+        incremental = self._etat()
+
+        EntreeBoiteReception.objects.all().delete()
+        reconstruire()
+        self.assertEqual(self._etat(), incremental)
+
+        # Supprimer le dernier message replace l'aperçu sur le précédent
+        Message.objects.filter(contenu='Salut').delete()
+        self.assertEqual(self._entree(self.alice).apercu, 'Bonjour')
+        self.assertEqual(self._entree(self.alice).nombre_messages, 1)
+
+    def test_messagerie_nombre_requetes_constant(self):
+        def requetes_messagerie():
+            with CaptureQueriesContext(connection) as contexte:
+                reponse = self.client.get(reverse('communication:messagerie'), secure=True)
+            self.assertEqual(reponse.status_code, 200)
+            self.assertNotIn('error', reponse.context)
+            return len(contexte)
+
+        self.client.force_login(self.bruno)
+        self._envoyer(self.alice, self.bruno, 'Bonjour')
+        requetes_messagerie()
+        avant = requetes_messagerie()
+
+        for i in range(10):
+            autre = User.objects.create_user(username=f'autre{i}', password='testpass123')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(autre, self.bruno)
+            self._envoyer(autre, self.bruno, f'Message {i}', conversation)
+
+        self.assertEqual(requetes_messagerie(), avant)
+
+    def test_messagerie_totaux_de_toute_la_boite(self):
+        from . import views
+
+        self.client.force_login(self.bruno)
+        self._envoyer(self.alice, self.bruno, 'Bonjour')
+        for i in range(2):
+            autre = User.objects.create_user(username=f'autre{i}', password='testpass123')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(autre, self.bruno)
+            self._envoyer(autre, self.bruno, f'Message {i}', conversation)
+
+        with mock.patch.object(views, 'CONVERSATIONS_PAR_PAGE', 1):
+            reponse = self.client.get(reverse('communication:messagerie'), secure=True)
+        self.assertEqual(len(reponse.context['conversations']), 1)
+        self.assertEqual((reponse.context['messages_non_lus'], reponse.context['total_messages']), (3, 3))
+
+    def test_api_destinataires_paginee(self):
+        for i in range(25):
+            User.objects.create_user(username=f'dest{i:02d}', password='testpass123')
+        self.client.force_login(self.alice)
+
+        reponse = self.client.get(reverse('communication:api_destinataires'), {'q': 'dest'}, secure=True).json()
+        self.assertEqual(len(reponse['results']), 20)
+        self.assertTrue(reponse['has_next'])
+        self.assertNotIn(self.alice.id, [resultat['id'] for resultat in reponse['results']])
+
+
+class CompteursNonLusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bruno = User.objects.create_user(username='bruno', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bruno)
+
+    def _envoyer(self, contenu):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(
+                expediteur=self.alice, destinataire=self.bruno, conversation=self.conversation, contenu=contenu,
+            )
+
+    def test_creation_lecture_suppression(self):
+        premier = self._envoyer('Bonjour')
+        self._envoyer('Encore moi')
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(user=self.bruno, titre='Info', message='Test')
+        self.assertEqual(compteurs(self.bruno.id), {'messages': 2, 'notifications': 1})
+        self.assertEqual(compteurs(self.alice.id), {'messages': 0, 'notifications': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            premier.marquer_comme_lu()
+            notification.marquer_comme_lue()
+        self.assertEqual(compteurs(self.bruno.id), {'messages': 1, 'notifications': 0})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.filter(est_lu=False).delete()
+        self.assertEqual(compteurs(self.bruno.id)['messages'], 0)
+        self.assertEqual(CompteurNonLus.objects.get(pk=self.bruno.id).messages, 0)
+
+    def test_lecture_sans_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.bruno, titre='Info', message='Test')
+        self.client.force_login(self.bruno)
+        url = reverse('communication:notifications_count')
+        self.client.get(url, secure=True)
+
+        with CaptureQueriesContext(connection) as contexte:
+            reponse = self.client.get(url, secure=True)
+        self.assertEqual(reponse.json()['count'], 1)
+        self.assertFalse([requete for requete in contexte.captured_queries if 'COUNT(' in requete['sql']])
+
+    def test_reconciliation_corrige_les_ecarts(self):
+        self._envoyer('Bonjour')
+        compteurs(self.alice.id)
+        # Mise à jour en masse qui contourne les compteurs
+        Message.objects.filter(destinataire=self.bruno).update(est_lu=True)
+        CompteurNonLus.objects.filter(pk=self.alice.id).update(notifications=3)
+
+        self.assertEqual(reconcilier(), 2)
+        self.assertEqual(compteurs(self.bruno.id), {'messages': 0, 'notifications': 0})
+        self.assertEqual(compteurs(self.alice.id)['notifications'], 0)
+        self.assertEqual(reconcilier(), 0)
+
+
+class DiffusionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.expediteur = User.objects.create_user(username='agent', password='testpass123')
+
+    def _membres(self, nombre, prefixe):
+        return [User.objects.create_user(username=f'{prefixe}{i}', password='x').id for i in range(nombre)]
+
+    @override_settings(DIFFUSION_DESTINATAIRES_PAR_TRANSACTION=4)
+    def test_diffusion_par_lots(self):
+        membres = self._membres(10, 'membre')
+        existante = get_or_create_conversation(self.expediteur, User.objects.get(id=membres[0]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultat = diffuser(self.expediteur.id, membres + [membres[1], self.expediteur.id, 999999], 'Rappel', titre='AG')
+
+        self.assertEqual(resultat['destinataires'], 10)
+        self.assertEqual(resultat['conversations_creees'], 9)
+        self.assertEqual(Message.objects.filter(conversation=existante).count(), 1)
+        self.assertEqual(compteurs(membres[3])['messages'], 1)
+        entree = EntreeBoiteReception.objects.get(utilisateur_id=membres[5])
+        self.assertEqual((entree.interlocuteur_id, entree.non_lus, entree.apercu), (self.expediteur.id, 1, 'Rappel'))
+
+        # Une seconde diffusion réutilise les conversations créées
+        self.assertEqual(diffuser(self.expediteur.id, membres, 'Suite')['conversations_creees'], 0)
+
+    def test_nombre_requetes_independant_du_nombre_de_destinataires(self):
+        def requetes(membres):
+            with CaptureQueriesContext(connection) as contexte:
+                diffuser(self.expediteur.id, membres, 'Bonjour')
+                notifier_en_masse(membres, 'Info', 'Bonjour')
+            return len(contexte)
+
+        self.assertEqual(requetes(self._membres(3, 'petit')), requetes(self._membres(40, 'grand')))
+        self.assertEqual(Notification.objects.count(), 43)
+
+
+class ConversationPriveeTests(TestCase):
+
+    def test_cle_de_paire_unique(self):
+        alice = User.objects.create_user(username='alice', password='testpass123')
+        bruno = User.objects.create_user(username='bruno', password='testpass123')
+
+        conversation = get_or_create_conversation(alice, bruno)
+        with CaptureQueriesContext(connection) as contexte:
+            self.assertEqual(get_or_create_conversation(bruno, alice), conversation)
+        # Une seule lecture indexée (hors SAVEPOINT de transaction.atomic)
+        self.assertEqual(len([requete for requete in contexte.captured_queries if 'SAVEPOINT' not in requete['sql']]), 1)
+        self.assertEqual(set(conversation.participants.values_list('id', flat=True)), {alice.id, bruno.id})
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(participant_min=alice, participant_max=bruno)
+
+    def test_migration_fusionne_les_doublons(self):
+        alice = User.objects.create_user(username='alice', password='testpass123')
+        bruno = User.objects.create_user(username='bruno', password='testpass123')
+        doublons = []
+        for contenu in ('Premier', 'Second'):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(alice, bruno)
+            Message.objects.create(expediteur=alice, destinataire=bruno, conversation=conversation, contenu=contenu)
+            doublons.append(conversation)
+
+        migration = importlib.import_module('communication.migrations.0004_paires_conversations')
+        migration.fusionner_doublons(django_apps, None)
+
+        conversation = get_or_create_conversation(alice, bruno)
+        self.assertEqual(conversation, doublons[0])
+        self.assertFalse(Conversation.objects.filter(id=doublons[1].id).exists())
+        self.assertEqual(conversation.messages.count(), 2)
+        entree = EntreeBoiteReception.objects.get(utilisateur=bruno)
+        self.assertEqual((entree.conversation_id, entree.nombre_messages, entree.non_lus), (conversation.id, 2, 2))
+
+
+class TempsReelTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bruno = User.objects.create_user(username='bruno', password='testpass123')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bruno)
+        actif = mock.patch.object(temps_reel, 'actif', return_value=True)
+        actif.start()
+        self.addCleanup(actif.stop)
+
+    def _publies(self, action):
+        with mock.patch.object(temps_reel, '_envoyer') as envoyer:
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+        return [(utilisateur_id, evenement['type'], evenement) for (utilisateur_id, evenement), _ in envoyer.call_args_list]
+
+    def test_evenements_publies_apres_commit(self):
+        envoi = self._publies(lambda: Message.objects.create(
+            expediteur=self.alice, destinataire=self.bruno, conversation=self.conversation, contenu='Bonjour',
+        ))
+        self.assertEqual([(utilisateur, type_) for utilisateur, type_, _ in envoi],
+                         [(self.bruno.id, 'compteurs'), (self.bruno.id, 'message')])
+        self.assertEqual(envoi[0][2]['messages'], 1)
+        self.assertEqual(envoi[1][2]['apercu'], 'Bonjour')
+
+        message = Message.objects.get()
+        lecture = self._publies(message.marquer_comme_lu)
+        self.assertIn((self.alice.id, 'lecture'), [(utilisateur, type_) for utilisateur, type_, _ in lecture])
+
+        notification = self._publies(lambda: Notification.objects.create(user=self.alice, titre='Info', message='Test'))
+        self.assertEqual([type_ for _, type_, _ in notification], ['compteurs', 'notification'])
+
+    def test_lecture_en_masse_accuse_reception(self):
+        for contenu in ('Un', 'Deux'):
+            self._publies(lambda: Message.objects.create(
+                expediteur=self.alice, destinataire=self.bruno, conversation=self.conversation, contenu=contenu,
+            ))
+
+        publies = self._publies(lambda: marquer_messages_lus(self.bruno, self.conversation))
+        self.assertIn((self.alice.id, 'lecture'), [(utilisateur, type_) for utilisateur, type_, _ in publies])
+        self.assertEqual([evenement['messages'] for _, type_, evenement in publies if type_ == 'compteurs'], [0])
+
+    def test_diffusion_pousse_les_compteurs(self):
+        # Alice a déjà une ligne de compteurs, Bruno sera initialisé
+        compteurs(self.alice.id)
+        expediteur = User.objects.create_user(username='agent', password='testpass123')
+        diffusion = self._publies(lambda: diffuser(expediteur.id, [self.alice.id, self.bruno.id], 'Rappel'))
+        self.assertEqual(
+            sorted((utilisateur, evenement['messages']) for utilisateur, type_, evenement in diffusion if type_ == 'compteurs'),
+            [(self.alice.id, 1), (self.bruno.id, 1)],
+        )
+
+        notification = self._publies(lambda: notifier_en_masse([self.alice.id, self.bruno.id], 'Info', 'AG'))
+        self.assertEqual(
+            sorted((utilisateur, evenement['notifications']) for utilisateur, type_, evenement in notification if type_ == 'compteurs'),
+            [(self.alice.id, 1), (self.bruno.id, 1)],
+        )
+
+
+@skipUnless(importlib.util.find_spec('channels'), "django-channels non installé")
+class FluxUtilisateurConsumerTests(TransactionTestCase):
+
+    def test_flux_authentifie(self):
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+
+        from .consumers import FluxUtilisateurConsumer
+
+        utilisateur = User.objects.create_user(username='alice', password='testpass123')
+
+        async def scenario():
+            anonyme = WebsocketCommunicator(FluxUtilisateurConsumer.as_asgi(), '/ws/communication/')
+            connecte, _ = await anonyme.connect()
+            self.assertFalse(connecte)
+
+            communicator = WebsocketCommunicator(FluxUtilisateurConsumer.as_asgi(), '/ws/communication/')
+            communicator.scope['user'] = utilisateur
+            connecte, _ = await communicator.connect()
+            self.assertTrue(connecte)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'compteurs')
+
+            await get_channel_layer().group_send(
+                temps_reel.groupe_utilisateur(utilisateur.id),
+                {'type': 'evenement', 'evenement': {'type': 'notification', 'titre': 'Info'}},
+            )
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'notification', 'titre': 'Info'})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
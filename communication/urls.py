@@ -58,6 +58,7 @@ urlpatterns = [
     # API Messages
     path('envoyer-message-api/', views.envoyer_message_api, name='envoyer_message_api'),
     path('api/messages/<int:message_id>/marquer-lu/', views.marquer_message_lu, name='marquer_message_lu'),
+    path('api/destinataires/', views.api_destinataires, name='api_destinataires'),
     
     # =========================================================================
     # NOTIFICATIONS - COMPLÈTES ET CORRIGÉES
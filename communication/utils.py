@@ -1,32 +1,31 @@
 # communication/utils.py
-from django.contrib.auth import get_user_model
+import logging
+
+from django.db import transaction
 from .models import Conversation
 
+logger = logging.getLogger('communication')
+
+def conversation_privee(utilisateur_a, utilisateur_b):
+    """
+    Conversation privée entre deux utilisateurs, créée au besoin : une
+    recherche sur la clé de paire unique (participant_min, participant_max).
+    Retourne (conversation, creee) ; sûr en cas d'envois concurrents.
+    """
+    mini, maxi = sorted((utilisateur_a.id, utilisateur_b.id))
+    with transaction.atomic():
+        conversation, creee = Conversation.objects.get_or_create(participant_min_id=mini, participant_max_id=maxi)
+        if creee:
+            conversation.participants.add(utilisateur_a, utilisateur_b)
+    return conversation, creee
+
 def get_or_create_conversation(expediteur, destinataire):
     """
     Crée ou récupère une conversation entre deux utilisateurs
     Retourne l'instance Conversation
     """
-    User = get_user_model()
-    
-    # Chercher une conversation existante entre ces deux utilisateurs
-    conversations = Conversation.objects.filter(
-        participants=expediteur
-    ).filter(
-        participants=destinataire
-    ).distinct()
-    
-    # Prendre la première conversation trouvée
-    if conversations.exists():
-        conversation = conversations.first()
-        print(f"✅ Conversation existante trouvée: {conversation.id}")
-    else:
-        # Créer une nouvelle conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(expediteur, destinataire)
-        conversation.save()
-        print(f"✅ Nouvelle conversation créée: {conversation.id}")
-    
+    conversation, creee = conversation_privee(expediteur, destinataire)
+    logger.debug(f"Conversation {'créée' if creee else 'existante'}: {conversation.id}")
     return conversation
 
 def creer_message_automatique(expediteur, destinataire, titre, contenu, type_message='MESSAGE'):
@@ -47,7 +46,7 @@ def creer_message_automatique(expediteur, destinataire, titre, contenu, type_mes
         type_message=type_message
     )
     
-    print(f"✅ Message créé: {message.id} dans conversation: {conversation.id}")
+    logger.debug(f"Message créé: {message.id} dans conversation: {conversation.id}")
     return message
 
 def get_conversations_utilisateur(utilisateur):
@@ -82,5 +81,8 @@ def marquer_messages_lus(utilisateur, conversation=None):
         messages = messages.filter(conversation=conversation)
     
     count = messages.update(est_lu=True, date_lecture=timezone.now())
-    print(f"✅ {count} message(s) marqué(s) comme lu(s) pour {utilisateur.username}")
+    if count:
+        from .boite_reception import recalculer_non_lus
+        recalculer_non_lus(utilisateur.id, conversation.id if conversation else None)
+    logger.debug(f"{count} message(s) marqué(s) comme lu(s) pour {utilisateur.username}")
     return count
\ No newline at end of file
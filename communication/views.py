@@ -3,7 +3,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, FileResponse, HttpResponse
-from django.db.models import Q, Count, Max
+from django.db.models import Q, Count, Max, Sum
 from django.utils import timezone
 from django.core.files.storage import FileSystemStorage
 import json
@@ -17,11 +17,20 @@ from .models import Message, PieceJointe, Notification, Conversation, MessageGro
 from .forms import MessageForm, MessageGroupeForm, UploadFileForm, GroupeCommunicationForm
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST  # CORRECTION: Import depuis django.views.decorators.http
+from django.views.decorators.http import require_GET, require_POST  # CORRECTION: Import depuis django.views.decorators.http
+from django.core.paginator import Paginator
+from . import compteurs
+from .boite_reception import boite_reception, recalculer_non_lus
+from .diffusion import lancer_notifications
+from .utils import get_or_create_conversation
 
 # Configurer le logger
 logger = logging.getLogger(__name__)
 
+CONVERSATIONS_PAR_PAGE = 20
+MESSAGES_CONVERSATION_ACTIVE = 50
+DESTINATAIRES_PAR_PAGE = 20
+
 # =============================================================================
 # FONCTIONS UTILITAIRES
 # =============================================================================
@@ -58,87 +67,47 @@ def communication_home(request):
 
 @login_required
 def messagerie(request):
-    """Page principale de messagerie - VERSION COMPLÈTEMENT CORRIGÉE"""
+    """Page principale de messagerie, lue depuis la boîte de réception dénormalisée"""
     try:
-        from django.db.models import Count, Q, Max
-        from django.contrib.auth.models import User
-        
-        # Initialiser les variables par défaut
-        conversations = []
-        messages_recents = []
-        all_users = User.objects.exclude(id=request.user.id).order_by('username')
-        participants = []
+        # Une requête indexée par page (communication/boite_reception.py)
+        page_conversations = Paginator(boite_reception(request.user), CONVERSATIONS_PAR_PAGE).get_page(
+            request.GET.get('page')
+        )
+        entrees = list(page_conversations.object_list)
+        
+        active_entree = entrees[0] if entrees else None
         active_conversation = None
         active_messages = None
         active_conversation_participant_name = "Sélectionnez une conversation"
         
-        try:
-            # Récupérer les conversations avec annotations
-            conversations = Conversation.objects.filter(
-                participants=request.user
-            ).annotate(
-                nb_messages_non_lus=Count('messages', filter=Q(messages__est_lu=False) & ~Q(messages__expediteur=request.user)),
-                derniere_activite=Max('messages__date_envoi'),
-                total_messages=Count('messages')
-            ).order_by('-derniere_activite')
-            
-            # Récupérer les messages récents
-            messages_recents = Message.objects.filter(
-                Q(expediteur=request.user) | Q(destinataire=request.user)
-            ).select_related('expediteur', 'destinataire').order_by('-date_envoi')[:10]
-            
-            # Créer la liste des participants
-            participants_ids = set()
-            for conv in conversations:
-                for user in conv.participants.all():
-                    if user.id != request.user.id:
-                        participants_ids.add(user.id)
-            
-            for msg in messages_recents:
-                if msg.expediteur.id != request.user.id:
-                    participants_ids.add(msg.expediteur.id)
-                if msg.destinataire and msg.destinataire.id != request.user.id:
-                    participants_ids.add(msg.destinataire.id)
-            
-            participants = User.objects.filter(id__in=participants_ids).order_by('username') if participants_ids else []
-            
-            # Déterminer la conversation active
-            if conversations.exists():
-                active_conversation = conversations.first()
-                active_messages = active_conversation.messages.all().order_by('date_envoi')
-                
-                # Récupérer le nom du participant de la conversation active
-                other_participants = active_conversation.participants.exclude(id=request.user.id)
-                if other_participants.exists():
-                    other_participant = other_participants.first()
-                    active_conversation_participant_name = other_participant.get_full_name() or other_participant.username
-        
-        except (Conversation.DoesNotExist, Message.DoesNotExist):
-            # Si les modèles n'existent pas, utiliser des listes vides
-            pass
-        
-        # Compter les messages non lus
-        messages_non_lus = 0
-        try:
-            messages_non_lus = Message.objects.filter(
-                destinataire=request.user,
-                est_lu=False
-            ).count()
-        except:
-            pass
+        if active_entree:
+            active_conversation = Conversation.objects.prefetch_related('participants').get(
+                pk=active_entree.conversation_id
+            )
+            # Derniers messages seulement, dans l'ordre chronologique
+            active_messages = list(
+                active_conversation.messages.select_related('expediteur').order_by('-date_envoi')[:MESSAGES_CONVERSATION_ACTIVE]
+            )[::-1]
+            if active_entree.interlocuteur:
+                active_conversation_participant_name = (
+                    active_entree.interlocuteur.get_full_name() or active_entree.interlocuteur.username
+                )
+        
+        # Totaux de toute la boîte, pas seulement de la page affichée
+        totaux = boite_reception(request.user).aggregate(messages=Sum('nombre_messages'), non_lus=Sum('non_lus'))
+        messages_non_lus = totaux['non_lus'] or 0
         
         context = {
-            'conversations': conversations,
-            'messages_recents': messages_recents,
-            'all_users': all_users,
-            'participants': participants,
+            'conversations': entrees,
+            'page_conversations': page_conversations,
+            'active_entree': active_entree,
             'active_conversation': active_conversation,
             'active_messages': active_messages,
             'active_conversation_participant_name': active_conversation_participant_name,
             'form': MessageForm(),
             'page_title': 'Messagerie',
-            'total_conversations': len(conversations),
-            'total_messages': len(messages_recents),
+            'total_conversations': page_conversations.paginator.count,
+            'total_messages': totaux['messages'] or 0,
             'messages_non_lus': messages_non_lus,
             'unread_messages_count': messages_non_lus,
         }
@@ -146,13 +115,9 @@ def messagerie(request):
         return render(request, 'communication/messagerie.html', context)
         
     except Exception as e:
-        from django.contrib.auth.models import User
-        
+        logger.error(f"Erreur messagerie: {e}")
         context = {
             'conversations': [],
-            'messages_recents': [],
-            'all_users': User.objects.exclude(id=request.user.id).order_by('username'),
-            'participants': [],
             'active_conversation': None,
             'active_messages': None,
             'active_conversation_participant_name': "Sélectionnez une conversation",
@@ -165,6 +130,31 @@ def messagerie(request):
             'unread_messages_count': 0,
         }
         return render(request, 'communication/messagerie.html', context)
+
+@login_required
+@require_GET
+def api_destinataires(request):
+    """Sélection paginée des destinataires (autocomplétion) au lieu de la liste complète des utilisateurs"""
+    terme = request.GET.get('q', '').strip()
+    utilisateurs = User.objects.filter(is_active=True).exclude(id=request.user.id)
+    if terme:
+        utilisateurs = utilisateurs.filter(
+            Q(username__istartswith=terme) | Q(first_name__istartswith=terme) | Q(last_name__istartswith=terme)
+        )
+    page = Paginator(
+        utilisateurs.order_by('username').only('id', 'username', 'first_name', 'last_name'),
+        DESTINATAIRES_PAR_PAGE,
+    ).get_page(request.GET.get('page'))
+    
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {'id': utilisateur.id, 'text': utilisateur.get_full_name() or utilisateur.username, 'username': utilisateur.username}
+            for utilisateur in page.object_list
+        ],
+        'has_next': page.has_next(),
+    })
+
 # =============================================================================
 # API ENVOYER MESSAGE - VERSION CORRIGÉE (ACCEPTE JSON ET FORM-DATA)
 # =============================================================================
@@ -271,15 +261,7 @@ def envoyer_message_api(request):
             }, status=400)
         
         # Gestion de la conversation
-        conversation = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants=destinataire
-        ).distinct().first()
-        
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(request.user, destinataire)
+        conversation = get_or_create_conversation(request.user, destinataire)
         
         message.conversation = conversation
         message.save()
@@ -443,7 +425,8 @@ def liste_messages(request):
         messages_envoyes = Message.objects.filter(expediteur=request.user).select_related('destinataire').order_by('-date_envoi')
         
         # Marquer les messages comme lus
-        messages_recus.filter(est_lu=False).update(est_lu=True, date_lecture=timezone.now())
+        if messages_recus.filter(est_lu=False).update(est_lu=True, date_lecture=timezone.now()):
+            recalculer_non_lus(request.user.id)
         
         return render(request, 'communication/liste_messages.html', {
             'messages_recus': messages_recus,
@@ -472,15 +455,7 @@ def envoyer_message(request):
                 
                 # Gestion de la conversation
                 destinataire = form.cleaned_data['destinataire']
-                conversation = Conversation.objects.filter(
-                    participants=request.user
-                ).filter(
-                    participants=destinataire
-                ).first()
-                
-                if not conversation:
-                    conversation = Conversation.objects.create()
-                    conversation.participants.add(request.user, destinataire)
+                conversation = get_or_create_conversation(request.user, destinataire)
                 
                 message.conversation = conversation
                 message.save()
@@ -713,6 +688,7 @@ def marquer_toutes_notifications_lues(request):
             est_lue=True, 
             date_lecture=timezone.now()
         )
+        compteurs.recalculer(request.user.id, 'notifications')
         messages.success(request, "Toutes les notifications ont été marquées comme lues.")
     except Exception as e:
         messages.error(request, f"Erreur: {str(e)}")
@@ -760,10 +736,11 @@ def api_messages(request, conversation_id):
         messages_list = conversation.messages.all().select_related('expediteur', 'destinataire').order_by('date_envoi')
         
         # Marquer les messages comme lus
-        messages_list.filter(destinataire=request.user, est_lu=False).update(
+        if messages_list.filter(destinataire=request.user, est_lu=False).update(
             est_lu=True, 
             date_lecture=timezone.now()
-        )
+        ):
+            recalculer_non_lus(request.user.id, conversation.id)
         
         data = []
         for msg in messages_list:
@@ -800,7 +777,7 @@ def api_messages(request, conversation_id):
 def notification_non_lue_count(request):
     """API pour compter les notifications non lues - CORRIGÉE"""
     try:
-        count = Notification.objects.filter(user=request.user, est_lue=False).count()
+        count = compteurs.non_lus(request.user.id, 'notifications')
         return JsonResponse({'count': count})
     except:
         return JsonResponse({'count': 0})
@@ -827,7 +804,7 @@ class MessageListView(LoginRequiredMixin, ListView):
         user = self.request.user
         
         # Calcul des statistiques
-        context['unread_count'] = user.messages_recus.filter(est_lu=False).count()
+        context['unread_count'] = compteurs.non_lus(user.id, 'messages')
         context['total_received'] = user.messages_recus.count()
         context['total_sent'] = user.messages_envoyes.count()
         
@@ -877,15 +854,7 @@ class MessageCreateView(LoginRequiredMixin, CreateView):
         
         # Gérer la conversation
         destinataire = form.cleaned_data['destinataire']
-        conversation = Conversation.objects.filter(
-            participants=self.request.user
-        ).filter(
-            participants=destinataire
-        ).first()
-        
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(self.request.user, destinataire)
+        conversation = get_or_create_conversation(self.request.user, destinataire)
         
         form.instance.conversation = conversation
         response = super().form_valid(form)
@@ -903,9 +872,16 @@ class MessageCreateView(LoginRequiredMixin, CreateView):
     
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        form.fields['destinataire'].queryset = form.fields['destinataire'].queryset.exclude(
-            id=self.request.user.id
-        )
+        champ = form.fields['destinataire']
+        champ.queryset = champ.queryset.exclude(id=self.request.user.id)
+        if not form.is_bound:
+            # Options chargées à la demande par api_destinataires (autocomplétion)
+            initial = form.initial.get('destinataire')
+            champ.queryset = champ.queryset.filter(pk=initial) if initial else champ.queryset.none()
+        champ.widget.attrs.update({
+            'class': 'form-select',
+            'data-autocomplete-url': reverse_lazy('communication:api_destinataires'),
+        })
         return form
 
 class NotificationListView(LoginRequiredMixin, ListView):
@@ -924,6 +900,7 @@ class NotificationListView(LoginRequiredMixin, ListView):
             est_lue=True, 
             date_lecture=timezone.now()
         )
+        compteurs.recalculer(request.user.id, 'notifications')
         return super().get(request, *args, **kwargs)
 
 @login_required
@@ -1051,14 +1028,13 @@ def envoyer_message_groupe(request, groupe_id):
                 message.groupe = groupe
                 message.save()
                 
-                # Notifier tous les membres du groupe (sauf l'expéditeur)
-                for membre in groupe.membres.exclude(id=request.user.id):
-                    Notification.objects.create(
-                        user=membre,
-                        titre=f"Nouveau message dans {groupe.nom}",
-                        message=form.cleaned_data['contenu'][:100] + "...",
-                        type_notification='GROUPE'
-                    )
+                # Notifier tous les membres du groupe (sauf l'expéditeur), en masse
+                lancer_notifications(
+                    groupe.membres.exclude(id=request.user.id).values_list('id', flat=True),
+                    titre=f"Nouveau message dans {groupe.nom}",
+                    message=form.cleaned_data['contenu'][:100] + "...",
+                    type_notification='GROUPE',
+                )
                 
                 return JsonResponse({'success': True, 'message_id': message.id})
         
@@ -1116,11 +1092,12 @@ def stats_communication(request):
     try:
         # Messages reçus
         messages_recus = Message.objects.filter(destinataire=request.user)
-        messages_non_lus = messages_recus.filter(est_lu=False).count()
+        non_lus = compteurs.compteurs(request.user.id)
+        messages_non_lus = non_lus['messages']
         
         # Notifications
         notifications_total = Notification.objects.filter(user=request.user).count()
-        notifications_non_lues = Notification.objects.filter(user=request.user, est_lue=False).count()
+        notifications_non_lues = non_lus['notifications']
         
         # Fichiers partagés
         fichiers_recus = PieceJointe.objects.filter(message__destinataire=request.user).count()
@@ -69,7 +69,8 @@ def api_conversation_messages_simple(request, conversation_id):
 def api_send_message(request):
     """API pour envoyer un message (sans authentification pour test)"""
     try:
-        from communication.models import Conversation, Message
+        from communication.models import Message
+        from communication.utils import get_or_create_conversation
         from django.contrib.auth.models import User
         
         # Parser les données JSON
@@ -99,15 +100,7 @@ def api_send_message(request):
         destinataire = User.objects.get(id=destinataire_id)
         
         # Trouver ou créer la conversation
-        conversation = Conversation.objects.filter(
-            participants=expediteur
-        ).filter(
-            participants=destinataire
-        ).first()
-        
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(expediteur, destinataire)
+        conversation = get_or_create_conversation(expediteur, destinataire)
         
         # Créer le message
         message = Message.objects.create(
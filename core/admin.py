@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import TacheAsynchrone
 
-# Register your models here.
+
+@admin.register(TacheAsynchrone)
+class TacheAsynchroneAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'cle', 'statut', 'tentatives', 'executer_apres', 'date_fin']
+    list_filter = ['statut', 'nom']
+    search_fields = ['nom', 'cle']
+    readonly_fields = ['date_creation', 'date_debut', 'date_fin', 'derniere_erreur']
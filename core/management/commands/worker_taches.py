@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from core.taches import boucle_worker, statistiques_taches
+
+
+class Command(BaseCommand):
+    help = 'Exécute les tâches asynchrones en attente (scores, analyse IA, relances...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Nombre de tâches réclamées par lot (défaut: 50)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=1.0,
+            help='Attente en secondes quand la file est vide (défaut: 1.0)'
+        )
+        parser.add_argument(
+            '--une-fois',
+            action='store_true',
+            help='Vider la file puis s\'arrêter au lieu de tourner en continu'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Afficher l\'état de la file et le débit récent puis quitter'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = statistiques_taches()
+            for statut, total in sorted(stats['par_statut'].items()):
+                self.stdout.write(f"• {statut}: {total}")
+            self.stdout.write(
+                f"• Débit (5 dernières minutes): {stats['debit_par_seconde']} tâche(s)/s"
+            )
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("🚀 Worker de tâches démarré"))
+
+        def rapport(traitees, succes, debit):
+            self.stdout.write(
+                f"• {traitees} tâche(s) traitée(s), {succes} succès - {debit:.1f} tâches/s"
+            )
+
+        total = boucle_worker(
+            limite=max(1, options['batch_size']),
+            pause=options['pause'],
+            une_fois=options['une_fois'],
+            rapport=rapport,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} tâche(s) traitée(s)"))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheAsynchrone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(help_text='Chemin pointé de la fonction à exécuter', max_length=200)),
+                ('cle', models.CharField(blank=True, default='', help_text='Clé de coalescence : une seule tâche en attente par clé', max_length=200)),
+                ('parametres', models.JSONField(blank=True, default=dict)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echec', 'Échec'), ('fusionnee', 'Fusionnée')], default='en_attente', max_length=20)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('max_tentatives', models.PositiveIntegerField(default=5)),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resultat', models.JSONField(blank=True, null=True)),
+                ('derniere_erreur', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tâche asynchrone',
+                'verbose_name_plural': 'Tâches asynchrones',
+                'ordering': ['executer_apres', 'id'],
+                'indexes': [models.Index(fields=['statut', 'executer_apres'], name='core_tachea_statut_a5a85c_idx'), models.Index(fields=['statut', 'date_fin'], name='core_tachea_statut_44d398_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('statut', 'en_attente'), models.Q(('cle', ''), _negated=True)), fields=('cle',), name='tache_unique_en_attente_par_cle')],
+            },
+        ),
+    ]
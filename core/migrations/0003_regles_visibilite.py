@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def regles_pharmaciens(apps, schema_editor):
+    """Les ordonnances déjà partagées avec chaque pharmacien le sont désormais par une règle de rôle"""
+    PartageAutomatique = apps.get_model('core', 'PartageAutomatique')
+    RegleVisibilite = apps.get_model('core', 'RegleVisibilite')
+    User = apps.get_model('auth', 'User')
+
+    partages = PartageAutomatique.objects.filter(type_document='ORD')
+    RegleVisibilite.objects.bulk_create(
+        [RegleVisibilite(partage_id=partage_id, role='PHARMACIEN') for partage_id in partages.values_list('id', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    PartageAutomatique.visible_par.through.objects.filter(
+        partageautomatique__type_document='ORD',
+        user__in=User.objects.filter(groups__name__iexact='pharmacien'),
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0002_tacheasynchrone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegleVisibilite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(help_text="Rôle couvert, tenu d'un groupe Django ou d'un profil actif, ex. PHARMACIEN", max_length=20)),
+                ('perimetre_id', models.PositiveIntegerField(default=0, help_text='Limite la règle à un périmètre du rôle (ex. une pharmacie) ; 0 : tout le rôle')),
+                ('partage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regles', to='core.partageautomatique')),
+            ],
+            options={
+                'verbose_name': 'Règle de visibilité',
+                'verbose_name_plural': 'Règles de visibilité',
+                'indexes': [models.Index(fields=['role', 'perimetre_id'], name='core_reglev_role_99fdde_idx')],
+                'constraints': [models.UniqueConstraint(fields=('partage', 'role', 'perimetre_id'), name='regle_visibilite_unique')],
+            },
+        ),
+        migrations.RunPython(regles_pharmaciens, migrations.RunPython.noop),
+    ]
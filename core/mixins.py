@@ -1,6 +1,7 @@
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from .models import PartageAutomatique
+from .partage import documents_visibles, est_visible
 
 class PartageAutomatiqueMixin:
     """Mixin pour vérifier l'accès aux documents partagés"""
@@ -8,11 +9,7 @@ class PartageAutomatiqueMixin:
     def get_document_partage(self, type_document, document_id):
         """Récupère un document si l'utilisateur y a accès"""
         # Vérifier si le document est partagé avec l'utilisateur
-        if PartageAutomatique.objects.filter(
-            type_document=type_document,
-            document_id=document_id,
-            visible_par=self.request.user
-        ).exists():
+        if est_visible(self.request.user, type_document, document_id):
             
             # Récupérer le document selon son type
             if type_document == PartageAutomatique.ORDONNANCE:
@@ -30,19 +27,13 @@ class FiltreParPartageMixin:
     def get_queryset_ordonnances(self):
         """Retourne les ordonnances accessibles à l'utilisateur"""
         from medecin.models import Ordonnance
-        ordonnances_partagees = PartageAutomatique.objects.filter(
-            type_document=PartageAutomatique.ORDONNANCE,
-            visible_par=self.request.user
-        ).values_list('document_id', flat=True)
+        ordonnances_partagees = documents_visibles(self.request.user, PartageAutomatique.ORDONNANCE)
         
         return Ordonnance.objects.filter(id__in=ordonnances_partagees)
     
     def get_queryset_bons(self):
         """Retourne les bons accessibles à l'utilisateur"""
         from assureur.models import Bon
-        bons_partages = PartageAutomatique.objects.filter(
-            type_document=PartageAutomatique.BON,
-            visible_par=self.request.user
-        ).values_list('document_id', flat=True)
+        bons_partages = documents_visibles(self.request.user, PartageAutomatique.BON)
         
         return Bon.objects.filter(id__in=bons_partages)
\ No newline at end of file
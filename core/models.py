@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import PermissionDenied
+from django.utils import timezone
 
 
 # Modèle proxy pour Session avec méthode __str__
@@ -45,6 +46,33 @@ class PartageAutomatique(models.Model):
     def __str__(self):
         return f"Partage {self.type_document}-{self.document_id}"
 
+class RegleVisibilite(models.Model):
+    """
+    Visibilité d'un document partagé pour tout un rôle, plutôt qu'une ligne
+    visible_par par utilisateur ; résolue à la consultation (core.partage)
+    """
+    TOUT_LE_ROLE = 0
+
+    partage = models.ForeignKey(PartageAutomatique, on_delete=models.CASCADE, related_name='regles')
+    role = models.CharField(max_length=20, help_text="Rôle couvert, tenu d'un groupe Django ou d'un profil actif, ex. PHARMACIEN")
+    perimetre_id = models.PositiveIntegerField(
+        default=TOUT_LE_ROLE,
+        help_text="Limite la règle à un périmètre du rôle (ex. une pharmacie) ; 0 : tout le rôle"
+    )
+
+    class Meta:
+        verbose_name = "Règle de visibilité"
+        verbose_name_plural = "Règles de visibilité"
+        indexes = [
+            models.Index(fields=['role', 'perimetre_id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['partage', 'role', 'perimetre_id'], name='regle_visibilite_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.partage} visible par {self.role}" + (f" ({self.perimetre_id})" if self.perimetre_id else "")
+
 class Notification(models.Model):
     """Système de notifications pour les nouveaux documents - VERSION CORRIGÉE"""
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -62,4 +90,51 @@ class Notification(models.Model):
         ]
     
     def __str__(self):
-        return f"Notification pour {self.utilisateur}"
\ No newline at end of file
+        return f"Notification pour {self.utilisateur}"
+
+class TacheAsynchrone(models.Model):
+    """File de tâches persistée en base, traitée par `manage.py worker_taches`"""
+
+    class Statut(models.TextChoices):
+        EN_ATTENTE = 'en_attente', 'En attente'
+        EN_COURS = 'en_cours', 'En cours'
+        TERMINEE = 'terminee', 'Terminée'
+        ECHEC = 'echec', 'Échec'
+        FUSIONNEE = 'fusionnee', 'Fusionnée'
+
+    nom = models.CharField(max_length=200, help_text="Chemin pointé de la fonction à exécuter")
+    cle = models.CharField(
+        max_length=200,
+        blank=True,
+        default='',
+        help_text="Clé de coalescence : une seule tâche en attente par clé"
+    )
+    parametres = models.JSONField(default=dict, blank=True)
+    statut = models.CharField(max_length=20, choices=Statut.choices, default=Statut.EN_ATTENTE)
+    tentatives = models.PositiveIntegerField(default=0)
+    max_tentatives = models.PositiveIntegerField(default=5)
+    executer_apres = models.DateTimeField(default=timezone.now)
+    resultat = models.JSONField(null=True, blank=True)
+    derniere_erreur = models.TextField(blank=True, default='')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tâche asynchrone"
+        verbose_name_plural = "Tâches asynchrones"
+        ordering = ['executer_apres', 'id']
+        indexes = [
+            models.Index(fields=['statut', 'executer_apres']),
+            models.Index(fields=['statut', 'date_fin']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cle'],
+                condition=models.Q(statut='en_attente') & ~models.Q(cle=''),
+                name='tache_unique_en_attente_par_cle',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} [{self.statut}]"
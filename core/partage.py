@@ -0,0 +1,170 @@
+# core/partage.py
+"""
+Partage des documents (ordonnances, bons) entre les acteurs.
+
+Un PartageAutomatique rend un document visible à quelques utilisateurs nommés
+(visible_par : patient, assureur) et à des rôles entiers par des
+RegleVisibilite (tous les pharmaciens, ou seulement certaines pharmacies) :
+partager coûte un nombre constant d'écritures, quel que soit le nombre de
+pharmaciens. La visibilité est résolue à la consultation, d'après les rôles
+que l'utilisateur tient de ses groupes ou d'un périmètre actif, jamais de son
+nom d'utilisateur (contrairement à get_user_primary_group). Les
+notifications d'un rôle sont créées par lots (bulk_create) dans une tâche de
+fond, une par périmètre actif (une par pharmacie).
+"""
+import logging
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Notification, PartageAutomatique, RegleVisibilite
+from .taches import enfiler
+from .utils import GROUP_MAPPING
+
+logger = logging.getLogger(__name__)
+
+# rôle -> (modèle dont chaque ligne est un périmètre du rôle, avec un champ `user` ; filtre des périmètres actifs)
+PERIMETRES = {
+    'PHARMACIEN': ('pharmacien.Pharmacien', {'actif': True, 'user__is_active': True}),
+}
+
+
+def notifications_par_lot():
+    return getattr(settings, 'PARTAGE_NOTIFICATIONS_PAR_LOT', 1000)
+
+
+def _lots(ids, taille):
+    ids = iter(ids)
+    while True:
+        lot = list(islice(ids, taille))
+        if not lot:
+            return
+        yield lot
+
+
+# ==========================================================================
+# VISIBILITÉ
+# ==========================================================================
+
+def perimetres_utilisateur(user, role):
+    """Sous-requête des périmètres du rôle rattachés à l'utilisateur, ou None si le rôle n'en a pas"""
+    if role not in PERIMETRES:
+        return None
+    return apps.get_model(PERIMETRES[role][0]).objects.filter(user=user).values('id')
+
+
+def roles_utilisateur(user):
+    """
+    Rôles ouvrant l'accès aux partages : ceux des groupes Django de
+    l'utilisateur et ceux dont il tient un périmètre actif (un Pharmacien actif)
+    """
+    roles = {GROUP_MAPPING.get(nom.upper()) for nom in user.groups.values_list('name', flat=True)}
+    for role, (modele, filtre) in PERIMETRES.items():
+        if role not in roles and apps.get_model(modele).objects.filter(user=user, **filtre).exists():
+            roles.add(role)
+    roles.discard(None)
+    return roles
+
+
+def condition_visibilite(user):
+    """Condition sur PartageAutomatique : partages nommant l'utilisateur ou couvrant l'un de ses rôles"""
+    condition = Q(visible_par=user)
+    for role in roles_utilisateur(user):
+        regle = Q(regles__perimetre_id=RegleVisibilite.TOUT_LE_ROLE)
+        perimetres = perimetres_utilisateur(user, role)
+        if perimetres is not None:
+            regle |= Q(regles__perimetre_id__in=perimetres)
+        condition |= Q(regles__role=role) & regle
+    return condition
+
+
+def partages_visibles(user, type_document=None):
+    partages = PartageAutomatique.objects.filter(condition_visibilite(user))
+    if type_document:
+        partages = partages.filter(type_document=type_document)
+    return partages.distinct()
+
+
+def documents_visibles(user, type_document):
+    """Sous-requête des ids de documents de ce type visibles par l'utilisateur"""
+    return partages_visibles(user, type_document).values('document_id')
+
+
+def est_visible(user, type_document, document_id):
+    return partages_visibles(user, type_document).filter(document_id=document_id).exists()
+
+
+# ==========================================================================
+# PARTAGE ET NOTIFICATIONS
+# ==========================================================================
+
+def partager(type_document, document_id, utilisateurs=(), roles=(), perimetres=None):
+    """
+    Rend le document visible aux `utilisateurs` (ids) et aux `roles`. Avec
+    `perimetres` ({rôle: [ids]}), un rôle n'y a accès que depuis ces
+    périmètres. Nombre constant de requêtes ; retourne le partage.
+    """
+    partage, _ = PartageAutomatique.objects.get_or_create(type_document=type_document, document_id=document_id)
+    utilisateurs = [utilisateur_id for utilisateur_id in dict.fromkeys(utilisateurs) if utilisateur_id]
+    if utilisateurs:
+        partage.visible_par.add(*utilisateurs)
+    perimetres = perimetres or {}
+    RegleVisibilite.objects.bulk_create(
+        [
+            RegleVisibilite(partage=partage, role=role, perimetre_id=perimetre_id)
+            for role in roles
+            for perimetre_id in (perimetres.get(role) or [RegleVisibilite.TOUT_LE_ROLE])
+        ],
+        ignore_conflicts=True,
+    )
+    return partage
+
+
+def destinataires_role(role, perimetre_ids=None):
+    """
+    Ids des utilisateurs à notifier pour un rôle : le titulaire de chaque
+    périmètre actif (chaque pharmacie), ou à défaut les membres actifs du groupe
+    """
+    if role in PERIMETRES:
+        modele, filtre = PERIMETRES[role]
+        perimetres = apps.get_model(modele).objects.filter(**filtre)
+        if perimetre_ids:
+            perimetres = perimetres.filter(id__in=perimetre_ids)
+        return list(perimetres.order_by('id').values_list('user_id', flat=True))
+    return list(
+        User.objects.filter(groups__name__iexact=role, is_active=True).order_by('id').values_list('id', flat=True).distinct()
+    )
+
+
+def notifier_role(type_document, document_id, role, message, perimetre_ids=None, exclure_id=None):
+    """Tâche asynchrone : une Notification par destinataire du rôle, par lots ; retourne le nombre créé"""
+    destinataires = [utilisateur_id for utilisateur_id in destinataires_role(role, perimetre_ids) if utilisateur_id != exclure_id]
+    total = 0
+    for lot in _lots(destinataires, notifications_par_lot()):
+        with transaction.atomic():
+            total += len(Notification.objects.bulk_create([
+                Notification(utilisateur_id=utilisateur_id, message=message, type_document=type_document, document_id=document_id)
+                for utilisateur_id in lot
+            ]))
+    logger.info(f"Partage {type_document}-{document_id} : {total} notification(s) {role}")
+    return {'notifications': total}
+
+
+def lancer_notifications_role(type_document, document_id, role, message, perimetre_ids=None, exclure_id=None):
+    """Enfile notifier_role() ; retourne la tâche (None en mode synchrone)"""
+    # Une seule tentative : rejouer notifierait deux fois les lots déjà validés
+    return enfiler(
+        'core.partage.notifier_role',
+        delai=0,
+        max_tentatives=1,
+        type_document=type_document,
+        document_id=document_id,
+        role=role,
+        message=message,
+        perimetre_ids=perimetre_ids,
+        exclure_id=exclure_id,
+    )
@@ -0,0 +1,59 @@
+"""
+Invalidation du cache des rôles (core.utils.get_user_primary_group)
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from core.utils import invalidate_user_primary_group
+
+
+def _oublier_role_instance(user):
+    """Le rôle est aussi mémorisé sur l'objet utilisateur pendant la requête"""
+    if user is not None:
+        user.__dict__.pop('_primary_group_cache', None)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalider_role_groupes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Ajout / retrait de groupes d'un utilisateur (ou d'utilisateurs d'un groupe)"""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_user_primary_group(instance.pk)
+        _oublier_role_instance(instance)
+    elif pk_set:
+        for user_id in pk_set:
+            invalidate_user_primary_group(user_id)
+    elif action == 'pre_clear':
+        # group.user_set.clear() : pk_set n'est pas fourni
+        for user_id in instance.user_set.values_list('id', flat=True):
+            invalidate_user_primary_group(user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalider_role_utilisateur(sender, instance, **kwargs):
+    """is_superuser / username font partie de la résolution"""
+    invalidate_user_primary_group(instance.pk)
+    _oublier_role_instance(instance)
+
+
+def invalider_role_profil(sender, instance, **kwargs):
+    """Création / suppression d'un profil assureur, agent, médecin, pharmacien ou membre"""
+    user_id = getattr(instance, 'user_id', None)
+    if user_id:
+        invalidate_user_primary_group(user_id)
+        _oublier_role_instance(instance._state.fields_cache.get('user'))
+
+
+def connecter_profils():
+    from django.apps import apps
+
+    for label in ('assureur.Assureur', 'agents.Agent', 'medecin.Medecin',
+                  'pharmacien.Pharmacien', 'membres.Membre'):
+        try:
+            modele = apps.get_model(label)
+        except LookupError:
+            continue
+        post_save.connect(invalider_role_profil, sender=modele, dispatch_uid=f'role_{label}_save')
+        post_delete.connect(invalider_role_profil, sender=modele, dispatch_uid=f'role_{label}_delete')
@@ -0,0 +1,182 @@
+# core/taches.py
+"""
+File de tâches asynchrones persistée en base (modèle TacheAsynchrone).
+
+Les signaux et les vues enfilent des tâches idempotentes avec enfiler() ;
+le worker (`python manage.py worker_taches`) les réclame par lots, les
+exécute, et replanifie les échecs avec un backoff exponentiel.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import TacheAsynchrone
+
+logger = logging.getLogger(__name__)
+
+Statut = TacheAsynchrone.Statut
+
+
+def fenetre_coalescence():
+    """Délai (secondes) pendant lequel les tâches d'une même clé sont fusionnées"""
+    return getattr(settings, 'TACHES_FENETRE_COALESCENCE', 30)
+
+
+def enfiler(nom, cle='', delai=None, max_tentatives=5, **parametres):
+    """
+    Enfile la fonction `nom` (chemin pointé) avec ses paramètres JSON.
+
+    Si une tâche de même clé est déjà en attente, aucune nouvelle tâche n'est
+    créée : les appels répétés pendant la fenêtre de coalescence n'entraînent
+    qu'une seule exécution. Retourne la tâche créée, ou None si fusionnée.
+    """
+    if getattr(settings, 'TACHES_MODE_SYNCHRONE', False):
+        import_string(nom)(**parametres)
+        return None
+
+    if delai is None:
+        delai = fenetre_coalescence() if cle else 0
+
+    try:
+        with transaction.atomic():
+            return TacheAsynchrone.objects.create(
+                nom=nom,
+                cle=cle,
+                parametres=parametres,
+                max_tentatives=max_tentatives,
+                executer_apres=timezone.now() + timedelta(seconds=delai),
+            )
+    except IntegrityError:
+        # Une tâche en attente existe déjà pour cette clé
+        return None
+
+
+def reclamer_taches(limite=50):
+    """Réserve jusqu'à `limite` tâches dues pour ce worker (UPDATE conditionnel)"""
+    maintenant = timezone.now()
+    candidates = list(
+        TacheAsynchrone.objects.filter(
+            statut=Statut.EN_ATTENTE,
+            executer_apres__lte=maintenant,
+        ).order_by('executer_apres', 'id').values_list('id', flat=True)[:limite]
+    )
+
+    reclamees = []
+    for tache_id in candidates:
+        # Un autre worker a pu la prendre entre-temps : seul l'UPDATE gagnant compte
+        if TacheAsynchrone.objects.filter(id=tache_id, statut=Statut.EN_ATTENTE).update(
+            statut=Statut.EN_COURS, date_debut=maintenant
+        ):
+            reclamees.append(tache_id)
+
+    return list(TacheAsynchrone.objects.filter(id__in=reclamees).order_by('executer_apres', 'id'))
+
+
+def delai_backoff(tentatives):
+    base = getattr(settings, 'TACHES_BACKOFF_BASE', 10)
+    maximum = getattr(settings, 'TACHES_BACKOFF_MAX', 3600)
+    return min(maximum, base * (2 ** max(0, tentatives - 1)))
+
+
+def executer_tache(tache):
+    """Exécute une tâche réclamée et enregistre son issue"""
+    tache.tentatives += 1
+    try:
+        resultat = import_string(tache.nom)(**tache.parametres)
+    except Exception as e:
+        tache.derniere_erreur = f"{e}\n{traceback.format_exc()}"
+        logger.error(f"Tâche {tache.id} ({tache.nom}) en échec, tentative {tache.tentatives}: {e}")
+
+        if tache.tentatives < tache.max_tentatives:
+            tache.statut = Statut.EN_ATTENTE
+            tache.executer_apres = timezone.now() + timedelta(seconds=delai_backoff(tache.tentatives))
+            try:
+                with transaction.atomic():
+                    tache.save(update_fields=['statut', 'tentatives', 'executer_apres', 'derniere_erreur'])
+                return False
+            except IntegrityError:
+                # Une nouvelle tâche de même clé attend déjà : elle fera le travail
+                tache.statut = Statut.FUSIONNEE
+        else:
+            tache.statut = Statut.ECHEC
+
+        tache.date_fin = timezone.now()
+        tache.save(update_fields=['statut', 'tentatives', 'derniere_erreur', 'date_fin'])
+        return False
+
+    tache.statut = Statut.TERMINEE
+    tache.resultat = resultat if isinstance(resultat, (dict, list, int, float, str, bool)) else None
+    tache.date_fin = timezone.now()
+    tache.save(update_fields=['statut', 'tentatives', 'resultat', 'date_fin'])
+    return True
+
+
+def liberer_taches_bloquees(delai=None):
+    """Remet en attente les tâches restées en cours (worker arrêté brutalement)"""
+    if delai is None:
+        delai = getattr(settings, 'TACHES_DELAI_BLOCAGE', 900)
+    limite = timezone.now() - timedelta(seconds=delai)
+    liberees = 0
+    for tache in TacheAsynchrone.objects.filter(statut=Statut.EN_COURS, date_debut__lt=limite):
+        tache.statut = Statut.EN_ATTENTE
+        tache.executer_apres = timezone.now()
+        try:
+            with transaction.atomic():
+                tache.save(update_fields=['statut', 'executer_apres'])
+            liberees += 1
+        except IntegrityError:
+            tache.statut = Statut.FUSIONNEE
+            tache.date_fin = timezone.now()
+            tache.save(update_fields=['statut', 'date_fin'])
+    return liberees
+
+
+def traiter_lot(limite=50):
+    """Réclame puis exécute un lot ; retourne (nb_traitees, nb_succes)"""
+    taches = reclamer_taches(limite)
+    succes = sum(1 for tache in taches if executer_tache(tache))
+    return len(taches), succes
+
+
+def statistiques_taches(minutes=5):
+    """Compteurs par statut et débit du worker sur les dernières minutes"""
+    par_statut = dict(
+        TacheAsynchrone.objects.values_list('statut').annotate(total=Count('id')).order_by()
+    )
+    depuis = timezone.now() - timedelta(minutes=minutes)
+    terminees = TacheAsynchrone.objects.filter(
+        statut=Statut.TERMINEE, date_fin__gte=depuis
+    ).count()
+    return {
+        'par_statut': par_statut,
+        'terminees_recentes': terminees,
+        'debit_par_seconde': round(terminees / (minutes * 60), 2),
+    }
+
+
+def boucle_worker(limite=50, pause=1.0, une_fois=False, rapport=None):
+    """
+    Boucle principale du worker ; `rapport(traitees, succes, debit)` est appelé
+    après chaque lot. Avec une_fois=True, s'arrête quand la file est vide.
+    """
+    debut = time.monotonic()
+    total = 0
+    liberer_taches_bloquees()
+
+    while True:
+        traitees, succes = traiter_lot(limite)
+        total += traitees
+        if traitees and rapport:
+            duree = time.monotonic() - debut
+            rapport(traitees, succes, total / duree if duree > 0 else 0)
+        if not traitees:
+            if une_fois:
+                return total
+            time.sleep(pause)
@@ -1,3 +1,193 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group, User
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from core.models import TacheAsynchrone
+from core.taches import enfiler, traiter_lot, statistiques_taches
+from core.utils import get_request_primary_group, get_user_primary_group, mutuelle_context, role_cache
+
+APPELS = []
+
+
+def tache_test(valeur):
+    APPELS.append(valeur)
+    return {'valeur': valeur}
+
+
+def tache_en_echec():
+    raise RuntimeError("échec volontaire")
+
+
+@override_settings(TACHES_FENETRE_COALESCENCE=0)
+class FileTachesTests(TestCase):
+
+    def setUp(self):
+        APPELS.clear()
+
+    def test_taches_de_meme_cle_fusionnees(self):
+        self.assertIsNotNone(enfiler('core.tests.tache_test', cle='membre:1', valeur=1))
+        self.assertIsNone(enfiler('core.tests.tache_test', cle='membre:1', valeur=1))
+        self.assertIsNotNone(enfiler('core.tests.tache_test', cle='membre:2', valeur=2))
+
+        self.assertEqual(traiter_lot(), (2, 2))
+        self.assertEqual(sorted(APPELS), [1, 2])
+        self.assertEqual(statistiques_taches()['par_statut'], {'terminee': 2})
+
+    def test_nouvelle_tache_possible_apres_execution(self):
+        enfiler('core.tests.tache_test', cle='membre:1', valeur=1)
+        traiter_lot()
+        self.assertIsNotNone(enfiler('core.tests.tache_test', cle='membre:1', valeur=1))
+
+    def test_echec_replanifie_avec_backoff(self):
+        tache = enfiler('core.tests.tache_en_echec', max_tentatives=2)
+
+        self.assertEqual(traiter_lot(), (1, 0))
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, TacheAsynchrone.Statut.EN_ATTENTE)
+        self.assertGreater(tache.executer_apres, timezone.now())
+
+        TacheAsynchrone.objects.filter(id=tache.id).update(executer_apres=timezone.now())
+        traiter_lot()
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, TacheAsynchrone.Statut.ECHEC)
+        self.assertEqual(tache.tentatives, 2)
+
+
+class RoleCacheTests(TestCase):
+
+    def setUp(self):
+        role_cache.clear()
+        self.user = User.objects.create_user(username='jdupont', password='testpass123')
+        self.groupe_medecin, _ = Group.objects.get_or_create(name='Medecin')
+
+    def test_role_resolu_une_seule_fois(self):
+        self.assertEqual(get_user_primary_group(self.user), 'MEMBRE')
+        autre_instance = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_primary_group(self.user), 'MEMBRE')
+            self.assertEqual(get_user_primary_group(autre_instance), 'MEMBRE')
+
+    def test_invalidation_sur_changement_de_groupe(self):
+        self.assertEqual(get_user_primary_group(self.user), 'MEMBRE')
+        self.user.groups.add(self.groupe_medecin)
+        self.assertEqual(get_user_primary_group(self.user), 'MEDECIN')
+        self.assertEqual(get_user_primary_group(User.objects.get(pk=self.user.pk)), 'MEDECIN')
+
+    def test_role_partage_sur_la_requete(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.assertEqual(get_request_primary_group(request), 'MEMBRE')
+        self.assertEqual(request.user_primary_group, 'MEMBRE')
+
+
+class MutuelleContextTests(TestCase):
+
+    def setUp(self):
+        role_cache.clear()
+        self.user = User.objects.create_user(username='pharma1', password='testpass123')
+        self.user.groups.add(Group.objects.get_or_create(name='Pharmacien')[0])
+        self.request = RequestFactory().get('/')
+        self.request.user = User.objects.get(pk=self.user.pk)
+
+    def test_aucune_requete_si_rien_n_est_consulte(self):
+        with self.assertNumQueries(0):
+            mutuelle_context(self.request)
+
+    def test_tout_le_contexte_en_une_resolution(self):
+        with self.assertNumQueries(2):  # utilisateur + profils, puis groupes (prefetch)
+            context = mutuelle_context(self.request)
+            self.assertTrue(context['is_pharmacien'])
+            self.assertFalse(context['is_medecin'])
+            self.assertEqual(context['current_user_type'], 'PHARMACIEN')
+            self.assertEqual(context['user_profile']['user_type'], 'PHARMACIEN')
+
+
+class PartageOrdonnanceTests(TestCase):
+
+    def setUp(self):
+        from assureur.models import Assureur
+        from membres.models import Membre
+
+        role_cache.clear()
+        self.groupe_pharmacien, _ = Group.objects.get_or_create(name='Pharmacien')
+        self.medecin = User.objects.create_user(username='docteur', password='testpass123', first_name='Jean', last_name='Dupont')
+        self.medecin.groups.add(Group.objects.get_or_create(name='Medecin')[0])
+        patient = User.objects.create_user(username='patient', password='testpass123', first_name='Marie', last_name='Martin')
+        self.membre = Membre.objects.create(user=patient)
+        self.assureur = Assureur.objects.create(
+            user=User.objects.create_user(username='assureur', password='testpass123')
+        )
+        self.pharmacies = [self._pharmacie(f'pharma{i}') for i in range(2)]
+        self._pharmacie('fermee', actif=False)
+
+    def _pharmacie(self, nom, actif=True):
+        from pharmacien.models import Pharmacien
+
+        utilisateur = User.objects.create_user(username=nom, password='testpass123')
+        utilisateur.groups.add(self.groupe_pharmacien)
+        return Pharmacien.objects.create(
+            user=utilisateur, nom_pharmacie=nom, adresse_pharmacie='Rue', telephone='0102030405', actif=actif
+        )
+
+    def _ordonnance(self):
+        from medecin.models import Ordonnance
+
+        return Ordonnance.objects.create(
+            medecin=self.medecin, patient=self.membre, assureur=self.assureur,
+            diagnostic='Grippe', medicaments='Paracétamol', posologie='3 fois par jour', duree_traitement=7,
+        )
+
+    def test_creation_independante_du_nombre_de_pharmacies(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.models import Notification, PartageAutomatique
+        from core.partage import notifier_role
+
+        with CaptureQueriesContext(connection) as avant:
+            premiere = self._ordonnance()
+        for i in range(5):
+            self._pharmacie(f'nouvelle{i}')
+        with CaptureQueriesContext(connection) as apres:
+            self._ordonnance()
+        self.assertEqual(len(avant), len(apres))
+
+        premiere.refresh_from_db()
+        self.assertTrue(premiere.partage_effectue)
+        partage = PartageAutomatique.objects.get(type_document='ORD', document_id=premiere.id)
+        self.assertEqual(partage.visible_par.count(), 2)
+        self.assertEqual(list(partage.regles.values_list('role', 'perimetre_id')), [('PHARMACIEN', 0)])
+        self.assertEqual(Notification.objects.filter(document_id=premiere.id).count(), 2)
+
+        # Notifications des pharmacies en tâche de fond : une par pharmacie active
+        tache = TacheAsynchrone.objects.filter(nom='core.partage.notifier_role').first()
+        self.assertEqual(tache.parametres['document_id'], premiere.id)
+        self.assertEqual(notifier_role(**tache.parametres), {'notifications': 7})
+        self.assertFalse(Notification.objects.filter(document_id=premiere.id, utilisateur__username='fermee').exists())
+
+    def test_visibilite_par_role_et_par_pharmacie(self):
+        from core.models import PartageAutomatique
+        from core.partage import documents_visibles, est_visible, partager
+
+        ordonnance = self._ordonnance()
+        pharmacien, autre = (pharmacie.user for pharmacie in self.pharmacies)
+        self.assertTrue(est_visible(pharmacien, 'ORD', ordonnance.id))
+        self.assertTrue(est_visible(self.membre.user, 'ORD', ordonnance.id))
+        self.assertFalse(est_visible(User.objects.create_user(username='curieux'), 'ORD', ordonnance.id))
+
+        partager(PartageAutomatique.BON, 42, roles=['PHARMACIEN'], perimetres={'PHARMACIEN': [self.pharmacies[0].id]})
+        self.assertEqual(list(documents_visibles(pharmacien, 'BON').values_list('document_id', flat=True)), [42])
+        self.assertFalse(est_visible(autre, 'BON', 42))
+
+    def test_visibilite_jamais_deduite_du_nom_utilisateur(self):
+        from core.partage import documents_visibles, est_visible
+        from core.utils import get_user_primary_group
+
+        ordonnance = self._ordonnance()
+        intrus = User.objects.create_user(username='faux_pharmacien', password='testpass123')
+        self.assertEqual(get_user_primary_group(intrus), 'PHARMACIEN')
+        self.assertFalse(est_visible(intrus, 'ORD', ordonnance.id))
+        self.assertFalse(documents_visibles(intrus, 'ORD').exists())
+
+        # Le profil Pharmacien actif suffit, sans le groupe
+        self.pharmacies[0].user.groups.clear()
+        self.assertTrue(est_visible(self.pharmacies[0].user, 'ORD', ordonnance.id))
@@ -13,103 +13,174 @@ from django.db import transaction
 import random
 import string
 import re
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
 
 # Configuration du logger
 logger = logging.getLogger('core')
 
-def get_user_primary_group(user):
+# ========================
+# RÉSOLUTION DU RÔLE - AVEC CACHE
+# ========================
+
+PROFILE_ATTRS = [
+    ('assureur', 'ASSUREUR'),
+    ('agent', 'AGENT'),
+    ('medecin', 'MEDECIN'),
+    ('pharmacien', 'PHARMACIEN'),
+    ('membre', 'MEMBRE'),
+]
+
+GROUP_MAPPING = {
+    'AGENTS': 'AGENT', 'AGENT': 'AGENT',
+    'ASSUREURS': 'ASSUREUR', 'ASSUREUR': 'ASSUREUR',
+    'MEDECINS': 'MEDECIN', 'MEDECIN': 'MEDECIN',
+    'PHARMACIENS': 'PHARMACIEN', 'PHARMACIEN': 'PHARMACIEN',
+    'MEMBRES': 'MEMBRE', 'MEMBRE': 'MEMBRE',
+    'ADMINISTRATEURS': 'ADMIN', 'ADMIN': 'ADMIN'
+}
+
+GROUP_PRIORITY = ['ASSUREUR', 'AGENT', 'MEDECIN', 'PHARMACIEN', 'MEMBRE', 'ADMIN']
+
+
+class _RoleCache:
+    """
+    LRU en mémoire (par processus) devant le cache Django.
+
+    Les signaux de core/signals.py vident l'entrée locale et l'entrée du cache
+    Django ; dans les autres processus, l'entrée locale expire après
+    ROLE_LOCAL_CACHE_TTL secondes.
+    """
+
+    def __init__(self, maxsize=2048):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+
+    @staticmethod
+    def cache_key(user_id):
+        return f"core:primary_group:{user_id}"
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        group = cache.get(self.cache_key(user_id))
+        if group is not None:
+            self._set_local(user_id, group)
+        return group
+
+    def set(self, user_id, group):
+        cache.set(self.cache_key(user_id), group, getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+        self._set_local(user_id, group)
+
+    def _set_local(self, user_id, group):
+        ttl = getattr(settings, 'ROLE_LOCAL_CACHE_TTL', 60)
+        with self._lock:
+            self._entries[user_id] = (group, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        cache.delete(self.cache_key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+role_cache = _RoleCache()
+
+
+def invalidate_user_primary_group(user_id):
+    """Invalide le rôle mis en cache pour cet utilisateur"""
+    role_cache.invalidate(user_id)
+
+
+def _resolve_primary_group(user):
     """
-    Retourne le groupe principal de l'utilisateur - VERSION DÉFINITIVEMENT CORRIGÉE
+    Résolution complète (sans cache)
     PRIORITÉ: Groupes Django > Profils > Username > Défaut
     """
+    if user.is_superuser:
+        return 'ADMIN'
+
+    # 🔥 CORRECTION CRITIQUE: VÉRIFIER D'ABORD LES GROUPES DJANGO (une seule requête)
+    if 'groups' in getattr(user, '_prefetched_objects_cache', {}):
+        group_names = [g.name.upper() for g in user.groups.all()]
+    else:
+        group_names = [name.upper() for name in user.groups.values_list('name', flat=True)]
+    for priority_group in GROUP_PRIORITY:
+        for group_name in group_names:
+            if GROUP_MAPPING.get(group_name) == priority_group:
+                return priority_group
+
+    # Vérification des profils (après les groupes)
+    for profile_attr, group in PROFILE_ATTRS:
+        try:
+            if hasattr(user, profile_attr) and getattr(user, profile_attr) is not None:
+                return group
+        except Exception:
+            continue
+
+    # Fallback: Vérification par nom d'utilisateur
+    username = user.username.lower()
+    for profile_attr, group in PROFILE_ATTRS:
+        if profile_attr in username:
+            return group
+
+    return 'MEMBRE'
+
+
+def get_user_primary_group(user):
+    """
+    Retourne le groupe principal de l'utilisateur - VERSION AVEC CACHE
+    Ordre: attribut sur l'utilisateur (requête en cours) > LRU local > cache Django > résolution
+    """
     try:
         # Vérifications de base
         if not user or not hasattr(user, 'id') or user.id is None or not user.is_authenticated:
             return 'MEMBRE'
-            
-        if user.is_superuser:
-            return 'ADMIN'
-        
-        # ============================================
-        # 🔥 CORRECTION CRITIQUE: VÉRIFIER D'ABORD LES GROUPES DJANGO
-        # ============================================
-        if hasattr(user, 'groups') and user.groups.exists():
-            group_names = [g.name.upper() for g in user.groups.all()]
-            
-            # Mapping des groupes
-            group_mapping = {
-                'AGENTS': 'AGENT', 'AGENT': 'AGENT',
-                'ASSUREURS': 'ASSUREUR', 'ASSUREUR': 'ASSUREUR',
-                'MEDECINS': 'MEDECIN', 'MEDECIN': 'MEDECIN',
-                'PHARMACIENS': 'PHARMACIEN', 'PHARMACIEN': 'PHARMACIEN',
-                'MEMBRES': 'MEMBRE', 'MEMBRE': 'MEMBRE',
-                'ADMINISTRATEURS': 'ADMIN', 'ADMIN': 'ADMIN'
-            }
-            
-            # Chercher dans l'ordre de priorité (Assureur en premier)
-            for priority_group in ['ASSUREUR', 'AGENT', 'MEDECIN', 'PHARMACIEN', 'MEMBRE', 'ADMIN']:
-                for group_name in group_names:
-                    mapped = group_mapping.get(group_name)
-                    if mapped == priority_group:
-                        print(f"🔍 get_user_primary_group - {user.username}: trouvé groupe {mapped}")
-                        return mapped
-        
-        # ============================================
-        # Vérification des profils (après les groupes)
-        # ============================================
-        def has_valid_profile(profile_attr):
-            try:
-                return hasattr(user, profile_attr) and getattr(user, profile_attr) is not None
-            except:
-                return False
-        
-        # Vérifier chaque type de profil avec gestion d'erreur
-        if has_valid_profile('assureur'):
-            print(f"🔍 get_user_primary_group - {user.username}: trouvé profil assureur")
-            return 'ASSUREUR'
-        elif has_valid_profile('agent'):
-            print(f"🔍 get_user_primary_group - {user.username}: trouvé profil agent")
-            return 'AGENT'
-        elif has_valid_profile('medecin'):
-            print(f"🔍 get_user_primary_group - {user.username}: trouvé profil medecin")
-            return 'MEDECIN'
-        elif has_valid_profile('pharmacien'):
-            print(f"🔍 get_user_primary_group - {user.username}: trouvé profil pharmacien")
-            return 'PHARMACIEN'
-        elif has_valid_profile('membre'):
-            print(f"🔍 get_user_primary_group - {user.username}: trouvé profil membre")
-            return 'MEMBRE'
-        
-        # ============================================
-        # Fallback: Vérification par nom d'utilisateur
-        # ============================================
-        username = user.username.lower()
-        if 'assureur' in username:
-            print(f"🔍 get_user_primary_group - {user.username}: détecté par username (assureur)")
-            return 'ASSUREUR'
-        elif 'agent' in username:
-            print(f"🔍 get_user_primary_group - {user.username}: détecté par username (agent)")
-            return 'AGENT'
-        elif 'medecin' in username:
-            print(f"🔍 get_user_primary_group - {user.username}: détecté par username (medecin)")
-            return 'MEDECIN'
-        elif 'pharmacien' in username:
-            print(f"🔍 get_user_primary_group - {user.username}: détecté par username (pharmacien)")
-            return 'PHARMACIEN'
-        elif 'membre' in username:
-            print(f"🔍 get_user_primary_group - {user.username}: détecté par username (membre)")
-            return 'MEMBRE'
-        
-        # Défaut
-        print(f"🔍 get_user_primary_group - {user.username}: défaut (MEMBRE)")
-        return 'MEMBRE'
-        
+
+        # request.user est le même objet pendant toute la requête
+        group = getattr(user, '_primary_group_cache', None)
+        if group is not None:
+            return group
+
+        group = role_cache.get(user.id)
+        if group is None:
+            group = _resolve_primary_group(user)
+            role_cache.set(user.id, group)
+            logger.debug(f"get_user_primary_group - {user.username}: {group}")
+
+        try:
+            user._primary_group_cache = group
+        except AttributeError:
+            pass
+        return group
+
     except Exception as e:
-        print(f"⚠️  Erreur get_user_primary_group pour {user.username if user else 'None'}: {e}")
+        logger.warning(f"Erreur get_user_primary_group pour {user.username if user else 'None'}: {e}")
         return 'MEMBRE'
 
+
+def get_request_primary_group(request):
+    """Rôle de l'utilisateur courant, résolu une seule fois par requête"""
+    group = getattr(request, 'user_primary_group', None)
+    if group is None:
+        group = get_user_primary_group(getattr(request, 'user', None))
+        request.user_primary_group = group
+    return group
+
 def get_user_redirect_url(user):
     """
     Retourne l'URL de redirection selon le groupe - VERSION COMPLÈTEMENT CORRIGÉE
@@ -194,7 +265,7 @@ def group_required(group_name):
             if not request.user.is_authenticated:
                 return redirect('login')
                 
-            user_group = get_user_primary_group(request.user)
+            user_group = get_request_primary_group(request)
             
             if user_group != group_name and not request.user.is_superuser:
                 from django.contrib import messages
@@ -213,7 +284,7 @@ def role_required(allowed_roles=[]):
         @login_required
         def _wrapped_view(request, *args, **kwargs):
             user = request.user
-            user_role = get_user_primary_group(user)
+            user_role = get_request_primary_group(request)
             
             if user_role in allowed_roles or user.is_superuser:
                 return view_func(request, *args, **kwargs)
@@ -461,21 +532,106 @@ def get_user_profile_data(user):
 # CONTEXT PROCESSOR - VERSION CORRIGÉE
 # ========================
 
+class RoleContext:
+    """
+    Résolution groupée du rôle et des profils pour le context processor.
+
+    Les groupes et tous les profils sont chargés en une seule requête
+    select_related + prefetch('groups'), uniquement si un template consulte
+    une valeur qui n'est pas déjà dans le cache des rôles. `consultations`
+    compte les lectures servies ; chacune coûtait au moins une requête avant.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._user = None
+        self._primary_group = None
+        self._profile_data = None
+        self.requetes = 0
+        self.consultations = 0
+
+    @staticmethod
+    def profile_relations():
+        from django.contrib.auth.models import User
+        accessors = {attr for attr, _group in PROFILE_ATTRS}
+        return [
+            rel.get_accessor_name() for rel in User._meta.related_objects
+            if rel.one_to_one and rel.get_accessor_name() in accessors
+        ]
+
+    def _charger_utilisateur(self):
+        if self._user is None:
+            from django.contrib.auth.models import User
+            from django.db import connection
+
+            compteur = []
+
+            def compter(execute, sql, params, many, context):
+                compteur.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(compter):
+                self._user = (
+                    User.objects.select_related(*self.profile_relations())
+                    .prefetch_related('groups')
+                    .get(pk=self.request.user.pk)
+                )
+            self.requetes += len(compteur)
+        return self._user
+
+    def primary_group(self):
+        self.consultations += 1
+        if self._primary_group is None:
+            group = getattr(self.request, 'user_primary_group', None) or role_cache.get(self.request.user.pk)
+            if group is None:
+                group = _resolve_primary_group(self._charger_utilisateur())
+                role_cache.set(self.request.user.pk, group)
+            self.request.user_primary_group = group
+            self._primary_group = group
+        return self._primary_group
+
+    def is_role(self, role):
+        group = self.primary_group()
+        if role == 'ADMIN':
+            return self.request.user.is_superuser or group == 'ADMIN'
+        return group == role
+
+    def profile_data(self):
+        self.consultations += 1
+        if self._profile_data is None:
+            user = self._charger_utilisateur()
+            user._primary_group_cache = self.primary_group()
+            self._profile_data = get_user_profile_data(user)
+        return self._profile_data
+
+    def debug_stats(self):
+        return {
+            'requetes': self.requetes,
+            'consultations': self.consultations,
+            'requetes_evitees': max(0, self.consultations - self.requetes),
+        }
+
+
 def mutuelle_context(request):
-    """Context processor pour les templates"""
+    """Context processor pour les templates (valeurs paresseuses, une requête au plus)"""
+    from django.utils.functional import SimpleLazyObject
+
     context = {}
     
     if request.user.is_authenticated:
+        roles = RoleContext(request)
         context.update({
-            'current_user_type': get_user_primary_group(request.user),
-            'user_profile': get_user_profile_data(request.user),
-            'is_agent': user_is_agent(request.user),
-            'is_membre': user_is_membre(request.user),
-            'is_assureur': user_is_assureur(request.user),
-            'is_medecin': user_is_medecin(request.user),
-            'is_pharmacien': user_is_pharmacien(request.user),
-            'is_admin': user_is_admin(request.user),
+            'current_user_type': SimpleLazyObject(roles.primary_group),
+            'user_profile': SimpleLazyObject(roles.profile_data),
+            'is_agent': SimpleLazyObject(lambda: roles.is_role('AGENT')),
+            'is_membre': SimpleLazyObject(lambda: roles.is_role('MEMBRE')),
+            'is_assureur': SimpleLazyObject(lambda: roles.is_role('ASSUREUR')),
+            'is_medecin': SimpleLazyObject(lambda: roles.is_role('MEDECIN')),
+            'is_pharmacien': SimpleLazyObject(lambda: roles.is_role('PHARMACIEN')),
+            'is_admin': SimpleLazyObject(lambda: roles.is_role('ADMIN')),
         })
+        if settings.DEBUG:
+            context['role_context_stats'] = roles.debug_stats
     
     return context
 
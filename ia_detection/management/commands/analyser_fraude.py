@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from ia_detection.services import AnalyseurFraudeLot
+import time
+
+
+class Command(BaseCommand):
+    help = 'Analyse de fraude par lots sur les vérifications de cotisation (reprend au dernier id traité)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Nombre de vérifications par lot (défaut: 2000)'
+        )
+        parser.add_argument(
+            '--depuis-id',
+            type=int,
+            help='Reprendre après cet id de vérification (défaut: dernier id déjà analysé)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            help='Nombre maximum de vérifications à analyser pendant cette exécution'
+        )
+
+    def handle(self, *args, **options):
+        analyseur = AnalyseurFraudeLot(batch_size=max(1, options['batch_size']))
+        depuis_id = options['depuis_id']
+        if depuis_id is None:
+            depuis_id = analyseur.dernier_id_traite()
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(f"🚀 Analyse de fraude par lots à partir de l'id {depuis_id}...")
+        )
+
+        debut = time.monotonic()
+
+        def progression(total, dernier_id):
+            duree = time.monotonic() - debut
+            debit = total / duree if duree > 0 else 0
+            self.stdout.write(f"• {total} vérification(s) analysée(s) - dernier id {dernier_id} ({debit:.0f}/s)")
+
+        total = analyseur.analyser(depuis_id=depuis_id, limite=options['limite'], callback=progression)
+
+        if total == 0 and not analyseur.est_pret:
+            self.stdout.write(self.style.WARNING("⚠️  Aucun modèle IA ajusté disponible"))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {total} vérification(s) analysée(s) en {time.monotonic() - debut:.2f}s")
+        )
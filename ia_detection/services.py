@@ -1,71 +1,242 @@
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
+from sklearn.exceptions import NotFittedError
+from sklearn.utils.validation import check_is_fitted
 import joblib
+import logging
 import os
+import threading
+import time
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+from decimal import Decimal
 from membres.models import Membre
 from agents.models import VerificationCotisation
 from ia_detection.models import ModeleIA, AnalyseIA
 from django.utils import timezone
 
-class ServiceDetectionFraude:
-    def __init__(self):
-        self.modele = None
-        self.scaler = StandardScaler()
-        self.charger_modele_actif()
-    
-    def charger_modele_actif(self):
-        """Charge le modèle IA actif depuis la base"""
+logger = logging.getLogger(__name__)
+
+COLONNES_FEATURES = [
+    'montant_dernier_paiement',
+    'jours_retard',
+    'montant_dette',
+    'retard_moyen_historique',
+    'dette_moyenne_historique',
+    'nb_verifications',
+]
+
+
+def chemin_scaler(chemin_modele):
+    """Le scaler ajusté est persisté à côté du fichier du modèle"""
+    racine, _ext = os.path.splitext(chemin_modele)
+    return f"{racine}_scaler.joblib"
+
+
+def sauvegarder_modele(modele_ia, modele, scaler):
+    """Persiste le modèle et son scaler ajusté pour un ModeleIA existant"""
+    chemin = modele_ia.fichier_modele.path
+    joblib.dump(modele, chemin)
+    joblib.dump(scaler, chemin_scaler(chemin))
+    registre_modeles.invalider(modele_ia.type_modele)
+
+
+class ModeleCharge:
+    """Modèle + scaler ajustés, avec la clé (ligne active, fichier, mtime) qui les a produits"""
+
+    def __init__(self, cle, modele, scaler, nom):
+        self.cle = cle
+        self.modele = modele
+        self.scaler = scaler
+        self.nom = nom
+        self.verifie_le = time.monotonic()
+
+    @property
+    def est_pret(self):
         try:
+            check_is_fitted(self.modele)
+            check_is_fitted(self.scaler)
+            return True
+        except NotFittedError:
+            return False
+
+
+class RegistreModeles:
+    """
+    Registre des modèles IA partagé par tout le processus.
+
+    Le ModeleIA actif est chargé une seule fois ; la ligne active et le mtime
+    du fichier ne sont revérifiés qu'après IA_MODELE_TTL secondes (ou
+    immédiatement après invalider(), appelé par les signaux de ModeleIA).
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._modeles = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'IA_MODELE_TTL', 300)
+
+    def invalider(self, type_modele=None):
+        with self._verrou:
+            if type_modele is None:
+                self._modeles.clear()
+            else:
+                self._modeles.pop(type_modele, None)
+
+    def obtenir(self, type_modele='detection_fraude'):
+        charge = self._modeles.get(type_modele)
+        if charge and time.monotonic() - charge.verifie_le < self.ttl:
+            return charge
+
+        with self._verrou:
+            charge = self._modeles.get(type_modele)
+            if charge and time.monotonic() - charge.verifie_le < self.ttl:
+                return charge
+
             modele_actif = ModeleIA.objects.filter(
-                type_modele='detection_fraude',
+                type_modele=type_modele,
                 est_actif=True
             ).first()
-            
-            if modele_actif and modele_actif.fichier_modele:
-                self.modele = joblib.load(modele_actif.fichier_modele.path)
-                print(f"✅ Modèle IA chargé: {modele_actif.nom}")
-            else:
-                self.initialiser_modele_par_defaut()
-                
-        except Exception as e:
-            print(f"❌ Erreur chargement modèle IA: {e}")
-            self.initialiser_modele_par_defaut()
-    
-    def initialiser_modele_par_defaut(self):
-        """Initialise un modèle par défaut si aucun n'existe"""
-        print("🔄 Initialisation modèle IA par défaut...")
-        self.modele = IsolationForest(contamination=0.1, random_state=42)
-    
+            cle = self._calculer_cle(modele_actif)
+
+            if charge and charge.cle == cle and charge.est_pret:
+                # Rien n'a changé : on repousse simplement la prochaine vérification.
+                # Un modèle par défaut non ajusté (historique vide) est réajusté à chaque échéance
+                charge.verifie_le = time.monotonic()
+                return charge
+
+            charge = self._charger(modele_actif, cle)
+            self._modeles[type_modele] = charge
+            return charge
+
+    def _calculer_cle(self, modele_actif):
+        if not modele_actif or not modele_actif.fichier_modele:
+            return None
+        try:
+            chemin = modele_actif.fichier_modele.path
+            return (modele_actif.pk, chemin, os.path.getmtime(chemin))
+        except (OSError, ValueError):
+            return (modele_actif.pk, None, None)
+
+    def _charger(self, modele_actif, cle):
+        if cle and cle[1] and cle[2] is not None:
+            try:
+                modele = joblib.load(cle[1])
+                fichier_scaler = chemin_scaler(cle[1])
+                if os.path.exists(fichier_scaler):
+                    scaler = joblib.load(fichier_scaler)
+                else:
+                    scaler = self._ajuster_scaler()
+                    joblib.dump(scaler, fichier_scaler)
+                logger.info(f"Modèle IA chargé: {modele_actif.nom}")
+                return ModeleCharge(cle, modele, scaler, modele_actif.nom)
+            except Exception as e:
+                logger.error(f"Erreur chargement modèle IA: {e}")
+
+        return self._modele_par_defaut(cle)
+
+    def _ajuster_scaler(self):
+        scaler = StandardScaler()
+        donnees = preparer_donnees_historique()
+        if not donnees.empty:
+            scaler.fit(donnees)
+        return scaler
+
+    def _modele_par_defaut(self, cle):
+        """Modèle par défaut ajusté une fois sur l'historique disponible"""
+        logger.info("Initialisation modèle IA par défaut")
+        modele = IsolationForest(contamination=0.1, random_state=42)
+        scaler = StandardScaler()
+        donnees = preparer_donnees_historique()
+        if not donnees.empty:
+            donnees_scaled = scaler.fit_transform(donnees)
+            modele.fit(donnees_scaled)
+        return ModeleCharge(cle, modele, scaler, 'défaut')
+
+
+def preparer_donnees_historique(limite=None):
+    """Matrice de features des vérifications existantes (historique agrégé par membre)"""
+    verifications = VerificationCotisation.objects.order_by('-id')
+    if limite is None:
+        limite = getattr(settings, 'IA_TAILLE_ENTRAINEMENT', 10000)
+    lignes = list(verifications.values(
+        'membre_id', 'montant_dernier_paiement', 'jours_retard', 'montant_dette'
+    )[:limite])
+    if not lignes:
+        return pd.DataFrame(columns=COLONNES_FEATURES)
+
+    historiques = {
+        h['membre_id']: h for h in VerificationCotisation.objects.filter(
+            membre_id__in={ligne['membre_id'] for ligne in lignes}
+        ).values('membre_id').annotate(
+            retard_moyen=Avg('jours_retard'),
+            dette_moyenne=Avg('montant_dette'),
+            nb=Count('id'),
+        ).order_by()
+    }
+    donnees = []
+    for ligne in lignes:
+        historique = historiques.get(ligne['membre_id'], {})
+        donnees.append({
+            'montant_dernier_paiement': float(ligne['montant_dernier_paiement'] or 0),
+            'jours_retard': ligne['jours_retard'] or 0,
+            'montant_dette': float(ligne['montant_dette'] or 0),
+            'retard_moyen_historique': float(historique.get('retard_moyen') or 0),
+            'dette_moyenne_historique': float(historique.get('dette_moyenne') or 0),
+            'nb_verifications': historique.get('nb', 0),
+        })
+    return pd.DataFrame(donnees, columns=COLONNES_FEATURES)
+
+
+registre_modeles = RegistreModeles()
+
+
+class ServiceDetectionFraude:
+    def __init__(self):
+        self.charger_modele_actif()
+
+    def charger_modele_actif(self):
+        """Récupère le modèle IA actif depuis le registre du processus"""
+        charge = registre_modeles.obtenir('detection_fraude')
+        self.modele = charge.modele
+        self.scaler = charge.scaler
+        self.est_pret = charge.est_pret
+
     def preparer_donnees_verification(self, verification):
         """Prépare les données pour l'analyse IA"""
         # Récupérer l'historique du membre
-        historique = VerificationCotisation.objects.filter(membre=verification.membre)
-        
-        if historique.exists():
-            retard_moyen = historique.aggregate(avg=Avg('jours_retard'))['avg'] or 0
-            dette_moyenne = historique.aggregate(avg=Avg('montant_dette'))['avg'] or 0
-        else:
-            retard_moyen = 0
-            dette_moyenne = 0
-        
+        historique = VerificationCotisation.objects.filter(
+            membre=verification.membre
+        ).aggregate(
+            retard_moyen=Avg('jours_retard'),
+            dette_moyenne=Avg('montant_dette'),
+            nb=Count('id'),
+        )
+
         donnees = {
             'montant_dernier_paiement': float(verification.montant_dernier_paiement or 0),
             'jours_retard': verification.jours_retard or 0,
             'montant_dette': float(verification.montant_dette or 0),
-            'retard_moyen_historique': retard_moyen,
-            'dette_moyenne_historique': dette_moyenne,
-            'nb_verifications': historique.count(),
+            'retard_moyen_historique': float(historique['retard_moyen'] or 0),
+            'dette_moyenne_historique': float(historique['dette_moyenne'] or 0),
+            'nb_verifications': historique['nb'],
         }
-        return pd.DataFrame([donnees])
+        return pd.DataFrame([donnees], columns=COLONNES_FEATURES)
     
     def analyser_verification(self, verification):
         """Analyse une vérification avec l'IA"""
+        if not self.est_pret:
+            logger.warning("Analyse IA ignorée: aucun modèle ajusté disponible")
+            return None
+
         try:
-            # Préparer les données
+            # Préparer les données (le scaler est déjà ajusté : transform seulement)
             donnees = self.preparer_donnees_verification(verification)
-            donnees_scaled = self.scaler.fit_transform(donnees)
+            donnees_scaled = self.scaler.transform(donnees)
             
             # Prédiction
             prediction = self.modele.predict(donnees_scaled)
@@ -81,7 +252,7 @@ class ServiceDetectionFraude:
                 type_analyse='detection_fraude',
                 score_confiance=abs(score_anomalie) * 100,
                 resultat={
-                    'est_anomalie': prediction[0] == -1,
+                    'est_anomalie': bool(prediction[0] == -1),
                     'score_anomalie': float(score_anomalie),
                     'motifs_suspicion': motifs,
                     'donnees_analyse': donnees.to_dict('records')[0]
@@ -92,12 +263,12 @@ class ServiceDetectionFraude:
             verification.score_anomalie_ia = abs(score_anomalie) * 100
             verification.motifs_suspicion = motifs
             verification.priorite_ia = self.determiner_priorite(score_anomalie, motifs)
-            verification.save()
+            verification.save(update_fields=['score_anomalie_ia', 'motifs_suspicion', 'priorite_ia'])
             
             return analyse
             
         except Exception as e:
-            print(f"❌ Erreur analyse IA: {e}")
+            logger.error(f"Erreur analyse IA: {e}")
             return None
     
     def analyser_motifs_suspicion(self, verification, score_anomalie):
@@ -132,19 +303,150 @@ class ServiceDetectionFraude:
 
 def analyser_verification_ia(verification):
     """Fonction utilitaire pour analyser une vérification avec IA"""
-    service = ServiceDetectionFraude()
+    service = ServiceDetectionFraude()  # modèle servi par le registre, sans rechargement
     return service.analyser_verification(verification)
 
+class AnalyseurFraudeLot(ServiceDetectionFraude):
+    """
+    Analyse de fraude par lots de vérifications.
+
+    Pour chaque lot : une requête sur les vérifications, un agrégat groupé pour
+    l'historique des membres, un seul decision_function sur la matrice, puis
+    bulk_create des AnalyseIA et bulk_update des vérifications. Les lots sont
+    parcourus par id croissant, ce qui permet de reprendre après interruption.
+    """
+
+    TYPE_ANALYSE = 'detection_fraude_lot'
+    # Analyses ciblées (un membre) : hors watermark, qui ne suit que le parcours par lot
+    TYPE_ANALYSE_MEMBRE = 'detection_fraude_membre'
+    CHAMPS_VERIFICATION = ['score_anomalie_ia', 'motifs_suspicion', 'priorite_ia']
+
+    def __init__(self, batch_size=2000):
+        super().__init__()
+        self.batch_size = batch_size
+
+    def dernier_id_traite(self):
+        """Watermark : plus grand id de vérification déjà analysé par lot"""
+        return AnalyseIA.objects.filter(
+            type_analyse=self.TYPE_ANALYSE
+        ).aggregate(dernier=Max('verification_id'))['dernier'] or 0
+
+    def construire_matrice(self, verifications):
+        """Matrice de features du lot, historique membre obtenu en une requête groupée"""
+        historiques = {
+            h['membre_id']: h for h in VerificationCotisation.objects.filter(
+                membre_id__in={v.membre_id for v in verifications}
+            ).values('membre_id').annotate(
+                retard_moyen=Avg('jours_retard'),
+                dette_moyenne=Avg('montant_dette'),
+                nb=Count('id'),
+            ).order_by()
+        }
+        lignes = []
+        for verification in verifications:
+            historique = historiques.get(verification.membre_id, {})
+            lignes.append({
+                'montant_dernier_paiement': float(verification.montant_dernier_paiement or 0),
+                'jours_retard': verification.jours_retard or 0,
+                'montant_dette': float(verification.montant_dette or 0),
+                'retard_moyen_historique': float(historique.get('retard_moyen') or 0),
+                'dette_moyenne_historique': float(historique.get('dette_moyenne') or 0),
+                'nb_verifications': historique.get('nb', 0),
+            })
+        return pd.DataFrame(lignes, columns=COLONNES_FEATURES)
+
+    def analyser_lot(self, verifications, type_analyse=None):
+        """Analyse et enregistre un lot de vérifications ; retourne les AnalyseIA créées"""
+        type_analyse = type_analyse or self.TYPE_ANALYSE
+        donnees = self.construire_matrice(verifications)
+        donnees_scaled = self.scaler.transform(donnees)
+        predictions = self.modele.predict(donnees_scaled)
+        scores = self.modele.decision_function(donnees_scaled)
+        enregistrements = donnees.to_dict('records')
+
+        analyses = []
+        membres_suspects = set()
+        for index, verification in enumerate(verifications):
+            score_anomalie = float(scores[index])
+            est_anomalie = bool(predictions[index] == -1)
+            motifs = self.analyser_motifs_suspicion(verification, score_anomalie)
+
+            verification.score_anomalie_ia = Decimal(str(round(abs(score_anomalie) * 100, 2)))
+            verification.motifs_suspicion = motifs
+            verification.priorite_ia = self.determiner_priorite(score_anomalie, motifs)
+            if est_anomalie:
+                membres_suspects.add(verification.membre_id)
+
+            analyses.append(AnalyseIA(
+                membre_id=verification.membre_id,
+                verification=verification,
+                type_analyse=type_analyse,
+                score_confiance=verification.score_anomalie_ia,
+                resultat={
+                    'est_anomalie': est_anomalie,
+                    'score_anomalie': score_anomalie,
+                    'motifs_suspicion': motifs,
+                    'donnees_analyse': enregistrements[index],
+                }
+            ))
+
+        with transaction.atomic():
+            AnalyseIA.objects.bulk_create(analyses, batch_size=self.batch_size)
+            VerificationCotisation.objects.bulk_update(
+                verifications, self.CHAMPS_VERIFICATION, batch_size=self.batch_size
+            )
+            Membre.objects.filter(
+                id__in={v.membre_id for v in verifications}
+            ).update(date_derniere_analyse_ia=timezone.now())
+            if membres_suspects:
+                Membre.objects.filter(id__in=membres_suspects).update(fraude_suspectee=True)
+
+        return analyses
+
+    def analyser(self, queryset=None, depuis_id=None, limite=None, callback=None, type_analyse=None):
+        """
+        Parcourt le queryset par lots d'id croissants à partir de depuis_id
+        (par défaut le watermark des analyses déjà faites). Les parcours
+        partiels (un membre) passent type_analyse=TYPE_ANALYSE_MEMBRE pour ne
+        pas déplacer le watermark. Retourne le nombre de vérifications analysées.
+        """
+        if not self.est_pret:
+            logger.warning("Analyse IA par lot ignorée: aucun modèle ajusté disponible")
+            return 0
+
+        if queryset is None:
+            queryset = VerificationCotisation.objects.all()
+        if depuis_id is None:
+            depuis_id = self.dernier_id_traite()
+
+        queryset = queryset.only(
+            'id', 'membre_id', 'montant_dernier_paiement', 'jours_retard', 'montant_dette'
+        ).order_by('id')
+
+        total = 0
+        dernier_id = depuis_id
+        while limite is None or total < limite:
+            taille = self.batch_size if limite is None else min(self.batch_size, limite - total)
+            verifications = list(queryset.filter(id__gt=dernier_id)[:taille])
+            if not verifications:
+                break
+            self.analyser_lot(verifications, type_analyse)
+            total += len(verifications)
+            dernier_id = verifications[-1].id
+            if callback:
+                callback(total, dernier_id)
+
+        return total
+
+
 def analyser_fraude_membre(membre):
     """Analyse toutes les vérifications d'un membre pour fraude"""
-    verifications = membre.verificationcotisation_set.all()
+    analyseur = AnalyseurFraudeLot()
+    verifications = list(membre.verificationcotisation_set.order_by('id'))
     analyses = []
-    
-    for verification in verifications:
-        analyse = analyser_verification_ia(verification)
-        if analyse:
-            analyses.append(analyse)
-    
+    if verifications and analyseur.est_pret:
+        analyses = analyseur.analyser_lot(verifications, AnalyseurFraudeLot.TYPE_ANALYSE_MEMBRE)
+
     # Mettre à jour le statut fraude du membre
     fraude_suspectee = any(
         analyse.resultat.get('est_anomalie', False) 
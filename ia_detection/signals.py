@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from agents.models import VerificationCotisation
+from core.taches import enfiler
+from ia_detection.models import ModeleIA
+
+
+@receiver([post_save, post_delete], sender=ModeleIA)
+def invalider_registre_modeles(sender, instance, **kwargs):
+    """Force le rechargement du modèle actif au prochain appel dans ce processus"""
+    try:
+        from ia_detection.services import registre_modeles
+    except ImportError:
+        # Dépendances IA (pandas / scikit-learn) non installées
+        return
+    registre_modeles.invalider(instance.type_modele)
+
+
+@receiver(post_save, sender=VerificationCotisation)
+def analyser_verification_apres_creation(sender, instance, created, **kwargs):
+    """Programme l'analyse IA des nouvelles vérifications, coalescée par membre"""
+    if created:
+        enfiler(
+            'ia_detection.taches.analyser_verifications_membre',
+            cle=f'ia:membre:{instance.membre_id}',
+            membre_id=instance.membre_id,
+        )
@@ -0,0 +1,15 @@
+from agents.models import VerificationCotisation
+
+
+def analyser_verifications_membre(membre_id):
+    """Tâche asynchrone : analyse IA des vérifications du membre pas encore analysées"""
+    from ia_detection.services import AnalyseurFraudeLot
+
+    return AnalyseurFraudeLot().analyser(
+        queryset=VerificationCotisation.objects.filter(
+            membre_id=membre_id,
+            score_anomalie_ia__isnull=True,
+        ),
+        depuis_id=0,
+        type_analyse=AnalyseurFraudeLot.TYPE_ANALYSE_MEMBRE,
+    )
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from agents.models import Agent, VerificationCotisation
+from membres.models import Membre
+from ia_detection.models import ModeleIA, AnalyseIA
+from ia_detection.services import AnalyseurFraudeLot, ServiceDetectionFraude, analyser_fraude_membre, registre_modeles
+from ia_detection.taches import analyser_verifications_membre
+
+
+class DonneesVerificationMixin:
+
+    def setUp(self):
+        registre_modeles.invalider()
+        agent_user = User.objects.create_user(username='agent_ia', password='testpass123')
+        self.agent = Agent.objects.create(user=agent_user, matricule='AGT-IA-1', poste='Contrôle')
+        self.membre = Membre.objects.create(nom='Kone', prenom='Awa', numero_unique='IA001')
+        today = timezone.now().date()
+        for jours in (5, 15, 40):
+            self.verification = VerificationCotisation.objects.create(
+                agent=self.agent, membre=self.membre, statut_cotisation='en_retard',
+                prochaine_echeance=today - timedelta(days=jours),
+                montant_dernier_paiement=Decimal('5000'), montant_dette=Decimal(jours * 100),
+            )
+
+    def tearDown(self):
+        registre_modeles.invalider()
+
+
+class RegistreModelesTests(DonneesVerificationMixin, TestCase):
+
+    def test_modele_charge_une_seule_fois(self):
+        premier = registre_modeles.obtenir()
+        with self.assertNumQueries(0):
+            second = registre_modeles.obtenir()
+            ServiceDetectionFraude()
+        self.assertIs(premier, second)
+        self.assertTrue(premier.est_pret)
+
+    def test_invalidation_sur_changement_modele_actif(self):
+        premier = registre_modeles.obtenir()
+        ModeleIA.objects.create(nom='Fraude', version='2', type_modele='detection_fraude', est_actif=True)
+        self.assertIsNot(registre_modeles.obtenir(), premier)
+
+    def test_modele_par_defaut_reajuste_quand_l_historique_apparait(self):
+        verification = VerificationCotisation.objects.values(
+            'agent_id', 'membre_id', 'statut_cotisation', 'prochaine_echeance', 'montant_dernier_paiement', 'montant_dette'
+        ).first()
+        VerificationCotisation.objects.all().delete()
+        self.assertFalse(registre_modeles.obtenir().est_pret)
+
+        VerificationCotisation.objects.create(**verification)
+        with override_settings(IA_MODELE_TTL=0):
+            self.assertTrue(registre_modeles.obtenir().est_pret)
+
+    def test_analyse_utilise_le_scaler_ajuste(self):
+        analyse = ServiceDetectionFraude().analyser_verification(self.verification)
+        self.assertIsNotNone(analyse)
+        self.assertEqual(AnalyseIA.objects.filter(verification=self.verification).count(), 1)
+
+
+class AnalyseurFraudeLotTests(DonneesVerificationMixin, TestCase):
+
+    def test_lot_reprend_au_watermark(self):
+        analyseur = AnalyseurFraudeLot(batch_size=2)
+        self.assertEqual(analyseur.analyser(limite=2), 2)
+        self.assertEqual(analyseur.analyser(), 1)
+        self.assertEqual(analyseur.analyser(), 0)
+
+        self.assertEqual(AnalyseIA.objects.filter(type_analyse=AnalyseurFraudeLot.TYPE_ANALYSE).count(), 3)
+        self.assertFalse(VerificationCotisation.objects.filter(score_anomalie_ia__isnull=True).exists())
+        self.assertFalse(VerificationCotisation.objects.filter(priorite_ia='').exists())
+
+    def test_analyse_membre_ne_deplace_pas_le_watermark(self):
+        analyser_fraude_membre(self.membre)
+        self.assertEqual(AnalyseIA.objects.filter(type_analyse=AnalyseurFraudeLot.TYPE_ANALYSE_MEMBRE).count(), 3)
+        analyseur = AnalyseurFraudeLot()
+        self.assertEqual(analyseur.dernier_id_traite(), 0)
+        self.assertEqual(analyseur.analyser(), 3)
+
+    def test_tache_membre_ne_deplace_pas_le_watermark(self):
+        self.assertEqual(analyser_verifications_membre(self.membre.id), 3)
+        self.assertEqual(AnalyseurFraudeLot().dernier_id_traite(), 0)
+        self.assertEqual(analyser_verifications_membre(self.membre.id), 0)
@@ -1,5 +1,5 @@
 # medecin/models.py
-from django.db import models
+from django.db import models, transaction
 from datetime import date, datetime, timedelta
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -539,57 +539,49 @@ class Ordonnance(models.Model):
     
     # Méthodes de partage automatique
     def partager_automatiquement(self):
-        """Partage automatiquement l'ordonnance avec les parties concernées"""
+        """
+        Partage l'ordonnance avec le patient, l'assureur et les pharmaciens.
+        Les pharmaciens y ont accès par une règle de rôle et sont notifiés en
+        tâche de fond : le coût ne dépend pas du nombre de pharmacies.
+        """
         try:
             from core.models import PartageAutomatique, Notification
+            from core.partage import lancer_notifications_role, partager
             
-            # Liste des utilisateurs concernés
-            utilisateurs_concernes = []
+            # Utilisateurs nommés : le patient (membre) et l'assureur
+            utilisateurs_concernes = [
+                utilisateur_id for utilisateur_id in (
+                    getattr(self.patient, 'user_id', None),
+                    self.assureur.user_id if self.assureur else None,
+                ) if utilisateur_id
+            ]
+            message = f"Nouvelle ordonnance prescrite par le Dr {self.medecin.get_full_name()} pour {self.patient.nom_complet}"
             
-            # 1. Le patient (membre)
-            if hasattr(self.patient, 'user'):
-                utilisateurs_concernes.append(self.patient.user)
-            
-            # 2. L'assureur (gestionnaires de l'assureur)
-            if self.assureur:
-                # Ajouter tous les utilisateurs liés à cet assureur
-                gestionnaires = User.objects.filter(
-                    assureur_gestionnaire__assureur=self.assureur
+            with transaction.atomic():
+                partager(
+                    PartageAutomatique.ORDONNANCE, self.id,
+                    utilisateurs=utilisateurs_concernes,
+                    roles=['PHARMACIEN'],
                 )
-                utilisateurs_concernes.extend(gestionnaires)
-            
-            # 3. Tous les pharmaciens
-            pharmaciens = User.objects.filter(
-                groups__name='Pharmacien',
-                is_active=True
-            )
-            utilisateurs_concernes.extend(pharmaciens)
-            
-            # Éliminer les doublons
-            utilisateurs_concernes = list(set(utilisateurs_concernes))
-            
-            # Créer l'entrée de partage
-            partage, created = PartageAutomatique.objects.get_or_create(
-                type_document=PartageAutomatique.ORDONNANCE,
-                document_id=self.id
-            )
-            partage.visible_par.set(utilisateurs_concernes)
-            
-            # Créer des notifications
-            for utilisateur in utilisateurs_concernes:
-                if utilisateur != self.medecin:  # Pas de notification pour le créateur
-                    Notification.objects.create(
-                        utilisateur=utilisateur,
-                        message=f"Nouvelle ordonnance prescrite par le Dr {self.medecin.get_full_name()} pour {self.patient.nom_complet}",
+                # Pas de notification pour le créateur
+                Notification.objects.bulk_create([
+                    Notification(
+                        utilisateur_id=utilisateur_id,
+                        message=message,
                         type_document=PartageAutomatique.ORDONNANCE,
                         document_id=self.id
                     )
+                    for utilisateur_id in utilisateurs_concernes if utilisateur_id != self.medecin_id
+                ])
+                lancer_notifications_role(
+                    PartageAutomatique.ORDONNANCE, self.id, 'PHARMACIEN', message, exclure_id=self.medecin_id
+                )
+                
+                # Marquer le partage comme effectué (sans redéclencher post_save)
+                Ordonnance.objects.filter(pk=self.pk).update(partage_effectue=True)
+                self.partage_effectue = True
             
-            # Marquer le partage comme effectué
-            self.partage_effectue = True
-            self.save(update_fields=['partage_effectue'])
-            
-            logger.info(f"Ordonnance {self.numero} partagée avec {len(utilisateurs_concernes)} utilisateurs")
+            logger.info(f"Ordonnance {self.numero} partagée avec {len(utilisateurs_concernes)} utilisateur(s) et les pharmaciens")
             return True
             
         except Exception as e:
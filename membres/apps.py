@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MembresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'membres'
+
+    def ready(self):
+        # Signaux d'indexation de la recherche
+        import membres.signals
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+import time
+
+from membres.recherche import indexer_membres
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des membres"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de membres par lot (défaut: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING("🔎 Réindexation des membres..."))
+        debut = time.monotonic()
+        total = indexer_membres(batch_size=max(1, options['batch_size']))
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} membre(s) indexé(s) en {duree:.2f}s"))
@@ -1,9 +1,18 @@
 # membres/middleware.py
+import logging
+
 from django.utils import timezone
-from .models import UserLoginSession
+
+from .suivi_connexions import CLE_ACTIVITE, CLE_SUIVIE, intervalle_activite, tampon
+
+logger = logging.getLogger(__name__)
 
 class TrackingConnexionsMiddleware:
-    """Middleware pour tracker les connexions des utilisateurs - VERSION CORRIGÉE"""
+    """
+    Middleware pour tracker les connexions des utilisateurs.
+    Aucune requête SQL par requête HTTP : l'état est porté par la session et
+    les écritures sont regroupées par membres/suivi_connexions.py.
+    """
     
     def __init__(self, get_response):
         self.get_response = get_response
@@ -19,39 +28,38 @@ class TrackingConnexionsMiddleware:
         return response
     
     def track_login(self, request):
-        """Tracker la connexion d'un utilisateur"""
+        """Tracker la connexion d'un utilisateur (une fois par session) et son activité (grain grossier)"""
         try:
-            if not hasattr(request, 'login_tracked'):
-                session_key = request.session.session_key
-                
-                # Vérifier si une session active existe déjà
-                existing_session = UserLoginSession.objects.filter(
-                    user=request.user,
-                    session_key=session_key,
-                    logout_time__isnull=True
-                ).first()
-                
-                if not existing_session:
-                    # Récupérer l'adresse IP
-                    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                    if x_forwarded_for:
-                        ip = x_forwarded_for.split(',')[0]
-                    else:
-                        ip = request.META.get('REMOTE_ADDR')
-                    
-                    # Créer une nouvelle session
-                    UserLoginSession.objects.create(
-                        user=request.user,
-                        session_key=session_key,
-                        ip_address=ip,
-                        user_agent=request.META.get('HTTP_USER_AGENT', '')
-                    )
+            session = request.session
+            session_key = session.session_key
+            if not session_key:
+                return
+            maintenant = timezone.now()
+            
+            if not session.get(CLE_SUIVIE):
+                # Récupérer l'adresse IP
+                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+                if x_forwarded_for:
+                    ip = x_forwarded_for.split(',')[0]
+                else:
+                    ip = request.META.get('REMOTE_ADDR')
                 
-                request.login_tracked = True
+                tampon.ajouter_connexion(
+                    session_key,
+                    user_id=request.user.id,
+                    ip_address=ip,
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    derniere_activite=maintenant,
+                )
+                session[CLE_SUIVIE] = True
+                session[CLE_ACTIVITE] = maintenant.timestamp()
+            elif maintenant.timestamp() - session.get(CLE_ACTIVITE, 0) >= intervalle_activite():
+                tampon.ajouter_activite(session_key, maintenant)
+                session[CLE_ACTIVITE] = maintenant.timestamp()
         except Exception as e:
             # Éviter de casser l'application en cas d'erreur
-            print(f"Erreur dans le tracking de connexion: {e}")
+            logger.error(f"Erreur dans le tracking de connexion: {e}")
     
     def process_exception(self, request, exception):
         """Gérer les exceptions dans le middleware"""
-        return None
\ No newline at end of file
+        return None
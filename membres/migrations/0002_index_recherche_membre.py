@@ -0,0 +1,84 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TABLE = 'membres_indexrecherchemembre'
+TABLE_FTS = 'membres_indexrecherchemembre_fts'
+
+SQL_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS membres_index_noms_trgm ON {TABLE} USING gin (noms gin_trgm_ops)",
+]
+
+# Table FTS5 à contenu externe, synchronisée par triggers (y compris les upserts)
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_FTS} USING fts5(
+        noms, content='{TABLE}', content_rowid='membre_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE_FTS}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {TABLE_FTS}(rowid, noms) VALUES (new.membre_id, new.noms);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE_FTS}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, noms) VALUES ('delete', old.membre_id, old.noms);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE_FTS}_au AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, noms) VALUES ('delete', old.membre_id, old.noms);
+        INSERT INTO {TABLE_FTS}(rowid, noms) VALUES (new.membre_id, new.noms);
+    END""",
+]
+
+
+def creer_index_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        instructions = SQL_POSTGRESQL
+    elif vendor == 'sqlite':
+        instructions = SQL_SQLITE
+    else:
+        return
+    for sql in instructions:
+        schema_editor.execute(sql)
+
+
+def supprimer_index_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS membres_index_noms_trgm")
+    elif vendor == 'sqlite':
+        for suffixe in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE_FTS}_{suffixe}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_FTS}")
+
+
+def remplir_index(apps, schema_editor):
+    # L'index est rempli par 0004_index_recherche_email : indexer_membres()
+    # suit le dernier schéma de IndexRechercheMembre
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexRechercheMembre',
+            fields=[
+                ('membre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='index_recherche', serialize=False, to='membres.membre')),
+                ('numero', models.CharField(db_index=True, max_length=20)),
+                ('telephone', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('noms', models.CharField(max_length=255)),
+                ('date_indexation', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Index de recherche membre',
+                'verbose_name_plural': 'Index de recherche membres',
+            },
+        ),
+        migrations.RunPython(creer_index_texte, supprimer_index_texte),
+        migrations.RunPython(remplir_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0002_index_recherche_membre'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userloginsession',
+            name='derniere_activite',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userloginsession',
+            index=models.Index(fields=['session_key'], name='user_login__session_7b7ef3_idx'),
+        ),
+    ]
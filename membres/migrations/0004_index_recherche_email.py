@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:02
+
+import importlib
+
+from django.db import migrations, models
+
+index_recherche = importlib.import_module('membres.migrations.0002_index_recherche_membre')
+
+
+def recreer_index_texte(apps, schema_editor):
+    # Sur SQLite, AddField / RemoveField reconstruisent la table et suppriment les triggers FTS5
+    index_recherche.creer_index_texte(apps, schema_editor)
+
+
+def remplir_index(apps, schema_editor):
+    from membres.recherche import indexer_membres
+
+    Membre = apps.get_model('membres', 'Membre')
+    IndexRechercheMembre = apps.get_model('membres', 'IndexRechercheMembre')
+    indexer_membres(Membre.objects.all(), modele_index=IndexRechercheMembre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0003_suivi_connexions'),
+    ]
+
+    operations = [
+        # Au retour arrière, après la suppression du champ
+        migrations.RunPython(migrations.RunPython.noop, recreer_index_texte),
+        migrations.AddField(
+            model_name='indexrecherchemembre',
+            name='email',
+            field=models.CharField(blank=True, db_index=True, max_length=254),
+        ),
+        migrations.RunPython(recreer_index_texte, migrations.RunPython.noop),
+        migrations.RunPython(remplir_index, migrations.RunPython.noop),
+    ]
@@ -658,6 +658,8 @@ class UserLoginSession(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True)
+    # Dernière activité relevée (au plus une écriture par SUIVI_CONNEXIONS_ACTIVITE secondes)
+    derniere_activite = models.DateTimeField(null=True, blank=True)
     
     # Informations de localisation (si disponibles)
     country = models.CharField(max_length=100, null=True, blank=True)
@@ -669,6 +671,7 @@ class UserLoginSession(models.Model):
         indexes = [
             models.Index(fields=['user', 'login_time']),
             models.Index(fields=['login_time']),
+            models.Index(fields=['session_key']),
         ]
     
     def __str__(self):
@@ -758,6 +761,34 @@ class Profile(models.Model):
         verbose_name_plural = "Profils"
 
 
+class IndexRechercheMembre(models.Model):
+    """
+    Index de recherche dénormalisé des membres (voir membres/recherche.py).
+
+    Les champs sont normalisés (minuscules sans accents, chiffres seuls) pour
+    permettre des recherches par préfixe indexées ; un index trigramme
+    (PostgreSQL) ou une table FTS5 (SQLite) est créé sur `noms` par migration.
+    """
+    membre = models.OneToOneField(
+        Membre,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='index_recherche'
+    )
+    numero = models.CharField(max_length=20, db_index=True)
+    telephone = models.CharField(max_length=20, blank=True, db_index=True)
+    email = models.CharField(max_length=254, blank=True, db_index=True)
+    noms = models.CharField(max_length=255)
+    date_indexation = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Index de recherche membre"
+        verbose_name_plural = "Index de recherche membres"
+
+    def __str__(self):
+        return f"{self.numero} - {self.noms}"
+
+
 # Signal pour créer automatiquement un profil
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -0,0 +1,264 @@
+# membres/recherche.py
+"""
+Moteur de recherche des membres partagé par les vues agents et assureur.
+
+La recherche s'appuie sur IndexRechercheMembre, une table dénormalisée tenue à
+jour par les signaux de membres/signals.py :
+- numéro unique, téléphone et email : préfixe sur colonnes indexées (B-tree),
+  l'email seulement pour une recherche contenant « @ » ;
+- noms (membre et utilisateur) normalisés sans accents : index trigramme
+  sur PostgreSQL, table FTS5 sur SQLite, préfixes de mots sinon.
+Les résultats sont classés : numéro ou email exact, préfixe de numéro ou
+d'email, préfixe de téléphone, puis noms (mots complets avant préfixes).
+"""
+import logging
+import re
+import unicodedata
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import IndexRechercheMembre, Membre
+
+logger = logging.getLogger(__name__)
+
+TABLE_FTS = 'membres_indexrecherchemembre_fts'
+LONGUEUR_MIN = 2
+CHAMPS_INDEXES = (
+    'id', 'numero_unique', 'telephone', 'email', 'user__email', 'nom', 'prenom', 'user__first_name', 'user__last_name',
+)
+
+SCORE_NUMERO_EXACT = 4.0
+SCORE_NUMERO_PREFIXE = 3.0
+SCORE_TELEPHONE = 2.0
+SCORE_NOMS = 1.0
+
+
+def normaliser(texte):
+    """Minuscules sans accents, ponctuation remplacée par des espaces"""
+    texte = unicodedata.normalize('NFKD', str(texte or ''))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]+', ' ', texte.lower()).strip()
+
+
+def normaliser_numero(texte):
+    return re.sub(r'[^A-Za-z0-9]', '', str(texte or '')).upper()
+
+
+def normaliser_telephone(texte):
+    return re.sub(r'\D', '', str(texte or ''))
+
+
+def normaliser_email(texte):
+    return str(texte or '').strip().lower()
+
+
+# ==========================================================================
+# INDEXATION
+# ==========================================================================
+
+def entree_index(ligne, modele_index=IndexRechercheMembre):
+    """Construit l'entrée d'index d'un membre à partir de CHAMPS_INDEXES"""
+    membre_id, numero_unique, telephone, email, user_email, nom, prenom, first_name, last_name = ligne
+    mots = normaliser(' '.join(filter(None, [prenom, nom, first_name, last_name]))).split()
+    return modele_index(
+        membre_id=membre_id,
+        numero=normaliser_numero(numero_unique)[:20],
+        telephone=normaliser_telephone(telephone)[:20],
+        # Email du membre, à défaut celui de son compte
+        email=normaliser_email(email or user_email)[:254],
+        noms=' '.join(dict.fromkeys(mots))[:255],
+    )
+
+
+def indexer_membres(membres=None, batch_size=1000, modele_index=IndexRechercheMembre):
+    """
+    (Ré)indexe les membres du queryset (tous par défaut) par lots, avec un
+    upsert en masse. Retourne le nombre de membres indexés.
+    """
+    if membres is None:
+        membres = Membre.objects.all()
+
+    total = 0
+    dernier_id = 0
+    while True:
+        lignes = list(
+            membres.filter(id__gt=dernier_id).order_by('id').values_list(*CHAMPS_INDEXES)[:batch_size]
+        )
+        if not lignes:
+            return total
+        dernier_id = lignes[-1][0]
+        modele_index.objects.bulk_create(
+            [entree_index(ligne, modele_index) for ligne in lignes],
+            update_conflicts=True,
+            unique_fields=['membre'],
+            update_fields=['numero', 'telephone', 'email', 'noms', 'date_indexation'],
+        )
+        total += len(lignes)
+
+
+def indexer_membre(membre):
+    indexer_membres(Membre.objects.filter(pk=membre.pk))
+
+
+# ==========================================================================
+# RECHERCHE
+# ==========================================================================
+
+_FTS_DISPONIBLE = {}
+
+
+def _fts_disponible(connection):
+    cle = (connection.alias, str(connection.settings_dict.get('NAME')))
+    if cle not in _FTS_DISPONIBLE:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE_FTS]
+            )
+            _FTS_DISPONIBLE[cle] = cursor.fetchone() is not None
+    return _FTS_DISPONIBLE[cle]
+
+
+def _score_noms(noms, termes):
+    """Entre SCORE_NOMS et 2 * SCORE_NOMS selon la part de mots complets"""
+    mots = set(noms.split())
+    exacts = sum(1 for terme in termes if terme in mots)
+    return SCORE_NOMS * (1 + exacts / len(termes))
+
+
+class MoteurRechercheMembres:
+    """Recherche classée des membres via IndexRechercheMembre"""
+
+    def __init__(self, using=None):
+        self.using = using or router.db_for_read(IndexRechercheMembre)
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def _index(self, queryset=None):
+        index = IndexRechercheMembre.objects.using(self.using)
+        if queryset is not None:
+            index = index.filter(membre__in=queryset.using(self.using).values('pk'))
+        return index
+
+    def _noms_fts(self, termes, limite, queryset=None):
+        # Mots complets puis préfixes : deux requêtes bornées plutôt qu'un
+        # ORDER BY bm25 qui noterait toutes les correspondances d'un nom courant
+        perimetre, parametres = '', []
+        if queryset is not None:
+            sous_requete, parametres = queryset.using(self.using).values('pk').query.sql_with_params()
+            perimetre = f' AND rowid IN ({sous_requete})'
+        resultats = {}
+        with self.connection.cursor() as cursor:
+            for suffixe in ('', '*'):
+                cursor.execute(
+                    f"SELECT rowid, noms FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s{perimetre} LIMIT %s",
+                    [' '.join(f'"{terme}"{suffixe}' for terme in termes), *parametres, limite],
+                )
+                for membre_id, noms in cursor.fetchall():
+                    resultats.setdefault(membre_id, noms)
+        return list(resultats.items())
+
+    def _noms_trigramme(self, termes, limite, queryset=None):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        index = self._index(queryset)
+        for terme in termes:
+            index = index.filter(noms__contains=terme)
+        return list(
+            index.annotate(
+                similarite=TrigramWordSimilarity(' '.join(termes), 'noms')
+            ).order_by('-similarite').values_list('membre_id', 'noms')[:limite]
+        )
+
+    def _noms_prefixes(self, termes, limite, queryset=None):
+        index = self._index(queryset)
+        for terme in termes:
+            index = index.filter(Q(noms__startswith=terme) | Q(noms__contains=f' {terme}'))
+        return list(index.values_list('membre_id', 'noms')[:limite])
+
+    def _rechercher_noms(self, termes, limite, queryset=None):
+        vendor = self.connection.vendor
+        if vendor == 'postgresql':
+            return self._noms_trigramme(termes, limite, queryset)
+        if vendor == 'sqlite' and _fts_disponible(self.connection):
+            return self._noms_fts(termes, limite, queryset)
+        return self._noms_prefixes(termes, limite, queryset)
+
+    def _prefixe(self, champ, prefixe, queryset=None):
+        """
+        Filtre « commence par » utilisant l'index B-tree : sur SQLite, LIKE
+        est insensible à la casse et ignore l'index, on borne donc l'intervalle
+        (les valeurs indexées sont normalisées en ASCII).
+        """
+        if self.connection.vendor == 'sqlite':
+            borne = prefixe[:-1] + chr(ord(prefixe[-1]) + 1)
+            return self._index(queryset).filter(**{f'{champ}__gte': prefixe, f'{champ}__lt': borne})
+        return self._index(queryset).filter(**{f'{champ}__startswith': prefixe})
+
+    def identifiants(self, query, limite=10, queryset=None):
+        """
+        Identifiants des membres correspondant à `query`, du plus pertinent au
+        moins pertinent. `queryset` restreint la recherche (ex. membres d'un
+        assureur) : le classement et la limite s'appliquent après ce filtre.
+        """
+        scores = {}
+
+        numero = normaliser_numero(query)
+        if len(numero) >= LONGUEUR_MIN:
+            for membre_id, valeur in self._prefixe('numero', numero, queryset).values_list(
+                'membre_id', 'numero'
+            )[:limite]:
+                scores[membre_id] = SCORE_NUMERO_EXACT if valeur == numero else SCORE_NUMERO_PREFIXE
+
+            telephone = normaliser_telephone(query)
+            if telephone == numero and len(telephone) >= 4:
+                for membre_id in self._prefixe('telephone', telephone, queryset).values_list(
+                    'membre_id', flat=True
+                )[:limite]:
+                    scores.setdefault(membre_id, SCORE_TELEPHONE)
+
+        email = normaliser_email(query)
+        if '@' in email:
+            for membre_id, valeur in self._prefixe('email', email, queryset).values_list(
+                'membre_id', 'email'
+            )[:limite]:
+                score = SCORE_NUMERO_EXACT if valeur == email else SCORE_NUMERO_PREFIXE
+                scores[membre_id] = max(scores.get(membre_id, 0), score)
+
+        termes = normaliser(query).split()
+        if termes and len(''.join(termes)) >= LONGUEUR_MIN:
+            for position, (membre_id, noms) in enumerate(self._rechercher_noms(termes, limite, queryset)):
+                # La position départage les ex æquo selon le classement du moteur
+                score = _score_noms(noms, termes) - position * 1e-6
+                scores[membre_id] = max(scores.get(membre_id, 0), score)
+
+        classes = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [membre_id for membre_id, _ in classes[:limite]]
+
+    def rechercher(self, query, limite=10, queryset=None):
+        """
+        Membres correspondant à `query`, classés par pertinence. `queryset`
+        restreint les résultats (ex. membres d'un assureur).
+        """
+        query = (query or '').strip()
+        if len(query) < LONGUEUR_MIN:
+            return []
+
+        candidats = self.identifiants(query, limite, queryset)
+        if not candidats:
+            return []
+
+        if queryset is None:
+            queryset = Membre.objects.select_related('user')
+        par_id = queryset.using(self.using).in_bulk(candidats)
+        return [par_id[membre_id] for membre_id in candidats if membre_id in par_id][:limite]
+
+
+moteur_recherche = MoteurRechercheMembres()
+
+
+def rechercher_membres(query, limite=10, queryset=None):
+    """Raccourci vers le moteur partagé"""
+    return moteur_recherche.rechercher(query, limite=limite, queryset=queryset)
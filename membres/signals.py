@@ -0,0 +1,31 @@
+# membres/signals.py
+import logging
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Membre
+from .recherche import indexer_membre, indexer_membres
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Membre)
+def indexer_membre_enregistre(sender, instance, **kwargs):
+    """Tient l'index de recherche à jour (la suppression suit par cascade)"""
+    try:
+        indexer_membre(instance)
+    except Exception as e:
+        logger.error(f"Erreur indexation recherche membre {instance.pk}: {e}")
+
+
+@receiver(post_save, sender=User)
+def indexer_membre_utilisateur(sender, instance, created, **kwargs):
+    """Les noms de l'utilisateur lié font partie de l'index"""
+    if created:
+        return
+    try:
+        indexer_membres(Membre.objects.filter(user=instance))
+    except Exception as e:
+        logger.error(f"Erreur indexation recherche utilisateur {instance.pk}: {e}")
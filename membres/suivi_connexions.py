@@ -0,0 +1,120 @@
+# membres/suivi_connexions.py
+"""
+Suivi des connexions (UserLoginSession) hors du chemin des requêtes.
+
+TrackingConnexionsMiddleware marque la session Django comme suivie : les
+requêtes suivantes ne font plus aucune lecture en base. Les nouvelles
+connexions et les signes d'activité sont déposés dans un tampon mémoire du
+processus, écrit par lots (bulk_create et UPDATE groupé) par un thread
+d'arrière-plan : au plus tard SUIVI_CONNEXIONS_INTERVALLE secondes après le
+premier événement, ou dès SUIVI_CONNEXIONS_TAILLE_LOT événements. L'activité
+n'est relevée qu'une fois par SUIVI_CONNEXIONS_ACTIVITE secondes et par
+session. Un événement encore en tampon à l'arrêt brutal du processus est perdu.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+
+from .models import UserLoginSession
+
+logger = logging.getLogger(__name__)
+
+# Clés posées dans la session Django
+CLE_SUIVIE = '_suivi_connexion'
+CLE_ACTIVITE = '_suivi_activite'
+
+
+def taille_lot():
+    return getattr(settings, 'SUIVI_CONNEXIONS_TAILLE_LOT', 200)
+
+
+def intervalle_vidage():
+    return getattr(settings, 'SUIVI_CONNEXIONS_INTERVALLE', 10)
+
+
+def intervalle_activite():
+    return getattr(settings, 'SUIVI_CONNEXIONS_ACTIVITE', 300)
+
+
+class TamponConnexions:
+    """Tampon des connexions et activités en attente d'écriture, partagé par les threads du processus"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._connexions = {}  # session_key -> champs de UserLoginSession
+        self._activites = {}   # session_key -> dernière activité
+        self._minuteur = None
+
+    def __len__(self):
+        return len(self._connexions) + len(self._activites)
+
+    def ajouter_connexion(self, session_key, **champs):
+        with self._verrou:
+            self._connexions[session_key] = {'session_key': session_key, **champs}
+        self._planifier()
+
+    def ajouter_activite(self, session_key, moment):
+        with self._verrou:
+            self._activites[session_key] = moment
+        self._planifier()
+
+    def _planifier(self):
+        with self._verrou:
+            plein = len(self) >= taille_lot()
+            if not plein and self._minuteur is None:
+                self._minuteur = threading.Timer(intervalle_vidage(), self._vider_en_arriere_plan)
+                self._minuteur.daemon = True
+                self._minuteur.start()
+        if plein:
+            threading.Thread(target=self._vider_en_arriere_plan, daemon=True).start()
+
+    def _extraire(self):
+        with self._verrou:
+            connexions, activites = self._connexions, self._activites
+            self._connexions, self._activites = {}, {}
+            if self._minuteur is not None:
+                self._minuteur.cancel()
+                self._minuteur = None
+        return connexions, activites
+
+    def _vider_en_arriere_plan(self):
+        try:
+            self.vider()
+        finally:
+            # Connexion propre à ce thread
+            connection.close()
+
+    def vider(self):
+        """Écrit le tampon en base ; retourne (sessions créées, sessions dont l'activité est mise à jour)"""
+        connexions, activites = self._extraire()
+        if not connexions and not activites:
+            return 0, 0
+        try:
+            # Sessions déjà enregistrées (par exemple suivies avant un redémarrage) : une requête par lot
+            existantes = set(UserLoginSession.objects.filter(
+                session_key__in=list(connexions), logout_time__isnull=True
+            ).values_list('session_key', flat=True)) if connexions else set()
+            nouvelles = UserLoginSession.objects.bulk_create([
+                UserLoginSession(**champs) for session_key, champs in connexions.items() if session_key not in existantes
+            ])
+
+            mises_a_jour = 0
+            if activites:
+                mises_a_jour = UserLoginSession.objects.filter(
+                    session_key__in=list(activites), logout_time__isnull=True
+                ).update(derniere_activite=Case(
+                    *[When(session_key=session_key, then=Value(moment)) for session_key, moment in activites.items()],
+                    output_field=DateTimeField(),
+                ))
+            return len(nouvelles), mises_a_jour
+        except Exception as e:
+            logger.error(f"Erreur d'écriture du suivi des connexions ({len(connexions) + len(activites)} événement(s) perdus): {e}")
+            return 0, 0
+
+
+tampon = TamponConnexions()
+atexit.register(tampon.vider)
@@ -1,9 +1,13 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.contrib.auth.models import User, Group
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
 from django.urls import reverse
 from medecin.models import Ordonnance
 from assureur.models import Assureur, Bon
-from .models import Membre
+from .middleware import TrackingConnexionsMiddleware
+from .models import Membre, UserLoginSession
+from .suivi_connexions import tampon
 
 class MembresTests(TestCase):
     def setUp(self):
@@ -103,4 +107,92 @@ class MembresTests(TestCase):
             )
         
         # Vérifier que le membre a 3 ordonnances
-        self.assertEqual(self.membre.ordonnances_medecin.count(), 3)
\ No newline at end of file
+        self.assertEqual(self.membre.ordonnances_medecin.count(), 3)
+
+class RechercheMembresTests(TestCase):
+
+    def setUp(self):
+        self.awa = Membre.objects.create(nom='Koné', prenom='Awa', telephone='07 08 09 10 11')
+        self.konan = Membre.objects.create(nom='Konan', prenom='Hélène', telephone='0501020304')
+        self.autre = Membre.objects.create(nom='Traoré', prenom='Moussa', telephone='0102030405')
+
+    def test_noms_sans_accents_et_prefixes(self):
+        from membres.recherche import rechercher_membres
+
+        self.assertEqual(rechercher_membres('helene kon'), [self.konan])
+        self.assertEqual(set(rechercher_membres('kon')), {self.awa, self.konan})
+        # Mot complet avant simple préfixe
+        konebi = Membre.objects.create(nom='Konebi', prenom='Ali')
+        self.assertEqual(rechercher_membres('kone'), [self.awa, konebi])
+        self.assertEqual(rechercher_membres('traore moussa'), [self.autre])
+
+    def test_numero_et_telephone_par_prefixe(self):
+        from membres.recherche import rechercher_membres
+
+        self.assertEqual(rechercher_membres(self.autre.numero_unique)[0], self.autre)
+        self.assertEqual(rechercher_membres('07080'), [self.awa])
+
+    def test_recherche_restreinte_avant_la_limite(self):
+        from membres.recherche import rechercher_membres
+
+        # Plus de correspondances hors périmètre que de candidats demandés
+        for i in range(12):
+            Membre.objects.create(nom='Koné', prenom=f'Fanta{i}', telephone=f'07080{i:02d}000')
+        cible = Membre.objects.create(nom='Koné', prenom='Issa', telephone='0708099900')
+        perimetre = Membre.objects.filter(pk__in=[cible.pk, self.autre.pk])
+        self.assertEqual(rechercher_membres('kone', limite=2, queryset=perimetre), [cible])
+        self.assertEqual(rechercher_membres('0708', limite=2, queryset=perimetre), [cible])
+
+    def test_email_exact_ou_par_prefixe(self):
+        from membres.recherche import rechercher_membres
+
+        self.awa.email = 'Awa.Kone@Exemple.ci'
+        self.awa.save()
+        compte = Membre.objects.create(
+            nom='Yao', prenom='Koffi', user=User.objects.create_user(username='koffi', email='koffi@exemple.ci')
+        )
+        self.assertEqual(rechercher_membres('awa.kone@exemple.ci'), [self.awa])
+        self.assertEqual(rechercher_membres('KOFFI@'), [compte])
+        self.assertEqual(rechercher_membres('inconnu@exemple.ci'), [])
+
+    def test_index_suit_les_modifications(self):
+        from membres.recherche import rechercher_membres
+
+        self.awa.nom = 'Diabaté'
+        self.awa.save()
+        self.assertEqual(rechercher_membres('diabate'), [self.awa])
+        self.assertEqual(rechercher_membres('kone'), [])
+
+        self.awa.delete()
+        self.assertEqual(rechercher_membres('diabate'), [])
+
+
+class SuiviConnexionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='suivi', password='testpass123')
+        self.middleware = TrackingConnexionsMiddleware(lambda request: HttpResponse())
+        self.session = SessionStore()
+        self.session.create()
+        self.addCleanup(tampon._extraire)
+
+    def _requete(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        request.user = self.user
+        request.session = self.session
+        return request
+
+    def test_aucune_requete_par_page_et_ecriture_groupee(self):
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.middleware(self._requete())
+        self.assertEqual(tampon.vider(), (1, 0))
+        connexion = UserLoginSession.objects.get()
+        self.assertEqual((connexion.user, connexion.ip_address), (self.user, '10.0.0.1'))
+        self.assertIsNotNone(connexion.derniere_activite)
+
+        # Activité relevée seulement une fois l'intervalle écoulé
+        self.middleware(self._requete())
+        self.assertEqual(len(tampon), 0)
+        with override_settings(SUIVI_CONNEXIONS_ACTIVITE=0):
+            self.middleware(self._requete())
+        self.assertEqual(tampon.vider(), (0, 1))
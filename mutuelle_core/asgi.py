@@ -8,24 +8,29 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
-import django
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-
-# 🔥 Import du routage WebSocket depuis l’app communication
-import communication.routing
 
 # 🔧 Configuration de l’environnement Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mutuelle_core.settings')
-django.setup()
+
+# Initialise Django avant d'importer les consumers (qui utilisent les modèles)
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+# 🔥 Import du routage WebSocket depuis l’app communication
+import communication.routing  # noqa: E402
 
 # 🚀 Configuration du routeur ASGI
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),  # Gestion HTTP classique
-    "websocket": AuthMiddlewareStack(  # Gestion WebSocket avec authentification
-        URLRouter(
-            communication.routing.websocket_urlpatterns
+    "http": django_asgi_app,  # Gestion HTTP classique
+    "websocket": AllowedHostsOriginValidator(  # Refuse les origines hors ALLOWED_HOSTS
+        AuthMiddlewareStack(  # Gestion WebSocket avec authentification (session)
+            URLRouter(
+                communication.routing.websocket_urlpatterns
+            )
         )
     ),
 })
@@ -234,6 +234,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
     
     'corsheaders',
     'rest_framework',
@@ -376,6 +377,26 @@ TEMPLATES = [{
 }]
 
 WSGI_APPLICATION = 'mutuelle_core.wsgi.application'
+ASGI_APPLICATION = 'mutuelle_core.asgi.application'
+
+# Flux temps réel (django-channels, optionnel) : Redis si REDIS_URL. La couche
+# mémoire ne relie pas les processus entre eux (WSGI, workers) : elle est
+# réservée au développement et aux tests. Sans couche, temps_reel.actif() est
+# faux et les clients gardent le polling.
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['REDIS_URL']]},
+        },
+    }
+elif DEBUG or 'test' in sys.argv[1:2]:
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+# File de tâches (core/taches.py) : exécutée par `python manage.py worker_taches`
+# (process `worker` du Procfile, service railway.worker.toml). Sans worker
+# déployé, TACHES_MODE_SYNCHRONE=true exécute les tâches dans la requête.
+TACHES_MODE_SYNCHRONE = os.environ.get('TACHES_MODE_SYNCHRONE', 'false').lower() == 'true'
 
 # ============================================================================
 # 11. AUTHENTICATION
@@ -1,9 +1,10 @@
 # pharmacie_public/api_views.py
-from rest_framework import viewsets, permissions
-from rest_framework.decorators import api_view
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from .models import PharmaciePublic, MedicamentPublic, CommandePublic
-from .serializers import PharmaciePublicSerializer, MedicamentPublicSerializer
+from .geo import pharmacies_proches
+from .models import PharmaciePublic
+from .serializers import PharmaciePublicSerializer, PharmacieProcheSerializer
 
 class PharmaciePublicViewSet(viewsets.ReadOnlyModelViewSet):
     """API pour les pharmacies publiques"""
@@ -11,20 +12,47 @@ class PharmaciePublicViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PharmaciePublicSerializer
     permission_classes = [permissions.AllowAny]
 
+RAYON_DEFAUT_KM = 10
+RAYON_MAX_KM = 100
+LIMITE_DEFAUT = 20
+LIMITE_MAX = 100
+
+
+def _booleen(valeur):
+    return str(valeur).lower() in ('1', 'true', 'oui', 'on')
+
+
 @api_view(['GET'])
+@permission_classes([permissions.AllowAny])
 def api_pharmacies_proches(request):
-    """API pour trouver les pharmacies proches"""
-    latitude = request.GET.get('lat')
-    longitude = request.GET.get('lng')
-    rayon = request.GET.get('rayon', 10)  # 10km par défaut
-    
-    # Implémentation de la géolocalisation
+    """
+    API pour trouver les pharmacies proches : les `limit` pharmacies actives
+    les plus proches de (lat, lng) dans un rayon de `rayon` km, filtrables par
+    `de_garde` et `partenaire_mutuelle`, triées par distance.
+    """
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+        rayon = min(float(request.GET.get('rayon', RAYON_DEFAUT_KM)), RAYON_MAX_KM)
+        limite = min(int(request.GET.get('limit', LIMITE_DEFAUT)), LIMITE_MAX)
+    except (KeyError, ValueError):
+        return Response(
+            {'error': "Paramètres lat et lng requis ; rayon (km) et limit doivent être numériques"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or rayon <= 0 or limite <= 0:
+        return Response({'error': "Coordonnées, rayon ou limite hors bornes"}, status=status.HTTP_400_BAD_REQUEST)
+
     pharmacies = PharmaciePublic.objects.filter(statut='actif')
-    
-    # Filtrage par distance (implémentation simplifiée)
-    if latitude and longitude:
-        # Ici vous intégreriez un service de géolocalisation
-        pass
-        
-    serializer = PharmaciePublicSerializer(pharmacies, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    if _booleen(request.GET.get('de_garde')):
+        pharmacies = pharmacies.filter(est_de_garde=True)
+    if _booleen(request.GET.get('partenaire_mutuelle')):
+        pharmacies = pharmacies.filter(partenaire_mutuelle=True)
+
+    proches = pharmacies_proches(pharmacies, latitude, longitude, rayon, limite)
+    serializer = PharmacieProcheSerializer(
+        [pharmacie for _, pharmacie in proches],
+        many=True,
+        context={'distances': {pharmacie.pk: distance for distance, pharmacie in proches}},
+    )
+    return Response(serializer.data)
@@ -0,0 +1,90 @@
+# pharmacie_public/commandes.py
+"""
+Enregistrement des commandes publiques.
+
+Toutes les lignes d'une commande sont réservées dans une seule transaction :
+le stock de chaque médicament est décrémenté par un UPDATE conditionnel
+(`stock = stock - q WHERE stock >= q`) qui ne peut pas rendre le stock
+négatif, même face à des commandes concurrentes. Les lignes servies sont
+insérées par bulk_create et le montant total calculé au passage ; les lignes
+non servies sont retournées comme manques.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CommandePublic, LigneCommandePublic, MedicamentPublic
+
+logger = logging.getLogger(__name__)
+
+
+def _regrouper(lignes):
+    """{medicament_id: quantité} en additionnant les lignes d'un même médicament (quantités > 0)"""
+    quantites = {}
+    for medicament_id, quantite in lignes:
+        if quantite > 0:
+            quantites[medicament_id] = quantites.get(medicament_id, 0) + quantite
+    return quantites
+
+
+def enregistrer_commande(client, pharmacie, lignes, notes=''):
+    """
+    Passe une commande de `lignes` [(medicament_id, quantité)] à la pharmacie.
+
+    Retourne (commande, manques) : la commande des lignes servies (None si
+    aucune ne l'est) et la liste des lignes non servies, sous forme de dicts
+    {'medicament_id', 'nom', 'demande', 'disponible'} ; `nom` vaut None pour un
+    médicament inconnu de la pharmacie.
+    """
+    quantites = _regrouper(lignes)
+    if not quantites:
+        return None, []
+
+    with transaction.atomic():
+        medicaments = {
+            medicament_id: (nom, prix)
+            for medicament_id, nom, prix in MedicamentPublic.objects.filter(
+                pharmacie=pharmacie, id__in=list(quantites)
+            ).values_list('id', 'nom', 'prix')
+        }
+
+        servies, manques = [], []
+        # Ordre des ids constant : deux commandes concurrentes verrouillent les lignes dans le même ordre
+        for medicament_id in sorted(quantites):
+            quantite = quantites[medicament_id]
+            if medicament_id in medicaments and MedicamentPublic.objects.filter(
+                id=medicament_id, stock__gte=quantite
+            ).update(stock=F('stock') - quantite):
+                servies.append((medicament_id, quantite))
+            else:
+                manques.append({
+                    'medicament_id': medicament_id,
+                    'nom': medicaments.get(medicament_id, (None, None))[0],
+                    'demande': quantite,
+                    'disponible': 0,
+                })
+
+        if manques:
+            disponibles = dict(MedicamentPublic.objects.filter(
+                id__in=[manque['medicament_id'] for manque in manques if manque['nom']]
+            ).values_list('id', 'stock'))
+            for manque in manques:
+                manque['disponible'] = disponibles.get(manque['medicament_id'], 0)
+
+        if not servies:
+            return None, manques
+
+        montant_total = sum((medicaments[medicament_id][1] * quantite for medicament_id, quantite in servies), Decimal('0'))
+        commande = CommandePublic(client=client, pharmacie=pharmacie, statut='en_attente', montant_total=montant_total, notes=notes)
+        commande.save()
+        LigneCommandePublic.objects.bulk_create([
+            LigneCommandePublic(commande=commande, medicament_id=medicament_id, quantite=quantite, prix_unitaire=medicaments[medicament_id][1])
+            for medicament_id, quantite in servies
+        ])
+
+    logger.info(
+        f"Commande {commande.numero_commande} : {len(servies)} ligne(s) servie(s), {len(manques)} manque(s)"
+    )
+    return commande, manques
@@ -0,0 +1,85 @@
+# pharmacie_public/geo.py
+"""
+Recherche de proximité des pharmacies sans PostGIS.
+
+Chaque pharmacie porte une cellule de grille (`cellule_geo`, carrés de
+PHARMACIES_TAILLE_CELLULE degrés) calculée à l'enregistrement. Une recherche
+sélectionne en SQL les cellules qui recouvrent la boîte englobante du rayon,
+puis la boîte elle-même sur latitude/longitude ; seules ces candidates sont
+classées par distance exacte (haversine).
+"""
+import heapq
+import math
+
+from django.conf import settings
+
+RAYON_TERRE_KM = 6371.0088
+KM_PAR_DEGRE = 111.32
+
+# Au-delà, le filtre par cellule n'apporte plus rien face à la boîte englobante
+MAX_CELLULES = 400
+
+
+def taille_cellule():
+    return getattr(settings, 'PHARMACIES_TAILLE_CELLULE', 0.1)
+
+
+def cellule(latitude, longitude, taille=None):
+    """Identifiant 'ligne:colonne' de la cellule contenant le point"""
+    taille = taille or taille_cellule()
+    return f'{math.floor(float(latitude) / taille)}:{math.floor(float(longitude) / taille)}'
+
+
+def boite_englobante(latitude, longitude, rayon_km):
+    """(lat_min, lat_max, lng_min, lng_max) contenant le cercle de rayon `rayon_km`"""
+    delta_lat = rayon_km / KM_PAR_DEGRE
+    cos_lat = math.cos(math.radians(latitude))
+    delta_lng = 180.0 if cos_lat < 1e-6 else min(180.0, rayon_km / (KM_PAR_DEGRE * cos_lat))
+    return (
+        max(-90.0, latitude - delta_lat), min(90.0, latitude + delta_lat),
+        max(-180.0, longitude - delta_lng), min(180.0, longitude + delta_lng),
+    )
+
+
+def cellules_couvrant(lat_min, lat_max, lng_min, lng_max, taille=None):
+    """Cellules recouvrant la boîte, ou None si elles sont trop nombreuses pour un IN utile"""
+    taille = taille or taille_cellule()
+    lignes = range(math.floor(lat_min / taille), math.floor(lat_max / taille) + 1)
+    colonnes = range(math.floor(lng_min / taille), math.floor(lng_max / taille) + 1)
+    if len(lignes) * len(colonnes) > MAX_CELLULES:
+        return None
+    return [f'{ligne}:{colonne}' for ligne in lignes for colonne in colonnes]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def pharmacies_proches(queryset, latitude, longitude, rayon_km, limite):
+    """
+    Les `limite` pharmacies de `queryset` les plus proches du point, à moins
+    de `rayon_km` : liste de (distance_km, pharmacie), de la plus proche à la
+    plus éloignée.
+    """
+    lat_min, lat_max, lng_min, lng_max = boite_englobante(latitude, longitude, rayon_km)
+    candidates = queryset.filter(
+        latitude__range=(lat_min, lat_max),
+        longitude__range=(lng_min, lng_max),
+    )
+    cellules = cellules_couvrant(lat_min, lat_max, lng_min, lng_max)
+    if cellules is not None:
+        candidates = candidates.filter(cellule_geo__in=cellules)
+
+    distances = (
+        (haversine_km(latitude, longitude, float(pharmacie.latitude), float(pharmacie.longitude)), pharmacie)
+        for pharmacie in candidates.iterator(chunk_size=500)
+    )
+    return heapq.nsmallest(
+        limite,
+        ((distance, pharmacie) for distance, pharmacie in distances if distance <= rayon_km),
+        key=lambda element: (element[0], element[1].pk),
+    )
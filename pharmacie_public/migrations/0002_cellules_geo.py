@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def calculer_cellules(apps, schema_editor):
+    from pharmacie_public.geo import cellule
+
+    PharmaciePublic = apps.get_model('pharmacie_public', 'PharmaciePublic')
+    pharmacies = []
+    for pharmacie in PharmaciePublic.objects.filter(latitude__isnull=False, longitude__isnull=False).only(
+        'latitude', 'longitude'
+    ).iterator(chunk_size=1000):
+        pharmacie.cellule_geo = cellule(pharmacie.latitude, pharmacie.longitude)
+        pharmacies.append(pharmacie)
+    PharmaciePublic.objects.bulk_update(pharmacies, ['cellule_geo'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacie_public', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pharmaciepublic',
+            name='cellule_geo',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='pharmaciepublic',
+            index=models.Index(fields=['statut', 'cellule_geo'], name='pharmacie_p_statut_a35772_idx'),
+        ),
+        migrations.RunPython(calculer_cellules, migrations.RunPython.noop),
+    ]
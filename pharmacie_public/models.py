@@ -2,6 +2,8 @@
 
 # Create your models here.
 # pharmacie_public/models.py
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -43,13 +45,31 @@ class PharmaciePublic(models.Model):
     # Coordonnées GPS
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Cellule de grille pour la recherche de proximité (pharmacie_public/geo.py)
+    cellule_geo = models.CharField(max_length=20, blank=True, editable=False)
     
     def __str__(self):
         return self.nom_pharmacie
     
+    def save(self, *args, **kwargs):
+        """Recalcule la cellule de grille à partir des coordonnées"""
+        from .geo import cellule
+        
+        if self.latitude is not None and self.longitude is not None:
+            self.cellule_geo = cellule(self.latitude, self.longitude)
+        else:
+            self.cellule_geo = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'cellule_geo'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Pharmacie publique"
         verbose_name_plural = "Pharmacies publiques"
+        indexes = [
+            models.Index(fields=['statut', 'cellule_geo']),
+        ]
 
 class MedicamentPublic(models.Model):
     CATEGORIE_CHOICES = [
@@ -101,6 +121,13 @@ class CommandePublic(models.Model):
         return f"CMDP{timezone.now().strftime('%Y%m%d')}{self.id:06d}"
     
     def save(self, *args, **kwargs):
+        if not self.numero_commande and self.id is None:
+            # Le numéro dépend de l'id : numéro provisoire unique, remplacé après l'insertion
+            self.numero_commande = f"TMP{uuid.uuid4().hex[:17]}"
+            super().save(*args, **kwargs)
+            self.numero_commande = self.generer_numero_commande()
+            CommandePublic.objects.filter(pk=self.pk).update(numero_commande=self.numero_commande)
+            return
         if not self.numero_commande:
             self.numero_commande = self.generer_numero_commande()
         super().save(*args, **kwargs)
@@ -0,0 +1,32 @@
+# pharmacie_public/serializers.py
+from rest_framework import serializers
+from .models import PharmaciePublic, MedicamentPublic
+
+
+class PharmaciePublicSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PharmaciePublic
+        fields = [
+            'id', 'nom_pharmacie', 'adresse', 'ville', 'code_postal', 'telephone', 'type_pharmacie',
+            'horaires_ouverture', 'est_de_garde', 'partenaire_mutuelle', 'latitude', 'longitude',
+        ]
+
+
+class PharmacieProcheSerializer(PharmaciePublicSerializer):
+    """Pharmacie accompagnée de sa distance au point recherché"""
+    distance_km = serializers.SerializerMethodField()
+
+    class Meta(PharmaciePublicSerializer.Meta):
+        fields = PharmaciePublicSerializer.Meta.fields + ['distance_km']
+
+    def get_distance_km(self, pharmacie):
+        return round(self.context['distances'][pharmacie.pk], 3)
+
+
+class MedicamentPublicSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MedicamentPublic
+        fields = [
+            'id', 'pharmacie', 'nom', 'principe_actif', 'dosage', 'forme_galenique', 'laboratoire',
+            'categorie', 'prix', 'stock', 'necessite_ordonnance',
+        ]
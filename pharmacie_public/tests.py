@@ -1,3 +1,160 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .commandes import enregistrer_commande
+from .geo import haversine_km
+from .models import CommandePublic, LigneCommandePublic, MedicamentPublic, PharmaciePublic
+
+
+class PharmaciesProchesTests(TestCase):
+
+    POINT = {'lat': '5.3500', 'lng': '-4.0000'}
+
+    def _pharmacie(self, nom, latitude, longitude, **champs):
+        return PharmaciePublic.objects.create(
+            user=User.objects.create_user(username=nom, password='testpass123'),
+            nom_pharmacie=nom, adresse='Rue', ville='Abidjan', code_postal='00225', telephone='0102030405',
+            email=f'{nom}@example.com', statut=champs.pop('statut', 'actif'),
+            latitude=latitude, longitude=longitude, **champs,
+        )
+
+    def setUp(self):
+        self._pharmacie('centre', '5.351000', '-4.001000')
+        self._pharmacie('garde', '5.380000', '-4.020000', est_de_garde=True)
+        self._pharmacie('partenaire', '5.300000', '-3.950000', partenaire_mutuelle=True)
+        self._pharmacie('fermee', '5.350500', '-4.000500', statut='inactif')
+        self._pharmacie('yamoussoukro', '6.820000', '-5.276000')
+
+    def _rechercher(self, **parametres):
+        reponse = self.client.get(
+            reverse('pharmacie_public:api_pharmacies_proches'), {**self.POINT, **parametres}, secure=True
+        )
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_tri_par_distance_dans_le_rayon(self):
+        resultats = self._rechercher()
+        self.assertEqual([p['nom_pharmacie'] for p in resultats], ['centre', 'garde', 'partenaire'])
+        self.assertAlmostEqual(resultats[0]['distance_km'], haversine_km(5.35, -4.0, 5.351, -4.001), places=3)
+        self.assertEqual(self._rechercher(limit=1)[0]['nom_pharmacie'], 'centre')
+        # Rayon plafonné à 100 km : Yamoussoukro (~200 km) reste exclue
+        self.assertEqual(len(self._rechercher(rayon=500)), 3)
+        self.assertEqual(self._rechercher(rayon=1), self._rechercher(limit=1))
+
+    def test_filtres_et_parametres_invalides(self):
+        self.assertEqual([p['nom_pharmacie'] for p in self._rechercher(de_garde='1')], ['garde'])
+        self.assertEqual([p['nom_pharmacie'] for p in self._rechercher(partenaire_mutuelle='true')], ['partenaire'])
+        reponse = self.client.get(reverse('pharmacie_public:api_pharmacies_proches'), {'lat': 'x'}, secure=True)
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_cellule_recalculee(self):
+        pharmacie = PharmaciePublic.objects.get(nom_pharmacie='centre')
+        self.assertEqual(pharmacie.cellule_geo, '53:-41')
+        pharmacie.latitude, pharmacie.longitude = '6.820000', '-5.276000'
+        pharmacie.save(update_fields=['latitude', 'longitude'])
+        pharmacie.refresh_from_db()
+        self.assertEqual(pharmacie.cellule_geo, '68:-53')
+
+
+def creer_pharmacie_et_medicaments(*stocks):
+    pharmacie = PharmaciePublic.objects.create(
+        user=User.objects.create_user(username='officine', password='testpass123'),
+        nom_pharmacie='Officine', adresse='Rue', ville='Abidjan', code_postal='00225', telephone='0102030405',
+        email='officine@example.com', statut='actif', latitude='5.350000', longitude='-4.000000',
+    )
+    medicaments = [
+        MedicamentPublic.objects.create(
+            pharmacie=pharmacie, nom=f'Medicament {i}', principe_actif='X', dosage='500mg', forme_galenique='Comprimé',
+            laboratoire='Labo', categorie='generique', prix=Decimal('1500.00') + i, stock=stock,
+        )
+        for i, stock in enumerate(stocks)
+    ]
+    return pharmacie, medicaments
+
+
+class EnregistrerCommandeTests(TestCase):
+
+    def setUp(self):
+        self.client_pharmacie = User.objects.create_user(username='patient', password='testpass123')
+        self.pharmacie, (self.doliprane, self.amoxicilline) = creer_pharmacie_et_medicaments(10, 1)
+
+    def test_lignes_servies_et_manques(self):
+        with self.assertNumQueries(9):
+            commande, manques = enregistrer_commande(self.client_pharmacie, self.pharmacie, [
+                (self.doliprane.id, 3), (self.doliprane.id, 2), (self.amoxicilline.id, 4), (999999, 1),
+            ])
+        self.assertTrue(commande.numero_commande.startswith('CMDP'))
+        self.assertTrue(commande.numero_commande.endswith(f'{commande.id:06d}'))
+        self.assertEqual(commande.montant_total, Decimal('7500.00'))
+        self.assertEqual(list(commande.lignes.values_list('medicament_id', 'quantite')), [(self.doliprane.id, 5)])
+        self.assertEqual(manques, [
+            {'medicament_id': self.amoxicilline.id, 'nom': 'Medicament 1', 'demande': 4, 'disponible': 1},
+            {'medicament_id': 999999, 'nom': None, 'demande': 1, 'disponible': 0},
+        ])
+        self.doliprane.refresh_from_db()
+        self.assertEqual(self.doliprane.stock, 5)
+
+    def test_aucune_ligne_servie(self):
+        commande, manques = enregistrer_commande(self.client_pharmacie, self.pharmacie, [(self.amoxicilline.id, 2)])
+        self.assertIsNone(commande)
+        self.assertEqual(len(manques), 1)
+        self.assertFalse(CommandePublic.objects.exists())
+
+    def test_vue_passer_commande(self):
+        self.client.force_login(self.client_pharmacie)
+        reponse = self.client.post(
+            reverse('pharmacie_public:passer_commande', args=[self.pharmacie.id]),
+            {'medicament_id': [self.doliprane.id, self.amoxicilline.id], 'quantite': ['2', '5']},
+            secure=True,
+        )
+        self.assertRedirects(reponse, reverse('pharmacie_public:mes_commandes'), fetch_redirect_response=False)
+        textes = [str(message) for message in get_messages(reponse.wsgi_request)]
+        self.assertTrue(any('Stock insuffisant pour Medicament 1' in texte for texte in textes))
+        self.assertEqual(CommandePublic.objects.get().montant_total, Decimal('3000.00'))
+
+
+class CommandesConcurrentesTests(TransactionTestCase):
+
+    STOCK = 20
+    COMMANDES = 40
+
+    def test_stock_jamais_negatif(self):
+        pharmacie, (medicament,) = creer_pharmacie_et_medicaments(self.STOCK)
+        clients = User.objects.bulk_create([User(username=f'client{i}') for i in range(self.COMMANDES)])
+        depart = threading.Barrier(self.COMMANDES)
+        manques = []
+
+        def commander(client):
+            depart.wait()
+            try:
+                for _ in range(200):
+                    try:
+                        commande, manques_commande = enregistrer_commande(client, pharmacie, [(medicament.id, 1)])
+                        manques.extend(manques_commande)
+                        return
+                    except OperationalError:
+                        # SQLite verrouille la base pendant une écriture concurrente : transaction annulée, on rejoue
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=commander, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        medicament.refresh_from_db()
+        servies = sum(LigneCommandePublic.objects.filter(medicament=medicament).values_list('quantite', flat=True))
+        self.assertGreaterEqual(medicament.stock, 0)
+        self.assertEqual(medicament.stock + servies, self.STOCK)
+        self.assertEqual(CommandePublic.objects.count(), servies)
+        self.assertEqual(servies, self.STOCK)
+        self.assertEqual(len(manques), self.COMMANDES - self.STOCK)
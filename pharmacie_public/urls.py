@@ -1,6 +1,6 @@
 # pharmacie_public/urls.py
 from django.urls import path
-from . import views
+from . import api_views, views
 
 app_name = 'pharmacie_public'
 
@@ -20,4 +20,5 @@ urlpatterns = [
     
     # API
     path('api/pharmacies-garde/', views.api_pharmacies_garde, name='api_pharmacies_garde'),
+    path('api/pharmacies-proches/', api_views.api_pharmacies_proches, name='api_pharmacies_proches'),
 ]
\ No newline at end of file
@@ -9,6 +9,7 @@ from django.http import JsonResponse
 from django.views.generic import CreateView
 from django.db.models import Q
 
+from .commandes import enregistrer_commande
 from .models import PharmaciePublic, MedicamentPublic, CommandePublic, LigneCommandePublic
 from .forms import InscriptionPharmaciePublicForm, RecherchePharmacieForm
 
@@ -95,45 +96,29 @@ def passer_commande(request, pharmacie_id):
     pharmacie = get_object_or_404(PharmaciePublic, id=pharmacie_id, statut='actif')
     
     if request.method == 'POST':
-        medicaments_ids = request.POST.getlist('medicament_id')
-        quantites = request.POST.getlist('quantite')
+        lignes = []
+        for med_id, quantite in zip(request.POST.getlist('medicament_id'), request.POST.getlist('quantite')):
+            try:
+                lignes.append((int(med_id), int(quantite or 0)))
+            except ValueError:
+                continue
         
-        if medicaments_ids and quantites:
-            # Créer la commande
-            commande = CommandePublic.objects.create(
-                client=request.user,
-                pharmacie=pharmacie,
-                statut='en_attente'
-            )
+        if any(quantite > 0 for _, quantite in lignes):
+            commande, manques = enregistrer_commande(request.user, pharmacie, lignes)
+            for manque in manques:
+                if manque['nom'] is None:
+                    messages.error(request, "Médicament non trouvé")
+                else:
+                    messages.warning(
+                        request,
+                        f"Stock insuffisant pour {manque['nom']} "
+                        f"({manque['demande']} demandé(s), {manque['disponible']} disponible(s))"
+                    )
             
-            # Ajouter les lignes de commande
-            montant_total = 0
-            for med_id, quantite in zip(medicaments_ids, quantites):
-                if quantite and int(quantite) > 0:
-                    try:
-                        medicament = MedicamentPublic.objects.get(id=med_id, pharmacie=pharmacie)
-                        if medicament.stock >= int(quantite):
-                            ligne = LigneCommandePublic.objects.create(
-                                commande=commande,
-                                medicament=medicament,
-                                quantite=int(quantite),
-                                prix_unitaire=medicament.prix
-                            )
-                            montant_total += ligne.sous_total
-                            
-                            # Mettre à jour le stock
-                            medicament.stock -= int(quantite)
-                            medicament.save()
-                        else:
-                            messages.warning(request, f"Stock insuffisant pour {medicament.nom}")
-                    except MedicamentPublic.DoesNotExist:
-                        messages.error(request, "Médicament non trouvé")
-            
-            commande.montant_total = montant_total
-            commande.save()
-            
-            messages.success(request, f"✅ Commande #{commande.numero_commande} passée avec succès!")
-            return redirect('pharmacie_public:mes_commandes')
+            if commande is not None:
+                messages.success(request, f"✅ Commande #{commande.numero_commande} passée avec succès!")
+                return redirect('pharmacie_public:mes_commandes')
+            messages.error(request, "Aucun médicament de la commande n'est disponible")
         else:
             messages.error(request, "Veuillez sélectionner au moins un médicament")
     
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PharmacienConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pharmacien'
+
+    def ready(self):
+        # Invalidation des statistiques de stock en cache
+        import pharmacien.signals
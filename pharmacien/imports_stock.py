@@ -0,0 +1,241 @@
+# pharmacien/imports_stock.py
+"""
+Import en masse du stock d'une pharmacie depuis un catalogue CSV.
+
+Le fichier est lu ligne à ligne (csv.DictReader sur le flux binaire, jamais
+chargé en entier). Les clés (nom, code) déjà en stock pour la pharmacie sont
+préchargées en une requête ; chaque ligne incrémente un produit existant ou
+en crée un, et les modifications sont écrites par lots de
+IMPORT_STOCK_TAILLE_LOT (bulk_update / bulk_create), le tout dans une
+transaction qui invalide les statistiques en cache (pharmacien.stocks).
+Au-delà de IMPORT_STOCK_SEUIL_ARRIERE_PLAN octets, l'import devient une
+tâche de fond (core.taches) dont le résultat est le rapport.
+"""
+import csv
+import io
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.taches import enfiler
+from .models import Pharmacien, StockPharmacie
+from .stocks import invalider
+
+logger = logging.getLogger(__name__)
+
+CHAMPS_MIS_A_JOUR = ['quantite_stock', 'prix_achat', 'prix_vente', 'date_peremption', 'date_modification']
+
+# Nombre d'erreurs détaillées conservées dans le rapport (toutes sont comptées)
+MAX_ERREURS_RAPPORT = 500
+
+# Bornes des colonnes : une valeur hors limites est une erreur de ligne, pas un échec de l'import
+QUANTITE_MAX = 2147483647
+_champ_prix = StockPharmacie._meta.get_field('prix_vente')
+PRIX_MAX = Decimal(10) ** (_champ_prix.max_digits - _champ_prix.decimal_places) - Decimal(10) ** -_champ_prix.decimal_places
+
+
+def taille_lot():
+    return getattr(settings, 'IMPORT_STOCK_TAILLE_LOT', 1000)
+
+
+def seuil_arriere_plan():
+    return getattr(settings, 'IMPORT_STOCK_SEUIL_ARRIERE_PLAN', 1024 * 1024)
+
+
+def dossier_imports():
+    dossier = getattr(settings, 'IMPORTS_STOCK_ROOT', os.path.join(settings.BASE_DIR, 'imports_stock'))
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+class LigneInvalide(ValueError):
+    pass
+
+
+def _entier(valeur, defaut, libelle):
+    try:
+        entier = int((valeur or '').strip() or defaut)
+    except ValueError:
+        raise LigneInvalide(f"{libelle} invalide")
+    if entier < 0:
+        raise LigneInvalide(f"{libelle} négatif(ve)")
+    if entier > QUANTITE_MAX:
+        raise LigneInvalide(f"{libelle} trop grand(e)")
+    return entier
+
+
+def _prix(valeur, libelle):
+    try:
+        prix = Decimal((valeur or '').strip().replace(',', '.') or '0')
+    except InvalidOperation:
+        raise LigneInvalide(f"{libelle} invalide")
+    if not prix.is_finite():
+        raise LigneInvalide(f"{libelle} invalide")
+    if prix < 0:
+        raise LigneInvalide(f"{libelle} négatif")
+    if prix > PRIX_MAX:
+        raise LigneInvalide(f"{libelle} trop élevé")
+    return prix.quantize(Decimal('0.01'))
+
+
+def _date(valeur):
+    valeur = (valeur or '').strip()
+    if not valeur:
+        return None
+    for format_date in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valeur, format_date).date()
+        except ValueError:
+            continue
+    raise LigneInvalide("Format de date invalide")
+
+
+# Code ou libellé (sans casse) -> code de catégorie
+CATEGORIES = {
+    cle.lower(): code
+    for code, libelle in StockPharmacie.CATEGORIE_MEDICAMENT
+    for cle in (code, libelle)
+}
+
+
+def lire_ligne(row):
+    """Champs de StockPharmacie d'une ligne du CSV ; lève LigneInvalide"""
+    nom_medicament = (row.get('Nom Médicament') or '').strip()
+    if not nom_medicament:
+        raise LigneInvalide("Nom du médicament manquant")
+    code_medicament = (row.get('Code') or '').strip()
+    if len(nom_medicament) > 255 or len(code_medicament) > 100:
+        raise LigneInvalide("Nom ou code du médicament trop long")
+    return {
+        'nom_medicament': nom_medicament,
+        'code_medicament': code_medicament,
+        'categorie': CATEGORIES.get((row.get('Catégorie') or '').strip().lower(), 'AUTRE'),
+        'quantite_stock': _entier(row.get('Quantité Stock'), 0, "Quantité"),
+        'seuil_alerte': _entier(row.get('Seuil Alerte'), 10, "Seuil d'alerte"),
+        'prix_achat': _prix(row.get('Prix Achat'), "Prix d'achat"),
+        'prix_vente': _prix(row.get('Prix Vente'), "Prix de vente"),
+        'date_peremption': _date(row.get('Date Péremption')),
+    }
+
+
+class ImportStock:
+    """Applique les lignes d'un catalogue au stock d'une pharmacie, par lots"""
+
+    def __init__(self, pharmacien, taille=None):
+        self.pharmacien = pharmacien
+        self.taille = taille or taille_lot()
+        self.existants = {
+            (stock.nom_medicament, stock.code_medicament): stock
+            for stock in StockPharmacie.objects.filter(pharmacie=pharmacien).only(
+                'id', 'pharmacie_id', 'nom_medicament', 'code_medicament', *CHAMPS_MIS_A_JOUR
+            )
+        }
+        self.a_creer = {}        # (nom, code) -> StockPharmacie non encore inséré
+        self.a_mettre_a_jour = {}  # id -> StockPharmacie modifié
+        self.rapport = {'lignes': 0, 'ajoutes': 0, 'modifies': 0, 'erreurs': [], 'nombre_erreurs': 0}
+
+    def erreur(self, ligne, message):
+        self.rapport['nombre_erreurs'] += 1
+        if len(self.rapport['erreurs']) < MAX_ERREURS_RAPPORT:
+            self.rapport['erreurs'].append({'ligne': ligne, 'message': message})
+
+    def appliquer(self, champs):
+        cle = (champs['nom_medicament'], champs['code_medicament'])
+        stock = self.existants.get(cle) or self.a_creer.get(cle)
+        if stock is None:
+            self.a_creer[cle] = StockPharmacie(pharmacie=self.pharmacien, actif=True, **champs)
+            self.rapport['ajoutes'] += 1
+        else:
+            if stock.quantite_stock + champs['quantite_stock'] > QUANTITE_MAX:
+                raise LigneInvalide("Quantité cumulée trop grande")
+            stock.quantite_stock += champs['quantite_stock']
+            stock.prix_achat = champs['prix_achat']
+            stock.prix_vente = champs['prix_vente']
+            if champs['date_peremption']:
+                stock.date_peremption = champs['date_peremption']
+            if stock.pk:
+                self.a_mettre_a_jour[stock.pk] = stock
+            self.rapport['modifies'] += 1
+
+        if len(self.a_creer) + len(self.a_mettre_a_jour) >= self.taille:
+            self.ecrire()
+
+    def ecrire(self):
+        if self.a_creer:
+            crees = StockPharmacie.objects.bulk_create(list(self.a_creer.values()), batch_size=self.taille)
+            self.existants.update({(stock.nom_medicament, stock.code_medicament): stock for stock in crees})
+            self.a_creer = {}
+        if self.a_mettre_a_jour:
+            maintenant = timezone.now()
+            for stock in self.a_mettre_a_jour.values():
+                stock.date_modification = maintenant
+            StockPharmacie.objects.bulk_update(list(self.a_mettre_a_jour.values()), CHAMPS_MIS_A_JOUR, batch_size=self.taille)
+            self.a_mettre_a_jour = {}
+
+    def importer(self, lignes):
+        """`lignes` : itérable de dicts (csv.DictReader) ; retourne le rapport"""
+        with transaction.atomic():
+            for numero, row in enumerate(lignes, start=2):
+                self.rapport['lignes'] += 1
+                try:
+                    self.appliquer(lire_ligne(row))
+                except LigneInvalide as e:
+                    self.erreur(numero, str(e))
+            self.ecrire()
+            # bulk_create / bulk_update n'envoient pas de signaux
+            invalider(self.pharmacien.id)
+        return self.rapport
+
+
+def importer_stock(pharmacien, fichier, taille=None):
+    """Importe le fichier CSV binaire ouvert `fichier` (UTF-8, BOM accepté) ; retourne le rapport"""
+    debut = time.monotonic()
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+    try:
+        rapport = ImportStock(pharmacien, taille).importer(csv.DictReader(texte))
+    finally:
+        # Le fichier appartient à l'appelant
+        texte.detach()
+    logger.info(
+        f"Import stock {pharmacien.nom_pharmacie} : {rapport['lignes']} ligne(s), {rapport['ajoutes']} ajout(s), "
+        f"{rapport['modifies']} modification(s), {rapport['nombre_erreurs']} erreur(s) en {time.monotonic() - debut:.1f}s"
+    )
+    return rapport
+
+
+# ==========================================================================
+# IMPORT EN TÂCHE DE FOND
+# ==========================================================================
+
+def importer_fichier(nom_fichier, pharmacien_id):
+    """Tâche asynchrone : importe un fichier déposé dans IMPORTS_STOCK_ROOT puis le supprime"""
+    chemin = os.path.join(dossier_imports(), os.path.basename(nom_fichier))
+    try:
+        with open(chemin, 'rb') as fichier:
+            return importer_stock(Pharmacien.objects.get(id=pharmacien_id), fichier)
+    finally:
+        if os.path.exists(chemin):
+            os.remove(chemin)
+
+
+def lancer_import(pharmacien, fichier):
+    """Dépose le fichier téléversé et enfile son import ; retourne la tâche (None en mode synchrone)"""
+    nom = f'stock_{pharmacien.id}_{uuid.uuid4().hex}.csv'
+    with open(os.path.join(dossier_imports(), nom), 'wb') as destination:
+        for morceau in fichier.chunks():
+            destination.write(morceau)
+    # Une seule tentative : le fichier est supprimé après l'exécution
+    return enfiler(
+        'pharmacien.imports_stock.importer_fichier',
+        delai=0,
+        max_tentatives=1,
+        nom_fichier=nom,
+        pharmacien_id=pharmacien.id,
+    )
@@ -0,0 +1,13 @@
+# pharmacien/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import StockPharmacie
+from .stocks import invalider
+
+
+@receiver(post_save, sender=StockPharmacie)
+@receiver(post_delete, sender=StockPharmacie)
+def invalider_statistiques_stock(sender, instance, **kwargs):
+    """Les statistiques en cache de la pharmacie ne sont plus à jour"""
+    invalider(instance.pharmacie_id)
@@ -0,0 +1,108 @@
+# pharmacien/stocks.py
+"""
+Statistiques et pagination du stock d'une pharmacie.
+
+agreger() calcule en une seule requête (agrégats conditionnels) les effectifs
+par état (normal, alerte, rupture, périmé) et la valeur réelle du stock
+(quantité × prix de vente / d'achat). statistiques() met en cache ce résultat
+pour le stock complet d'une pharmacie ; le cache est invalidé après commit de
+toute modification du stock (signaux, et explicitement après les écritures
+en masse). page_par_curseur() pagine la liste par clé (id) plutôt que par
+OFFSET.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .models import StockPharmacie
+
+VALEUR = DecimalField(max_digits=16, decimal_places=2)
+
+# statut du filtre de la liste -> condition sur StockPharmacie
+ETATS = {
+    'normal': lambda aujourd_hui: Q(quantite_stock__gt=F('seuil_alerte')),
+    'alerte': lambda aujourd_hui: Q(quantite_stock__lte=F('seuil_alerte'), quantite_stock__gt=0),
+    'rupture': lambda aujourd_hui: Q(quantite_stock=0),
+    'perime': lambda aujourd_hui: Q(date_peremption__lt=aujourd_hui),
+}
+
+
+def duree_cache():
+    return getattr(settings, 'STATISTIQUES_STOCK_CACHE_TIMEOUT', 600)
+
+
+def taille_page():
+    return getattr(settings, 'STOCK_TAILLE_PAGE', 50)
+
+
+def cle_cache(pharmacien_id, aujourd_hui=None):
+    # La date fait partie de la clé : le décompte des périmés change à minuit
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    return f'pharmacien:stock:statistiques:{pharmacien_id}:{aujourd_hui.isoformat()}'
+
+
+def filtre_etat(etat, aujourd_hui=None):
+    return ETATS[etat](aujourd_hui or timezone.localdate())
+
+
+def agreger(queryset):
+    """Effectifs par état et valeurs du stock de `queryset`, en une requête"""
+    aujourd_hui = timezone.localdate()
+    resultat = queryset.order_by().aggregate(
+        total=Count('id'),
+        **{etat: Count('id', filter=condition(aujourd_hui)) for etat, condition in ETATS.items()},
+        valeur_vente=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_vente'), output_field=VALEUR)),
+        valeur_achat=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_achat'), output_field=VALEUR)),
+    )
+    for champ in ('valeur_vente', 'valeur_achat'):
+        resultat[champ] = Decimal(resultat[champ] or 0).quantize(Decimal('0.01'))
+    return resultat
+
+
+def statistiques(pharmacien_id):
+    """agreger() sur tout le stock de la pharmacie, depuis le cache si possible"""
+    cle = cle_cache(pharmacien_id)
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = agreger(StockPharmacie.objects.filter(pharmacie_id=pharmacien_id))
+        cache.set(cle, resultat, duree_cache())
+    return resultat
+
+
+def invalider(pharmacien_id):
+    """Oublie les statistiques en cache de la pharmacie après le commit en cours"""
+    transaction.on_commit(lambda: cache.delete(cle_cache(pharmacien_id)))
+
+
+def page_par_curseur(queryset, apres=None, avant=None, taille=None):
+    """
+    Une page de `queryset` du plus récent au plus ancien (id décroissant) :
+    les éléments d'id inférieur à `apres`, ou la page précédant `avant`.
+    Retourne {'elements', 'suivant', 'precedent'} ; `suivant` / `precedent`
+    sont les curseurs des pages voisines, None s'il n'y en a pas.
+    """
+    taille = taille or taille_page()
+    if avant is not None:
+        elements = list(queryset.filter(id__gt=avant).order_by('id')[:taille + 1])
+        precedent = len(elements) > taille
+        elements = elements[:taille][::-1]
+        return {
+            'elements': elements,
+            'suivant': elements[-1].id if elements else None,
+            'precedent': elements[0].id if precedent else None,
+        }
+
+    if apres is not None:
+        queryset = queryset.filter(id__lt=apres)
+    elements = list(queryset.order_by('-id')[:taille + 1])
+    suivant = len(elements) > taille
+    elements = elements[:taille]
+    return {
+        'elements': elements,
+        'suivant': elements[-1].id if suivant else None,
+        'precedent': elements[0].id if apres is not None and elements else None,
+    }
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User, Group
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 from medecin.models import Ordonnance
 from membres.models import Membre
 from assureur.models import Assureur, Bon
@@ -132,4 +133,166 @@ class PharmacienTests(TestCase):
         
         # Augmenter le stock
         stock.augmenter_stock(20)  # Monte à 25
-        self.assertFalse(stock.besoin_reapprovisionnement)
\ No newline at end of file
+        self.assertFalse(stock.besoin_reapprovisionnement)
+
+class ImportStockTests(TestCase):
+
+    ENTETE = 'Nom Médicament,Code,Catégorie,Quantité Stock,Seuil Alerte,Prix Achat,Prix Vente,Date Péremption\n'
+
+    def setUp(self):
+        import tempfile
+        self.dossier = tempfile.mkdtemp()
+        self.utilisateur = User.objects.create_user(username='import_stock', password='testpass123')
+        self.pharmacien = Pharmacien.objects.create(
+            user=self.utilisateur, nom_pharmacie='Pharmacie Import', adresse_pharmacie='Rue', telephone='0102030405'
+        )
+        StockPharmacie.objects.create(
+            pharmacie=self.pharmacien, nom_medicament='Paracétamol', code_medicament='PARA500',
+            quantite_stock=10, prix_achat=500, prix_vente=800,
+        )
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.dossier, ignore_errors=True)
+
+    def _fichier(self, *lignes):
+        import io
+        return io.BytesIO(('﻿' + self.ENTETE + ''.join(lignes)).encode('utf-8'))
+
+    def test_import_par_lots_et_rapport(self):
+        from .imports_stock import importer_stock
+
+        fichier = self._fichier(
+            'Paracétamol,PARA500,ANALGESIQUE,5,10,550,850,31/12/2027\n',
+            'Amoxicilline,AMOX1,Antibiotique,20,5,"1200,50",1800,2027-06-30\n',
+            'Amoxicilline,AMOX1,ANTIBIOTIQUE,3,5,1200,1900,\n',
+            ',SANSNOM,AUTRE,1,1,1,1,\n',
+            'Ibuprofène,IBU,AUTRE,abc,1,1,1,\n',
+            'Vitamine C,VITC,VITAMINE,4,1,1,1,31-12-2027\n',
+        )
+        # Préchargement, puis un bulk_create et un bulk_update par lot de 2 (savepoint compris)
+        with self.assertNumQueries(6):
+            rapport = importer_stock(self.pharmacien, fichier, taille=2)
+
+        self.assertEqual((rapport['lignes'], rapport['ajoutes'], rapport['modifies']), (6, 1, 2))
+        self.assertEqual(rapport['erreurs'], [
+            {'ligne': 5, 'message': 'Nom du médicament manquant'},
+            {'ligne': 6, 'message': 'Quantité invalide'},
+            {'ligne': 7, 'message': 'Format de date invalide'},
+        ])
+        paracetamol = StockPharmacie.objects.get(code_medicament='PARA500')
+        self.assertEqual((paracetamol.quantite_stock, paracetamol.prix_vente), (15, 850))
+        amoxicilline = StockPharmacie.objects.get(code_medicament='AMOX1')
+        self.assertEqual((amoxicilline.quantite_stock, amoxicilline.categorie), (23, 'ANTIBIOTIQUE'))
+        self.assertEqual(str(amoxicilline.date_peremption), '2027-06-30')
+        self.assertFalse(fichier.closed)
+
+    def test_valeurs_hors_limites_en_erreurs_de_ligne(self):
+        from .imports_stock import importer_stock
+
+        rapport = importer_stock(self.pharmacien, self._fichier(
+            'Nan,NAN,AUTRE,1,1,NaN,1,\n',
+            'Infini,INF,AUTRE,1,1,1,Infinity,\n',
+            'Cher,CHER,AUTRE,1,1,1,123456789012,\n',
+            'Negatif,NEG,AUTRE,1,1,-3,1,\n',
+            'Enorme,ENORME,AUTRE,99999999999,1,1,1,\n',
+            'Paracétamol,PARA500,AUTRE,2147483640,1,1,1,\n',
+            'Valide,VAL,AUTRE,2,1,"99999999,99",1,\n',
+        ))
+
+        self.assertEqual(rapport['erreurs'], [
+            {'ligne': 2, 'message': "Prix d'achat invalide"},
+            {'ligne': 3, 'message': 'Prix de vente invalide'},
+            {'ligne': 4, 'message': 'Prix de vente trop élevé'},
+            {'ligne': 5, 'message': "Prix d'achat négatif"},
+            {'ligne': 6, 'message': 'Quantité trop grand(e)'},
+            {'ligne': 7, 'message': 'Quantité cumulée trop grande'},
+        ])
+        self.assertEqual(rapport['ajoutes'], 1)
+        self.assertEqual(StockPharmacie.objects.get(code_medicament='VAL').prix_achat, Decimal('99999999.99'))
+        self.assertEqual(StockPharmacie.objects.get(code_medicament='PARA500').quantite_stock, 10)
+
+    def test_gros_fichier_en_tache_de_fond(self):
+        import os
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from core.models import TacheAsynchrone
+        from .imports_stock import importer_fichier
+
+        self.client.force_login(self.utilisateur)
+        self.utilisateur.groups.add(Group.objects.get_or_create(name='Pharmacien')[0])
+        fichier = SimpleUploadedFile('catalogue.csv', self._fichier('Doliprane,DOLI,AUTRE,7,1,1,1,\n').getvalue())
+        with override_settings(IMPORTS_STOCK_ROOT=self.dossier, IMPORT_STOCK_SEUIL_ARRIERE_PLAN=10):
+            reponse = self.client.post(reverse('pharmacien:importer_stock'), {'fichier_csv': fichier}, secure=True)
+            self.assertRedirects(reponse, reverse('pharmacien:stock'), fetch_redirect_response=False)
+            tache = TacheAsynchrone.objects.get(nom='pharmacien.imports_stock.importer_fichier')
+            self.assertFalse(StockPharmacie.objects.filter(code_medicament='DOLI').exists())
+
+            tache.resultat = importer_fichier(**tache.parametres)
+            tache.statut = TacheAsynchrone.Statut.TERMINEE
+            tache.save()
+            self.assertEqual(os.listdir(self.dossier), [])
+
+        self.assertEqual(StockPharmacie.objects.get(code_medicament='DOLI').quantite_stock, 7)
+        statut = self.client.get(reverse('pharmacien:statut_import_stock', args=[tache.id]), secure=True).json()
+        self.assertEqual((statut['statut'], statut['rapport']['ajoutes']), ('terminee', 1))
+
+
+class StatistiquesStockTests(TestCase):
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.utilisateur = User.objects.create_user(username='stats_stock', password='testpass123')
+        self.utilisateur.groups.add(Group.objects.get_or_create(name='Pharmacien')[0])
+        self.pharmacien = Pharmacien.objects.create(
+            user=self.utilisateur, nom_pharmacie='Pharmacie Stats', adresse_pharmacie='Rue', telephone='0102030405'
+        )
+        hier = timezone.now().date() - timedelta(days=1)
+        for nom, quantite, seuil, peremption in (
+            ('Normal', 20, 10, None), ('Alerte', 5, 10, None), ('Rupture', 0, 10, None), ('Perime', 30, 10, hier),
+        ):
+            StockPharmacie.objects.create(
+                pharmacie=self.pharmacien, nom_medicament=nom, code_medicament=nom.upper(), quantite_stock=quantite,
+                seuil_alerte=seuil, prix_achat=100, prix_vente=150, date_peremption=peremption,
+            )
+
+    def test_agregats_en_une_requete_et_cache(self):
+        from .stocks import statistiques
+
+        with self.assertNumQueries(1):
+            resultat = statistiques(self.pharmacien.id)
+        self.assertEqual(
+            {etat: resultat[etat] for etat in ('total', 'normal', 'alerte', 'rupture', 'perime')},
+            {'total': 4, 'normal': 2, 'alerte': 1, 'rupture': 1, 'perime': 1},
+        )
+        # Quantité × prix, et non somme des prix unitaires
+        self.assertEqual((resultat['valeur_vente'], resultat['valeur_achat']), (Decimal('8250.00'), Decimal('5500.00')))
+        with self.assertNumQueries(0):
+            statistiques(self.pharmacien.id)
+
+        stock = StockPharmacie.objects.get(nom_medicament='Rupture')
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.augmenter_stock(4)
+        self.assertEqual(statistiques(self.pharmacien.id)['rupture'], 0)
+
+    def test_pagination_par_curseur(self):
+        from .stocks import page_par_curseur
+
+        stocks = StockPharmacie.objects.filter(pharmacie=self.pharmacien)
+        ids = list(stocks.order_by('-id').values_list('id', flat=True))
+        premiere = page_par_curseur(stocks, taille=3)
+        self.assertEqual([stock.id for stock in premiere['elements']], ids[:3])
+        self.assertEqual((premiere['precedent'], premiere['suivant']), (None, ids[2]))
+        seconde = page_par_curseur(stocks, apres=premiere['suivant'], taille=3)
+        self.assertEqual([stock.id for stock in seconde['elements']], ids[3:])
+        self.assertEqual((seconde['precedent'], seconde['suivant']), (ids[3], None))
+        retour = page_par_curseur(stocks, avant=seconde['precedent'], taille=3)
+        self.assertEqual([stock.id for stock in retour['elements']], ids[:3])
+        self.assertIsNone(retour['precedent'])
+
+        self.client.force_login(self.utilisateur)
+        reponse = self.client.get(reverse('pharmacien:stock'), {'statut': 'alerte'}, secure=True)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual([stock.nom_medicament for stock in reponse.context['stocks']], ['Alerte'])
+        self.assertEqual(reponse.context['total_stocks'], 1)
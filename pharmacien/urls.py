@@ -29,6 +29,7 @@ urlpatterns = [
     path('stock/', views.gestion_stock, name='stock'),
     path('stock/ajouter/', views.ajouter_stock, name='ajouter_stock'),
     path('stock/importer/', views.importer_stock, name='importer_stock'),
+    path('stock/importer/<int:tache_id>/', views.statut_import_stock, name='statut_import_stock'),
     path('stock/export/', views.export_stock, name='export_stock'),
     path('stock/<int:stock_id>/modifier/', views.modifier_stock, name='modifier_stock'),
     path('stock/<int:stock_id>/reapprovisionner/', views.reapprovisionner_stock, name='reapprovisionner_stock'),
@@ -3,6 +3,8 @@ from django.contrib.auth.decorators import login_required
 from pharmacien.decorators import pharmacien_required
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils import timezone
 from datetime import date
 import csv
@@ -50,8 +52,18 @@ import string
 
 # --- Modèles ---
 from soins.models import BonDeSoin
+from core.models import TacheAsynchrone
 from pharmacien.models import Pharmacien, StockPharmacie
+from pharmacien.stocks import (
+    ETATS as ETATS_STOCK, agreger as agreger_stock, filtre_etat, page_par_curseur,
+    statistiques as statistiques_stock,
+)
+from pharmacien.imports_stock import (
+    importer_stock as importer_stock_csv, lancer_import, seuil_arriere_plan as seuil_import_arriere_plan,
+)
 from communication.models import Notification, Conversation, Message
+from communication.compteurs import compteurs
+from communication.utils import conversation_privee, get_or_create_conversation
 
 # --- Formulaires ---
 from .forms import (
@@ -107,17 +119,10 @@ def dashboard_pharmacien(request):
             participants=request.user
         ).prefetch_related('participants').order_by('-date_modification')[:5]
 
-        # Statistiques du stock
-        stocks_alerte = StockPharmacie.objects.filter(
-            pharmacie=pharmacien,
-            quantite_stock__lte=F('seuil_alerte'),
-            quantite_stock__gt=0
-        ).count()
-        
-        stocks_rupture = StockPharmacie.objects.filter(
-            pharmacie=pharmacien,
-            quantite_stock=0
-        ).count()
+        # Statistiques du stock (en cache par pharmacie)
+        statistiques = statistiques_stock(pharmacien.id)
+        stocks_alerte = statistiques['alerte']
+        stocks_rupture = statistiques['rupture']
 
         context = {
             "pharmacien": pharmacien,
@@ -621,7 +626,7 @@ def gestion_stock(request):
     """Page de gestion du stock - VERSION CORRIGÉE"""
     try:
         pharmacien = get_object_or_404(Pharmacien, user=request.user)
-        stocks = StockPharmacie.objects.filter(pharmacie=pharmacien).order_by('-date_creation')
+        stocks = StockPharmacie.objects.filter(pharmacie=pharmacien)
         
         # Filtres
         categorie_filter = request.GET.get('categorie', '')
@@ -631,15 +636,8 @@ def gestion_stock(request):
         if categorie_filter:
             stocks = stocks.filter(categorie=categorie_filter)
         
-        if statut_filter:
-            if statut_filter == 'normal':
-                stocks = stocks.filter(quantite_stock__gt=F('seuil_alerte'))
-            elif statut_filter == 'alerte':
-                stocks = stocks.filter(quantite_stock__lte=F('seuil_alerte'), quantite_stock__gt=0)
-            elif statut_filter == 'rupture':
-                stocks = stocks.filter(quantite_stock=0)
-            elif statut_filter == 'perime':
-                stocks = stocks.filter(date_peremption__lt=timezone.now().date())
+        if statut_filter in ETATS_STOCK:
+            stocks = stocks.filter(filtre_etat(statut_filter))
         
         if recherche:
             stocks = stocks.filter(
@@ -648,28 +646,36 @@ def gestion_stock(request):
                 Q(categorie__icontains=recherche)
             )
         
-        # Calcul des statistiques
-        total_stocks = stocks.count()
-        stocks_normal = stocks.filter(quantite_stock__gt=F('seuil_alerte')).count()
-        stocks_alerte = stocks.filter(quantite_stock__lte=F('seuil_alerte'), quantite_stock__gt=0).count()
-        stocks_rupture = stocks.filter(quantite_stock=0).count()
-        stocks_perimes = stocks.filter(date_peremption__lt=timezone.now().date()).count()
+        # Statistiques en une requête ; celles du stock complet sont en cache
+        filtres = {cle: valeur for cle, valeur in (
+            ('recherche', recherche), ('categorie', categorie_filter), ('statut', statut_filter)
+        ) if valeur}
+        statistiques = agreger_stock(stocks) if filtres else statistiques_stock(pharmacien.id)
         
-        # Valeur totale du stock
-        valeur_stock = stocks.aggregate(total_vente=Sum('prix_vente'))
+        # Pagination par curseur (id), du plus récent au plus ancien
+        try:
+            apres = int(request.GET['apres']) if request.GET.get('apres') else None
+            avant = int(request.GET['avant']) if request.GET.get('avant') and apres is None else None
+        except ValueError:
+            apres = avant = None
+        page = page_par_curseur(stocks, apres=apres, avant=avant)
         
         context = {
             'page_title': 'Gestion du Stock',
             'active_tab': 'stock',
             'user_group': get_user_primary_group(request.user),
-            'stocks': stocks,
+            'stocks': page['elements'],
+            'page_suivante': page['suivant'],
+            'page_precedente': page['precedent'],
+            'filtres_url': urlencode(filtres),
             'today': timezone.now().date(),
-            'total_stocks': total_stocks,
-            'stocks_normal': stocks_normal,
-            'stocks_alerte': stocks_alerte,
-            'stocks_rupture': stocks_rupture,
-            'stocks_perimes': stocks_perimes,
-            'valeur_stock': valeur_stock['total_vente'] or 0,
+            'total_stocks': statistiques['total'],
+            'stocks_normal': statistiques['normal'],
+            'stocks_alerte': statistiques['alerte'],
+            'stocks_rupture': statistiques['rupture'],
+            'stocks_perimes': statistiques['perime'],
+            'valeur_stock': statistiques['valeur_vente'],
+            'valeur_stock_achat': statistiques['valeur_achat'],
             'categories': StockPharmacie.CATEGORIE_MEDICAMENT,
             'recherche': recherche,
             'categorie_filter': categorie_filter,
@@ -820,77 +826,22 @@ def importer_stock(request):
                 messages.error(request, 'Veuillez importer un fichier CSV')
                 return redirect('pharmacien:importer_stock')
             
-            decoded_file = fichier.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            
-            produits_ajoutes = 0
-            produits_modifies = 0
-            erreurs = []
+            if fichier.size > seuil_import_arriere_plan():
+                tache = lancer_import(pharmacien, fichier)
+                if tache is not None:
+                    lien = reverse('pharmacien:statut_import_stock', args=[tache.id])
+                    messages.info(request, f"Import du fichier en cours en arrière-plan. Suivi : {lien}")
+                else:
+                    messages.success(request, "Import terminé")
+                return redirect('pharmacien:stock')
             
-            with transaction.atomic():
-                for ligne, row in enumerate(reader, start=2):
-                    try:
-                        nom_medicament = row.get('Nom Médicament', '').strip()
-                        if not nom_medicament:
-                            erreurs.append(f"Ligne {ligne}: Nom du médicament manquant")
-                            continue
-                        
-                        code_medicament = row.get('Code', '').strip()
-                        categorie = row.get('Catégorie', 'AUTRE').strip()
-                        quantite = int(row.get('Quantité Stock', 0))
-                        seuil = int(row.get('Seuil Alerte', 10))
-                        prix_achat = float(row.get('Prix Achat', 0))
-                        prix_vente = float(row.get('Prix Vente', 0))
-                        
-                        date_peremption_str = row.get('Date Péremption', '').strip()
-                        date_peremption = None
-                        if date_peremption_str:
-                            try:
-                                date_peremption = datetime.strptime(date_peremption_str, '%d/%m/%Y').date()
-                            except ValueError:
-                                try:
-                                    date_peremption = datetime.strptime(date_peremption_str, '%Y-%m-%d').date()
-                                except ValueError:
-                                    erreurs.append(f"Ligne {ligne}: Format de date invalide")
-                                    continue
-                        
-                        existing_stock = StockPharmacie.objects.filter(
-                            pharmacie=pharmacien,
-                            nom_medicament=nom_medicament,
-                            code_medicament=code_medicament
-                        ).first()
-                        
-                        if existing_stock:
-                            existing_stock.quantite_stock += quantite
-                            existing_stock.prix_achat = prix_achat
-                            existing_stock.prix_vente = prix_vente
-                            if date_peremption:
-                                existing_stock.date_peremption = date_peremption
-                            existing_stock.save()
-                            produits_modifies += 1
-                        else:
-                            stock = StockPharmacie(
-                                pharmacie=pharmacien,
-                                nom_medicament=nom_medicament,
-                                code_medicament=code_medicament,
-                                categorie=categorie,
-                                quantite_stock=quantite,
-                                seuil_alerte=seuil,
-                                prix_achat=prix_achat,
-                                prix_vente=prix_vente,
-                                date_peremption=date_peremption,
-                                actif=True
-                            )
-                            stock.save()
-                            produits_ajoutes += 1
-                            
-                    except Exception as e:
-                        erreurs.append(f"Ligne {ligne}: {str(e)}")
-                        continue
+            rapport = importer_stock_csv(pharmacien, fichier.file)
             
-            message = f"Import terminé: {produits_ajoutes} ajoutés, {produits_modifies} modifiés"
-            if erreurs:
-                message += f". {len(erreurs)} erreur(s)"
+            message = f"Import terminé: {rapport['ajoutes']} ajoutés, {rapport['modifies']} modifiés"
+            if rapport['nombre_erreurs']:
+                message += f". {rapport['nombre_erreurs']} erreur(s)"
+                for erreur in rapport['erreurs'][:5]:
+                    messages.warning(request, f"Ligne {erreur['ligne']}: {erreur['message']}")
             
             messages.success(request, message)
             return redirect('pharmacien:stock')
@@ -906,6 +857,22 @@ def importer_stock(request):
     }
     return render(request, 'pharmacien/importer_stock.html', context)
 
+@login_required
+@pharmacien_required
+def statut_import_stock(request, tache_id):
+    """État et rapport d'un import de stock en arrière-plan (JSON)"""
+    pharmacien = get_object_or_404(Pharmacien, user=request.user)
+    tache = get_object_or_404(
+        TacheAsynchrone, id=tache_id, nom='pharmacien.imports_stock.importer_fichier'
+    )
+    if tache.parametres.get('pharmacien_id') != pharmacien.id:
+        return JsonResponse({'success': False, 'message': "Import introuvable"}, status=404)
+    return JsonResponse({
+        'success': tache.statut != TacheAsynchrone.Statut.ECHEC,
+        'statut': tache.statut,
+        'rapport': tache.resultat,
+    })
+
 @login_required
 @pharmacien_required
 def desactiver_stock(request, stock_id):
@@ -1076,20 +1043,11 @@ def creer_conversation_medecin(request, medecin_id):
         from medecin.models import Medecin
         medecin_user = get_object_or_404(Medecin, id=medecin_id).user
         
-        # Vérifier si une conversation existe déjà
-        existing_conversation = Conversation.objects.filter(
-            participants=request.user
-        ).filter(
-            participants=medecin_user
-        ).first()
-        
-        if existing_conversation:
+        # Conversation existante ou nouvelle (clé de paire unique)
+        conversation, creee = conversation_privee(request.user, medecin_user)
+        if not creee:
             messages.info(request, "Une conversation existe déjà avec ce médecin")
-            return redirect('communication:detail_conversation', conversation_id=existing_conversation.id)
-        
-        # Créer une nouvelle conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(request.user, medecin_user)
+            return redirect('communication:detail_conversation', conversation_id=conversation.id)
         
         messages.success(request, "Conversation créée avec succès")
         return redirect('communication:detail_conversation', conversation_id=conversation.id)
@@ -1193,8 +1151,7 @@ def creer_conversations_test(request):
         
         for autre_user in autres_users:
             # Créer conversation
-            conversation = Conversation.objects.create()
-            conversation.participants.add(request.user, autre_user)
+            conversation = get_or_create_conversation(request.user, autre_user)
             
             # Ajouter messages
             Message.objects.create(
@@ -1255,10 +1212,8 @@ def messagerie_pharmacien(request):
             Q(expediteur=user) | Q(destinataire=user)
         ).count()
         
-        messages_non_lus = Message.objects.filter(
-            destinataire=user,
-            est_lu=False
-        ).count()
+        non_lus = compteurs(user.id)
+        messages_non_lus = non_lus['messages']
         
         aujourd_hui_count = Message.objects.filter(
             Q(expediteur=user) | Q(destinataire=user),
@@ -1273,7 +1228,7 @@ def messagerie_pharmacien(request):
             'messages_non_lus': messages_non_lus,
             'total_conversations': conversations.count(),
             'aujourd_hui_count': aujourd_hui_count,
-            'notifications_count': Notification.objects.filter(user=user, est_lue=False).count(),
+            'notifications_count': non_lus['notifications'],
             'page_title': 'Messagerie Pharmacien',
             'user_type': 'pharmacien'
         }
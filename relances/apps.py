@@ -4,3 +4,10 @@ class RelancesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relances'
     verbose_name = 'Relances Automatisées'
+    
+    def ready(self):
+        # Importer les signaux
+        try:
+            import relances.signals
+        except ImportError:
+            pass
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from relances.services import EnvoiRelances
+import time
+
+
+class Command(BaseCommand):
+    help = 'Envoie par lots les relances programmées arrivées à échéance'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Nombre de relances par lot (défaut: 200)'
+        )
+        parser.add_argument(
+            '--par-seconde',
+            type=float,
+            help='Débit maximum en emails par seconde (défaut: RELANCES_ENVOIS_PAR_SECONDE ou 10, 0 = illimité)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            help='Nombre maximum de relances à traiter pendant cette exécution'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Simulation : emails envoyés au backend locmem, aucun email ne sort'
+        )
+        parser.add_argument(
+            '--dossier-emails',
+            help='Simulation : écrire les emails dans ce dossier (backend filebased)'
+        )
+
+    def handle(self, *args, **options):
+        envoi = EnvoiRelances(
+            batch_size=max(1, options['batch_size']),
+            envois_par_seconde=options['par_seconde'],
+            simulation=options['dry_run'],
+            dossier_emails=options['dossier_emails'],
+        )
+
+        if options['dry_run'] or options['dossier_emails']:
+            self.stdout.write(self.style.WARNING("🔍 MODE SIMULATION - aucun email réel ne sera envoyé"))
+
+        debut = time.monotonic()
+
+        def progression(envoyees, erreurs):
+            self.stdout.write(f"• {envoyees} envoyée(s), {erreurs} erreur(s)")
+
+        resultat = envoi.envoyer(limite=options['limite'], callback=progression)
+        duree = time.monotonic() - debut
+        total = resultat['envoyees'] + resultat['erreurs']
+        debit = total / duree if duree > 0 else 0
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {resultat['envoyees']} relance(s) envoyée(s), {resultat['erreurs']} erreur(s) "
+                f"en {duree:.2f}s ({debit:.1f} emails/s)"
+            )
+        )
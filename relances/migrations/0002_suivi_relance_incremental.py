@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0001_initial'),
+        ('relances', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecutionPlanificationRelances',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_debut', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('membres_evalues', models.IntegerField(default=0)),
+                ('relances_creees', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Exécution Planification Relances',
+                'verbose_name_plural': 'Exécutions Planification Relances',
+                'ordering': ['-date_debut'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SuiviRelanceMembre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dernier_niveau', models.CharField(blank=True, default='', max_length=50)),
+                ('derniere_evaluation', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Suivi Relance Membre',
+                'verbose_name_plural': 'Suivis Relance Membres',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relanceprogrammee',
+            index=models.Index(fields=['membre', 'statut'], name='relances_re_membre__f85751_idx'),
+        ),
+        migrations.AddField(
+            model_name='suivirelancemembre',
+            name='membre',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='suivi_relance', to='membres.membre'),
+        ),
+    ]
@@ -45,6 +45,36 @@ class RelanceProgrammee(models.Model):
         verbose_name = "Relance Programmee"
         verbose_name_plural = "Relances Programmees"
         ordering = ['-date_programmation']
+        indexes = [
+            models.Index(fields=['membre', 'statut']),
+        ]
     
     def __str__(self):
         return f"Relance {self.template.nom} - {self.membre}"
+
+class SuiviRelanceMembre(models.Model):
+    """Watermark de planification par membre (dernier niveau planifié / dernière évaluation)"""
+    membre = models.OneToOneField(Membre, on_delete=models.CASCADE, related_name='suivi_relance')
+    dernier_niveau = models.CharField(max_length=50, blank=True, default='')
+    derniere_evaluation = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Suivi Relance Membre"
+        verbose_name_plural = "Suivis Relance Membres"
+    
+    def __str__(self):
+        return f"Suivi relance {self.membre} ({self.dernier_niveau or 'aucun'})"
+
+class ExecutionPlanificationRelances(models.Model):
+    """Journal des passes de planification ; la dernière sert de watermark global"""
+    date_debut = models.DateTimeField(default=timezone.now, db_index=True)
+    membres_evalues = models.IntegerField(default=0)
+    relances_creees = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Exécution Planification Relances"
+        verbose_name_plural = "Exécutions Planification Relances"
+        ordering = ['-date_debut']
+    
+    def __str__(self):
+        return f"Planification du {self.date_debut:%d/%m/%Y %H:%M} ({self.relances_creees} relances)"
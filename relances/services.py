@@ -1,10 +1,21 @@
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template import Context, Template
 from django.utils import timezone
 from datetime import timedelta
+import logging
+import time
 from membres.models import Membre
 from agents.models import VerificationCotisation
-from relances.models import TemplateRelance, RelanceProgrammee
+from relances.models import (
+    TemplateRelance, RelanceProgrammee, SuiviRelanceMembre, ExecutionPlanificationRelances
+)
+
+logger = logging.getLogger(__name__)
+
+# Ordre croissant de gravité, utilisé pour le watermark "dernier niveau planifié"
+NIVEAUX_RELANCE = ['premier_rappel', 'relance_urgente', 'suspension_imminente']
 
 class ServiceRelances:
     def __init__(self):
@@ -14,31 +25,135 @@ class ServiceRelances:
             'suspension_imminente': 30
         }
     
-    def identifier_membres_a_relancer(self):
-        """Identifie les membres nécessitant une relance"""
-        membres_relance = []
-        
-        # Premier rappel - 7 jours de retard
+    def requete_premier_rappel(self):
+        """Membres en retard d'au moins 7 jours (premier rappel)"""
         seuil_premier = timezone.now().date() - timedelta(days=self.seuils['premier_rappel'])
-        membres_premier = Membre.objects.filter(
+        return Membre.objects.filter(
             verificationcotisation__prochaine_echeance__lte=seuil_premier,
             verificationcotisation__jours_retard__gte=self.seuils['premier_rappel'],
             verificationcotisation__statut_cotisation='a_verifier'
         ).distinct()
+    
+    def requete_relance_urgente(self):
+        """Membres en retard d'au moins 15 jours (relance urgente)"""
+        return Membre.objects.filter(
+            verificationcotisation__jours_retard__gte=self.seuils['relance_urgente']
+        ).distinct()
+    
+    def identifier_membres_a_relancer(self):
+        """Identifie les membres nécessitant une relance"""
+        membres_relance = []
         
-        for membre in membres_premier:
+        # Premier rappel - 7 jours de retard
+        for membre in self.requete_premier_rappel():
             membres_relance.append((membre, 'premier_rappel'))
         
         # Relances urgentes - 15+ jours de retard
-        membres_urgent = Membre.objects.filter(
-            verificationcotisation__jours_retard__gte=self.seuils['relance_urgente']
-        ).distinct()
-        
-        for membre in membres_urgent:
+        for membre in self.requete_relance_urgente():
             membres_relance.append((membre, 'relance_urgente'))
         
         return membres_relance
     
+    def planifier_relances_membre(self, membre):
+        """Planifie les relances d'un seul membre (sans attendre la passe globale)"""
+        return self.planifier_incremental(membre_ids=[membre.id])['relances_creees']
+    
+    def membres_modifies_depuis(self, depuis):
+        """Ids des membres dont une vérification a changé depuis `depuis`"""
+        verifications = VerificationCotisation.objects.all()
+        if depuis is not None:
+            verifications = verifications.filter(date_modification__gt=depuis)
+        return set(verifications.values_list('membre_id', flat=True).distinct())
+    
+    def evaluer_niveaux(self, membre_ids):
+        """Types de relance dus par membre, en deux requêtes sur les seuls membres candidats"""
+        seuil_premier = timezone.now().date() - timedelta(days=self.seuils['premier_rappel'])
+        verifications = VerificationCotisation.objects.filter(membre_id__in=membre_ids)
+        
+        premier = set(verifications.filter(
+            prochaine_echeance__lte=seuil_premier,
+            jours_retard__gte=self.seuils['premier_rappel'],
+            statut_cotisation='a_verifier'
+        ).values_list('membre_id', flat=True).distinct())
+        urgent = set(verifications.filter(
+            jours_retard__gte=self.seuils['relance_urgente']
+        ).values_list('membre_id', flat=True).distinct())
+        
+        niveaux = {membre_id: [] for membre_id in membre_ids}
+        for membre_id in premier:
+            niveaux[membre_id].append('premier_rappel')
+        for membre_id in urgent:
+            niveaux[membre_id].append('relance_urgente')
+        return niveaux
+    
+    def planifier_incremental(self, membre_ids=None):
+        """
+        Planifie les relances des seuls membres dont les vérifications ont
+        changé depuis la dernière passe (ou des membre_ids donnés), sans
+        doublonner une relance du même type déjà programmée.
+        """
+        maintenant = timezone.now()
+        
+        if membre_ids is None:
+            derniere_execution = ExecutionPlanificationRelances.objects.first()
+            depuis = derniere_execution.date_debut if derniere_execution else None
+            membre_ids = self.membres_modifies_depuis(depuis)
+            execution = ExecutionPlanificationRelances(date_debut=maintenant)
+        else:
+            membre_ids = set(membre_ids)
+            execution = None
+        
+        relances_creees = 0
+        if membre_ids:
+            relances_creees = self._planifier_membres(membre_ids, maintenant)
+        
+        if execution is not None:
+            execution.membres_evalues = len(membre_ids)
+            execution.relances_creees = relances_creees
+            execution.save()
+        
+        return {'membres_evalues': len(membre_ids), 'relances_creees': relances_creees}
+    
+    def _planifier_membres(self, membre_ids, maintenant):
+        niveaux = self.evaluer_niveaux(membre_ids)
+        templates = {}
+        for template in TemplateRelance.objects.order_by('-id'):
+            templates[template.type_relance] = template  # le premier créé l'emporte, comme .first()
+        
+        deja_programmees = set(RelanceProgrammee.objects.filter(
+            membre_id__in=membre_ids,
+            statut='programmee'
+        ).values_list('membre_id', 'template__type_relance'))
+        
+        nouvelles = []
+        suivis = []
+        for membre_id, types_relance in niveaux.items():
+            for type_relance in types_relance:
+                template = templates.get(type_relance)
+                if template is None or (membre_id, type_relance) in deja_programmees:
+                    continue
+                nouvelles.append(RelanceProgrammee(
+                    membre_id=membre_id,
+                    template=template,
+                    date_programmation=maintenant,
+                    statut='programmee'
+                ))
+            niveau_max = max(types_relance, key=NIVEAUX_RELANCE.index) if types_relance else ''
+            suivis.append(SuiviRelanceMembre(
+                membre_id=membre_id,
+                dernier_niveau=niveau_max,
+                derniere_evaluation=maintenant
+            ))
+        
+        RelanceProgrammee.objects.bulk_create(nouvelles)
+        SuiviRelanceMembre.objects.bulk_create(
+            suivis,
+            update_conflicts=True,
+            unique_fields=['membre'],
+            update_fields=['dernier_niveau', 'derniere_evaluation']
+        )
+        return len(nouvelles)
+    
     def creer_relance_programmee(self, membre, type_relance):
         """Crée une relance programmée"""
         template = TemplateRelance.objects.filter(
@@ -56,11 +171,131 @@ class ServiceRelances:
         return False
 
 def planifier_relances_automatiques():
-    """Fonction utilitaire pour planifier les relances"""
+    """Fonction utilitaire pour planifier les relances (passe incrémentale)"""
     service = ServiceRelances()
-    membres_a_relancer = service.identifier_membres_a_relancer()
-    
-    for membre, type_relance in membres_a_relancer:
-        service.creer_relance_programmee(membre, type_relance)
-    
-    return len(membres_a_relancer)
+    return service.planifier_incremental()['relances_creees']
+
+
+class EnvoiRelances:
+    """
+    Envoi par lots des relances programmées.
+
+    Chaque TemplateRelance n'est compilé qu'une fois par lot, tous les emails
+    du lot partagent une seule connexion (send_messages) avec un débit
+    plafonné, et les statuts sont mis à jour avec bulk_update. En mode
+    simulation, la connexion utilise le backend locmem (ou filebased si un
+    dossier est fourni) : rien ne sort et aucun statut n'est modifié, ce qui
+    permet de mesurer le débit sans consommer les relances.
+    """
+
+    BACKEND_SIMULATION = 'django.core.mail.backends.locmem.EmailBackend'
+    BACKEND_FICHIERS = 'django.core.mail.backends.filebased.EmailBackend'
+
+    def __init__(self, batch_size=200, envois_par_seconde=None, simulation=False, dossier_emails=None):
+        self.batch_size = batch_size
+        if envois_par_seconde is None:
+            envois_par_seconde = getattr(settings, 'RELANCES_ENVOIS_PAR_SECONDE', 10)
+        self.envois_par_seconde = envois_par_seconde
+        self.simulation = bool(simulation or dossier_emails)
+        self.options_connexion = {}
+        if dossier_emails:
+            self.options_connexion = {'backend': self.BACKEND_FICHIERS, 'file_path': dossier_emails}
+        elif simulation:
+            self.options_connexion = {'backend': self.BACKEND_SIMULATION}
+        self.from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+
+    def relances_dues(self):
+        return RelanceProgrammee.objects.filter(
+            statut='programmee',
+            date_programmation__lte=timezone.now()
+        ).select_related('membre', 'membre__user', 'template').order_by('date_programmation', 'id')
+
+    def compiler_templates(self, relances):
+        """Cache des templates compilés du lot : {template_id: (sujet, texte, html)}"""
+        compiles = {}
+        for relance in relances:
+            template = relance.template
+            if template.id not in compiles:
+                compiles[template.id] = (
+                    Template(template.sujet),
+                    Template(template.template_texte),
+                    Template(template.template_html) if template.template_html else None,
+                )
+        return compiles
+
+    def construire_message(self, relance, compiles):
+        membre = relance.membre
+        destinataire = membre.email or (membre.user.email if membre.user else '')
+        if not destinataire:
+            return None
+
+        sujet, texte, html = compiles[relance.template_id]
+        contexte = Context({'membre': membre, 'relance': relance, 'template': relance.template})
+        message = EmailMultiAlternatives(
+            subject=sujet.render(contexte).strip(),
+            body=texte.render(contexte),
+            from_email=self.from_email,
+            to=[destinataire],
+        )
+        if html is not None:
+            message.attach_alternative(html.render(contexte), 'text/html')
+        return message
+
+    def envoyer_lot(self, relances, connexion):
+        """Envoie un lot sur la connexion ouverte ; retourne (envoyees, erreurs)"""
+        compiles = self.compiler_templates(relances)
+        maintenant = timezone.now()
+        envoyees = erreurs = 0
+        intervalle = 1.0 / self.envois_par_seconde if self.envois_par_seconde else 0
+
+        for relance in relances:
+            debut = time.monotonic()
+            try:
+                message = self.construire_message(relance, compiles)
+                if message is None:
+                    raise ValueError("aucune adresse email")
+                connexion.send_messages([message])
+                relance.statut = 'envoyee'
+                relance.envoyee = True
+                relance.date_envoi = maintenant
+                envoyees += 1
+            except Exception as e:
+                logger.error(f"Erreur envoi relance {relance.id}: {e}")
+                relance.statut = 'erreur'
+                erreurs += 1
+
+            # Plafond de débit : au plus `envois_par_seconde` emails par seconde
+            attente = intervalle - (time.monotonic() - debut)
+            if attente > 0:
+                time.sleep(attente)
+
+        if not self.simulation:
+            RelanceProgrammee.objects.bulk_update(relances, ['statut', 'envoyee', 'date_envoi'])
+        return envoyees, erreurs
+
+    def envoyer(self, limite=None, callback=None):
+        """Envoie toutes les relances dues, lot par lot, sur une seule connexion"""
+        connexion = get_connection(**self.options_connexion)
+        connexion.open()
+        envoyees = erreurs = 0
+        curseur = Q()
+        try:
+            while limite is None or envoyees + erreurs < limite:
+                taille = self.batch_size if limite is None else min(self.batch_size, limite - envoyees - erreurs)
+                # Reprise après la dernière relance traitée : en simulation, les statuts ne changent pas
+                relances = list(self.relances_dues().filter(curseur)[:taille])
+                if not relances:
+                    break
+                derniere = relances[-1]
+                curseur = Q(date_programmation__gt=derniere.date_programmation) | Q(
+                    date_programmation=derniere.date_programmation, id__gt=derniere.id
+                )
+                lot_envoyees, lot_erreurs = self.envoyer_lot(relances, connexion)
+                envoyees += lot_envoyees
+                erreurs += lot_erreurs
+                if callback:
+                    callback(envoyees, erreurs)
+        finally:
+            connexion.close()
+
+        return {'envoyees': envoyees, 'erreurs': erreurs}
@@ -1,15 +1,14 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from membres.models import Membre
 from agents.models import VerificationCotisation
-from relances.services import ServiceRelances
+from core.taches import enfiler
 
 @receiver(post_save, sender=VerificationCotisation)
 def verifier_relance_apres_verification(sender, instance, created, **kwargs):
-    """Vérifie si une relance est nécessaire après mise à jour vérification"""
+    """Programme la vérification des relances du membre après mise à jour vérification"""
     if created or instance.jours_retard > 0:
-        try:
-            service = ServiceRelances()
-            service.planifier_relances_automatiques()
-        except Exception as e:
-            print(f"❌ Erreur vérification relances: {e}")
+        enfiler(
+            'relances.taches.planifier_relances_membre',
+            cle=f'relances:membre:{instance.membre_id}',
+            membre_id=instance.membre_id,
+        )
@@ -0,0 +1,10 @@
+from membres.models import Membre
+from relances.services import ServiceRelances
+
+
+def planifier_relances_membre(membre_id):
+    """Tâche asynchrone : planifie les relances d'un seul membre"""
+    membre = Membre.objects.filter(id=membre_id).first()
+    if membre is None:
+        return 0
+    return ServiceRelances().planifier_relances_membre(membre)
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.core import mail
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from agents.models import Agent, VerificationCotisation
+from membres.models import Membre
+from relances.models import TemplateRelance, RelanceProgrammee, SuiviRelanceMembre
+from relances.services import EnvoiRelances, ServiceRelances
+
+
+class DonneesRelanceMixin:
+
+    def setUp(self):
+        TemplateRelance.objects.create(
+            nom='Urgente', type_relance='relance_urgente', sujet='Retard',
+            template_html='<p>Retard</p>', template_texte='Retard'
+        )
+        agent_user = User.objects.create_user(username='agent_relance', password='testpass123')
+        self.agent = Agent.objects.create(user=agent_user, matricule='AGT-RL-1', poste='Contrôle')
+        self.membre = Membre.objects.create(nom='Kone', prenom='Awa', numero_unique='RL001')
+        self.membre_a_jour = Membre.objects.create(nom='Diallo', prenom='Fatou', numero_unique='RL002')
+
+        today = timezone.now().date()
+        VerificationCotisation.objects.create(
+            agent=self.agent, membre=self.membre, statut_cotisation='en_retard',
+            prochaine_echeance=today - timedelta(days=20),
+        )
+        VerificationCotisation.objects.create(
+            agent=self.agent, membre=self.membre_a_jour, statut_cotisation='a_jour',
+            prochaine_echeance=today + timedelta(days=20),
+        )
+
+
+class PlanificationIncrementaleTests(DonneesRelanceMixin, TestCase):
+
+    def test_relance_creee_une_seule_fois(self):
+        service = ServiceRelances()
+        self.assertEqual(service.planifier_incremental(), {'membres_evalues': 2, 'relances_creees': 1})
+
+        suivi = SuiviRelanceMembre.objects.get(membre=self.membre)
+        self.assertEqual(suivi.dernier_niveau, 'relance_urgente')
+
+        # Rien n'a changé : aucun membre réévalué
+        self.assertEqual(service.planifier_incremental(), {'membres_evalues': 0, 'relances_creees': 0})
+
+        # Réévaluation forcée : la relance en attente n'est pas dupliquée
+        self.assertEqual(service.planifier_relances_membre(self.membre), 0)
+        self.assertEqual(RelanceProgrammee.objects.filter(membre=self.membre).count(), 1)
+
+    def test_seuls_les_membres_modifies_sont_evalues(self):
+        service = ServiceRelances()
+        service.planifier_incremental()
+
+        VerificationCotisation.objects.filter(membre=self.membre_a_jour).first().save()
+        with self.assertNumQueries(8):
+            resultat = service.planifier_incremental()
+        self.assertEqual(resultat['membres_evalues'], 1)
+
+
+class EnvoiRelancesTests(DonneesRelanceMixin, TestCase):
+
+    def test_envoi_par_lot_sur_une_connexion(self):
+        self.membre.email = 'awa.kone@example.com'
+        self.membre.save()
+        template = TemplateRelance.objects.get()
+        template.sujet = 'Retard - {{ membre.nom }}'
+        template.save()
+        sans_email = Membre.objects.create(nom='Traore', prenom='Ali', numero_unique='RL003')
+        for membre in (self.membre, self.membre, sans_email):
+            RelanceProgrammee.objects.create(membre=membre, template=template)
+
+        # Backend locmem du runner de tests : rien ne sort
+        resultat = EnvoiRelances(batch_size=2, envois_par_seconde=0).envoyer()
+
+        self.assertEqual(resultat, {'envoyees': 2, 'erreurs': 1})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].subject, 'Retard - Kone')
+        self.assertEqual(RelanceProgrammee.objects.filter(statut='envoyee', envoyee=True).count(), 2)
+        self.assertEqual(RelanceProgrammee.objects.filter(statut='erreur').count(), 1)
+
+    def test_simulation_ne_modifie_aucun_statut(self):
+        self.membre.email = 'awa.kone@example.com'
+        self.membre.save()
+        template = TemplateRelance.objects.get()
+        for _ in range(3):
+            RelanceProgrammee.objects.create(membre=self.membre, template=template)
+
+        resultat = EnvoiRelances(batch_size=2, envois_par_seconde=0, simulation=True).envoyer()
+
+        self.assertEqual(resultat, {'envoyees': 3, 'erreurs': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(RelanceProgrammee.objects.filter(statut='programmee', envoyee=False).count(), 3)
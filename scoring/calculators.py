@@ -1,9 +1,15 @@
-from django.db.models import Avg, Count, Sum
+from django.db.models import Avg, Count, Sum, Q
+from django.db import connection
 from membres.models import Membre
 from scoring.models import HistoriqueScore, RegleScoring
 from django.utils import timezone
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 import decimal
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class CalculateurScoreMembre:
     def __init__(self):
@@ -124,18 +130,167 @@ class CalculateurScoreMembre:
         else:
             return "🔴 RISQUE TRÈS ÉLEVÉ"
 
-def recalculer_scores_automatique():
-    """Fonction pour recalculer tous les scores automatiquement"""
-    membres = Membre.objects.all()
-    calculateur = CalculateurScoreMembre()
-    compteur = 0
-    
-    for membre in membres:
+class CalculateurScoreMasse(CalculateurScoreMembre):
+    """
+    Calcul des scores par lots : les critères sont obtenus par quelques
+    agrégats groupés sur VerificationCotisation au lieu de plusieurs requêtes
+    par membre et par règle, et l'historique est écrit avec bulk_create.
+    """
+
+    def __init__(self, batch_size=1000):
+        super().__init__()
+        self.batch_size = batch_size
+        # Évaluées une seule fois : (critère, poids, nom) dans l'ordre des règles
+        self.regles_vecteur = [
+            (regle.critere, float(regle.poids), regle.nom) for regle in self.regles
+        ]
+
+    def agreger_verifications(self, membre_ids):
+        """Un seul agrégat groupé par membre pour tous les critères"""
+        from agents.models import VerificationCotisation
+
+        lignes = VerificationCotisation.objects.filter(
+            membre_id__in=membre_ids
+        ).values('membre_id').annotate(
+            total=Count('id'),
+            ponctuels=Count('id', filter=Q(jours_retard=0)),
+            retard_moyen=Avg('jours_retard'),
+            dette_totale=Sum('montant_dette'),
+        ).order_by()
+
+        return {ligne['membre_id']: ligne for ligne in lignes}
+
+    def calculer_ponctualite_paiements_stats(self, stats, membre):
+        if not stats['total']:
+            return 0.5
+        return float(stats['ponctuels']) / stats['total']
+
+    def calculer_historique_retards_stats(self, stats, membre):
+        retard_moyen = stats['retard_moyen'] or 0
+        return max(0, 1 - (float(retard_moyen) / 30))
+
+    def calculer_niveau_dette_stats(self, stats, membre):
+        dette_totale = stats['dette_totale'] or 0
+        return max(0, 1 - (float(dette_totale) / 1000))
+
+    def calculer_anciennete_membre_stats(self, stats, membre):
+        # Même logique que le calcul unitaire (date_creation absente -> neutre)
+        return self.calculer_anciennete_membre(membre)
+
+    def calculer_frequence_verifications_stats(self, stats, membre):
+        if not stats['total']:
+            return 0.5
+        return min(1.0, float(stats['total']) / 10)
+
+    def calculer_colonnes(self, membres, stats_par_membre):
+        """Calcule une colonne de scores par critère (un score par membre)"""
+        vide = {'total': 0, 'ponctuels': 0, 'retard_moyen': None, 'dette_totale': None}
+        colonnes = {}
+
+        for critere, _poids, _nom in self.regles_vecteur:
+            if critere in colonnes:
+                continue
+            methode = getattr(self, f"calculer_{critere}_stats", None)
+            if methode is None:
+                colonnes[critere] = [0.5] * len(membres)
+                continue
+            colonnes[critere] = [
+                float(methode(stats_par_membre.get(membre.id, vide), membre))
+                for membre in membres
+            ]
+
+        return colonnes
+
+    def calculer_lot(self, membres):
+        """Calcule et enregistre les scores d'un lot de membres"""
+        membres = list(membres)
+        if not membres:
+            return 0
+
+        stats_par_membre = self.agreger_verifications([m.id for m in membres])
+        colonnes = self.calculer_colonnes(membres, stats_par_membre)
+
+        # Comme dans calculer_score_complet, un critère répété garde la dernière règle
+        regles_effectives = {}
+        for critere, poids, nom in self.regles_vecteur:
+            regles_effectives[critere] = (poids, nom)
+
+        # Produit scalaire scores x poids, critère par critère
+        scores_finaux = [0.0] * len(membres)
+        for critere, (poids, _nom) in regles_effectives.items():
+            colonne = colonnes[critere]
+            scores_finaux = [total + score * poids for total, score in zip(scores_finaux, colonne)]
+
+        historiques = []
+        for index, membre in enumerate(membres):
+            score_final = round(max(0, min(100, scores_finaux[index] * 100)), 2)
+            details = {
+                critere: {
+                    'score': colonnes[critere][index],
+                    'poids': poids,
+                    'nom_regle': nom,
+                }
+                for critere, (poids, nom) in regles_effectives.items()
+            }
+            historiques.append(HistoriqueScore(
+                membre=membre,
+                score=decimal.Decimal(str(score_final)),
+                niveau_risque=self.determiner_niveau_risque(score_final),
+                details_calcul=details,
+            ))
+
+        HistoriqueScore.objects.bulk_create(historiques, batch_size=self.batch_size)
+        return len(historiques)
+
+    def traiter_plage(self, id_min, id_max=None):
+        """Traite les membres dont l'id est dans ]id_min, id_max] par lots"""
+        compteur = 0
+        dernier_id = id_min
+        while True:
+            membres = Membre.objects.filter(id__gt=dernier_id)
+            if id_max is not None:
+                membres = membres.filter(id__lte=id_max)
+            membres = list(membres.order_by('id')[:self.batch_size])
+            if not membres:
+                break
+            compteur += self.calculer_lot(membres)
+            dernier_id = membres[-1].id
+        return compteur
+
+    def _traiter_plage_thread(self, plage):
         try:
-            calculateur.calculer_score_complet(membre)
-            compteur += 1
-        except Exception as e:
-            print(f"❌ Erreur pour {membre.nom}: {e}")
-    
+            return self.traiter_plage(*plage)
+        finally:
+            # Chaque thread ouvre sa propre connexion : la libérer
+            connection.close()
+
+    def recalculer_tous(self, workers=1):
+        """Recalcule les scores de tous les membres, éventuellement en parallèle"""
+        if workers <= 1:
+            return self.traiter_plage(0)
+
+        ids = list(Membre.objects.order_by('id').values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        taille_plage = -(-len(ids) // workers)
+        plages = []
+        for debut in range(0, len(ids), taille_plage):
+            tranche = ids[debut:debut + taille_plage]
+            # Borne basse exclusive : l'id précédant la tranche
+            plages.append((tranche[0] - 1, tranche[-1]))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(self._traiter_plage_thread, plages))
+
+
+def recalculer_scores_automatique(batch_size=1000, workers=1):
+    """Fonction pour recalculer tous les scores automatiquement"""
+    debut = time.monotonic()
+    calculateur = CalculateurScoreMasse(batch_size=batch_size)
+    compteur = calculateur.recalculer_tous(workers=workers)
+    duree = time.monotonic() - debut
+
+    logger.info(f"Scores recalculés pour {compteur} membres en {duree:.2f}s")
     print(f"✅ Scores recalculés pour {compteur} membres")
     return compteur
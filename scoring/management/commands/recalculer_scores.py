@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from scoring.calculators import CalculateurScoreMasse
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les scores de tous les membres par lots (agrégats groupés + bulk_create)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de membres traités par lot (défaut: 1000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Nombre de threads de calcul en parallèle (défaut: 1)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"🚀 Recalcul des scores (lots de {batch_size}, {workers} worker(s))..."
+            )
+        )
+
+        debut = time.monotonic()
+        calculateur = CalculateurScoreMasse(batch_size=batch_size)
+        compteur = calculateur.recalculer_tous(workers=workers)
+        duree = time.monotonic() - debut
+
+        debit = compteur / duree if duree > 0 else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {compteur} score(s) recalculé(s) en {duree:.2f}s ({debit:.0f} membres/s)"
+            )
+        )
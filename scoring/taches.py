@@ -0,0 +1,10 @@
+from membres.models import Membre
+from scoring.calculators import CalculateurScoreMasse
+
+
+def recalculer_score_membre(membre_id):
+    """Tâche asynchrone : recalcule le score d'un membre (idempotente)"""
+    membre = Membre.objects.filter(id=membre_id).first()
+    if membre is None:
+        return 0
+    return CalculateurScoreMasse().calculer_lot([membre])
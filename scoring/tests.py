@@ -0,0 +1,79 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from agents.models import Agent, VerificationCotisation
+from membres.models import Membre
+from scoring.calculators import CalculateurScoreMembre, CalculateurScoreMasse
+from scoring.models import HistoriqueScore, RegleScoring
+
+
+class CalculateurScoreMasseTests(TestCase):
+
+    def setUp(self):
+        """Deux membres avec des historiques de vérification différents"""
+        for nom, critere, poids in [
+            ('Ponctualité', 'ponctualite_paiements', '0.30'),
+            ('Retards', 'historique_retards', '0.25'),
+            ('Dette', 'niveau_dette', '0.20'),
+            ('Ancienneté', 'anciennete_membre', '0.15'),
+            ('Fréquence', 'frequence_verifications', '0.10'),
+        ]:
+            RegleScoring.objects.create(nom=nom, critere=critere, poids=Decimal(poids))
+
+        agent_user = User.objects.create_user(username='agent_scoring', password='testpass123')
+        self.agent = Agent.objects.create(user=agent_user, matricule='AGT-SC-1', poste='Contrôle')
+
+        self.membre_ponctuel = Membre.objects.create(nom='Kone', prenom='Awa', numero_unique='SC001')
+        self.membre_retard = Membre.objects.create(nom='Traore', prenom='Moussa', numero_unique='SC002')
+        self.membre_sans_historique = Membre.objects.create(nom='Diallo', prenom='Fatou', numero_unique='SC003')
+
+        today = timezone.now().date()
+        VerificationCotisation.objects.create(
+            agent=self.agent, membre=self.membre_ponctuel, statut_cotisation='a_jour',
+            prochaine_echeance=today + timedelta(days=10),
+        )
+        VerificationCotisation.objects.create(
+            agent=self.agent, membre=self.membre_retard, statut_cotisation='en_retard',
+            prochaine_echeance=today - timedelta(days=12), montant_dette=Decimal('400'),
+        )
+        HistoriqueScore.objects.all().delete()
+
+    def test_scores_identiques_au_calcul_unitaire(self):
+        membres = [self.membre_ponctuel, self.membre_retard, self.membre_sans_historique]
+        attendus = {
+            membre.id: CalculateurScoreMembre().calculer_score_complet(membre)
+            for membre in membres
+        }
+        HistoriqueScore.objects.all().delete()
+
+        compteur = CalculateurScoreMasse(batch_size=2).recalculer_tous()
+
+        self.assertEqual(compteur, 3)
+        for historique in HistoriqueScore.objects.all():
+            attendu = attendus[historique.membre_id]
+            self.assertEqual(float(historique.score), attendu['score_final'])
+            self.assertEqual(historique.niveau_risque, attendu['niveau_risque'])
+            self.assertEqual(historique.details_calcul, attendu['details_scores'])
+
+    def test_nombre_de_requetes_constant_par_lot(self):
+        calculateur = CalculateurScoreMasse(batch_size=100)
+        # 1 lecture des membres + 1 agrégat groupé + 1 bulk_create + 1 lecture de fin
+        with self.assertNumQueries(4):
+            calculateur.recalculer_tous()
+
+    def test_verifications_coalescees_en_une_tache(self):
+        from core.models import TacheAsynchrone
+
+        today = timezone.now().date()
+        for jours in (1, 2, 3):
+            VerificationCotisation.objects.create(
+                agent=self.agent, membre=self.membre_retard, statut_cotisation='en_retard',
+                prochaine_echeance=today - timedelta(days=jours),
+            )
+        self.assertEqual(HistoriqueScore.objects.count(), 0)
+        self.assertEqual(
+            TacheAsynchrone.objects.filter(cle=f'scoring:membre:{self.membre_retard.id}').count(), 1
+        )
@@ -72,16 +72,37 @@ class CommunicationIntegration {
     }
     
     setupEventListeners() {
-        // Recharger les compteurs toutes les 30 secondes
-        setInterval(() => this.loadCounts(), 30000);
+        // Compteurs poussés par le serveur (static/js/temps-reel.js)
+        document.addEventListener('communication:compteurs', (event) => {
+            this.updateNotificationBadges(event.detail.notifications);
+            this.updateMessageBadges(event.detail.messages);
+        });
+        
+        // Repli : recharger toutes les 30 secondes si le flux temps réel est indisponible
+        this.polling = null;
+        document.addEventListener('communication:connecte', () => this.arreterPolling());
+        document.addEventListener('communication:indisponible', () => this.demarrerPolling());
+        if (!window.fluxCommunication) {
+            this.demarrerPolling();
+        }
         
-        // Recharger quand la page redevient visible
+        // Recharger quand la page redevient visible (en mode polling seulement)
         document.addEventListener('visibilitychange', () => {
-            if (!document.hidden) {
+            if (!document.hidden && this.polling) {
                 this.loadCounts();
             }
         });
     }
+    
+    demarrerPolling() {
+        if (this.polling) return;
+        this.polling = setInterval(() => this.loadCounts(), 30000);
+    }
+    
+    arreterPolling() {
+        clearInterval(this.polling);
+        this.polling = null;
+    }
 }
 
 // Initialisation automatique
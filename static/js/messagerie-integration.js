@@ -1,33 +1,50 @@
 
 // Intégration Messagerie - Badge de notifications
 document.addEventListener('DOMContentLoaded', function() {
-    // Mettre à jour le badge de notifications
+    function afficherNonLus(notifications, messagesNonLus) {
+        const badge = document.getElementById('notification-badge');
+        const unreadSpan = document.getElementById('unread-messages');
+        
+        if (badge && notifications > 0) {
+            badge.textContent = notifications;
+            badge.style.display = 'inline';
+        } else if (badge) {
+            badge.style.display = 'none';
+        }
+        
+        if (unreadSpan && messagesNonLus !== undefined) {
+            unreadSpan.textContent = messagesNonLus || 0;
+        }
+    }
+    
+    // Repli : polling du compteur si le flux temps réel est indisponible
+    let polling = null;
     function updateNotificationBadge() {
         fetch('/communication/notifications/count/')
             .then(response => response.json())
-            .then(data => {
-                const badge = document.getElementById('notification-badge');
-                const unreadSpan = document.getElementById('unread-messages');
-                
-                if (badge && data.unread_count > 0) {
-                    badge.textContent = data.unread_count;
-                    badge.style.display = 'inline';
-                } else if (badge) {
-                    badge.style.display = 'none';
-                }
-                
-                if (unreadSpan) {
-                    unreadSpan.textContent = data.unread_count || 0;
-                }
-            })
+            .then(data => afficherNonLus(data.count || 0))
             .catch(error => {
                 console.log('Erreur lors du chargement des notifications:', error);
             });
     }
+    function demarrerPolling() {
+        if (polling) return;
+        updateNotificationBadge();
+        polling = setInterval(updateNotificationBadge, 30000);
+    }
     
-    // Mettre à jour toutes les 30 secondes
-    updateNotificationBadge();
-    setInterval(updateNotificationBadge, 30000);
+    // Compteurs poussés par le serveur (static/js/temps-reel.js)
+    document.addEventListener('communication:compteurs', function(event) {
+        afficherNonLus(event.detail.notifications, event.detail.messages);
+    });
+    document.addEventListener('communication:connecte', function() {
+        clearInterval(polling);
+        polling = null;
+    });
+    document.addEventListener('communication:indisponible', demarrerPolling);
+    if (!window.fluxCommunication) {
+        demarrerPolling();
+    }
     
     // Animation pour la carte messagerie
     const messagingCard = document.querySelector('.card [href*="messagerie"]');
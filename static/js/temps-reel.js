@@ -0,0 +1,47 @@
+// Flux temps réel de la messagerie (WebSocket /ws/communication/)
+// Chaque événement reçu est redispatché sur document sous le nom
+// `communication:<type>` (message, lecture, notification, compteurs).
+// `communication:indisponible` signale qu'il faut revenir au polling.
+(function() {
+    const flux = { connecte: false, socket: null, tentatives: 0 };
+
+    function emettre(type, detail) {
+        document.dispatchEvent(new CustomEvent('communication:' + type, { detail: detail }));
+    }
+
+    function connecter() {
+        if (!('WebSocket' in window)) {
+            emettre('indisponible', {});
+            return;
+        }
+        const protocole = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocole}://${window.location.host}/ws/communication/`);
+        flux.socket = socket;
+
+        socket.onopen = function() {
+            flux.connecte = true;
+            flux.tentatives = 0;
+            emettre('connecte', {});
+        };
+        socket.onmessage = function(event) {
+            const donnees = JSON.parse(event.data);
+            emettre(donnees.type, donnees);
+        };
+        socket.onclose = function(event) {
+            const etaitConnecte = flux.connecte;
+            flux.connecte = false;
+            emettre('deconnecte', { code: event.code });
+            // 4401 : non authentifié ; 4503 : pas de couche de canaux ;
+            // sans serveur ASGI, abandon après quelques essais
+            if (event.code === 4401 || event.code === 4503 || (!etaitConnecte && flux.tentatives >= 3)) {
+                emettre('indisponible', {});
+                return;
+            }
+            flux.tentatives += 1;
+            setTimeout(connecter, Math.min(30000, 1000 * 2 ** flux.tentatives));
+        };
+    }
+
+    window.fluxCommunication = flux;
+    document.addEventListener('DOMContentLoaded', connecter);
+})();